@@ -0,0 +1,518 @@
+"""
+Acquisition Engine
+
+The acquisition path without any Qt: reading the serial port (or several boards through a
+DeviceManager), parsing frames, assigning sample indices, recording, filtering the visible
+channels and QRS detection, one block at a time. SerialThread runs an engine on a QThread in
+the GUI process. AcquisitionProcess runs one in a separate process that writes into
+SharedRingBuffers, so that acquisition never waits for the GIL behind rendering and can run
+on another core.
+
+The acquisition process is driven over two pipes. Commands (filter stages, recording,
+annotations, profiling) go to the process on the command pipe, which answers the commands that return a
+result. The process sends the sample count and arrival time of every block, and its statistics with the
+per-board report and, while profiling, its stage timings twice a second, on the notification pipe, so the
+GUI never waits on the process for them. The channels shown by the GUI and the channels whose filtered
+samples are up to date are exchanged through a small shared-memory array.
+
+Classes:
+    AcquisitionEngine: Reads, parses, records, filters and detects QRS complexes block by block.
+    AcquisitionProcess: Process running an engine on shared-memory ring buffers.
+    FilterStages: Stand-in for a FilterPipeline in another process, forwarding stage changes.
+
+Functions:
+    open_source: Open the board, several boards or emulated boards described by a source spec.
+    record: Record a source straight to disk, without a GUI.
+"""
+import multiprocessing
+import sys
+import threading
+import time
+import numpy as np
+import serial
+from buffers import SharedRingBuffer
+from clock import SampleClock, fill_gaps
+from devices import DeviceManager
+from emulator import start_boards
+from filters import FilterPipeline
+from framing import FrameParser
+from profiling import Profiler
+from recorder import Recorder
+
+
+def open_source(spec):
+    """
+    Open the sample source described by a spec.
+
+    Args:
+        spec (dict): "channels", "sampling_rate", "boards", "counter_bytes", "infer_gaps" and either "ports" and
+            "baudrate" for boards on serial ports, or "demo_source", "demo_speed" and "demo_loss"
+            for emulated boards.
+
+    Returns:
+        tuple: serial.Serial, LoopbackSerial or DeviceManager to read from, and the list of emulators.
+    """
+    channels, boards = spec["channels"], spec.get("boards", 1)
+    if spec.get("demo_source") is not None:
+        return start_boards(spec["demo_source"], channels, spec["sampling_rate"], boards, spec.get("demo_speed", 1.0),
+                            spec.get("demo_loss", 0.0), spec.get("counter_bytes", 0), spec.get("infer_gaps", False))
+    if boards > 1:
+        devices = DeviceManager.open(spec["ports"][:boards], [channels // boards] * boards, spec["sampling_rate"],
+                                     spec["baudrate"], counter_bytes=spec.get("counter_bytes", 0),
+                                     infer_gaps=spec.get("infer_gaps", False))
+        devices.start()
+        return devices, []
+    return serial.Serial(spec["ports"][0], spec["baudrate"], timeout=1), []
+
+
+def record(spec, path, duration=None, status_interval=60.0, launch_time=None):
+    """
+    Record a source straight to disk without a GUI or any live processing, for unattended logging.
+
+    Recording stops after the duration, or when the process is interrupted (Ctrl+C). The file is
+    always closed properly, and a status line is printed at regular intervals.
+
+    Args:
+        spec (dict): Source spec, see open_source.
+        path (str): Recording path; the extension selects CSV or binary.
+        duration (float): Seconds to record, None to record until interrupted.
+        status_interval (float): Seconds between status lines.
+        launch_time (float): time.perf_counter() time at which the program was launched, to report the
+            time to the first samples.
+
+    Returns:
+        dict: Samples written and blocks dropped by the recorder.
+    """
+    ser, emulators = open_source(spec)
+    engine = AcquisitionEngine(ser, None, None, spec["channels"], spec["sampling_rate"],
+                               counter_bytes=spec.get("counter_bytes", 0), infer_gaps=spec.get("infer_gaps", False))
+    engine.emulators = emulators
+    engine.start_recording(path)
+    print(f"Recording {spec['channels']} channels to {path}, Ctrl+C to stop", flush=True)
+    start = last_status = time.perf_counter()
+    try:
+        while duration is None or time.perf_counter() - start < duration:
+            count = engine.step()
+            if count is not None and launch_time is not None:
+                print(f"First samples {engine.arrival - launch_time:.2f} s after launch", flush=True)
+                launch_time = None
+            now = time.perf_counter()
+            if now - last_status >= status_interval:
+                stats = engine.stats()
+                print(f"{time.strftime('%H:%M:%S')} {engine.samples_received} samples received, "
+                      f"{stats['samples_lost']} lost in {stats['gaps']} gaps, {stats['suspected_lost']} suspected lost, "
+                      f"rate {stats['rate']:.2f} Hz", flush=True)
+                last_status = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        result = engine.stop_recording()
+        engine.close()
+    print(f"Recording stopped: {result['samples_written']} samples written, {result['dropped_blocks']} blocks dropped")
+    return result
+
+
+class AcquisitionEngine:
+    """
+    Acquisition pipeline from the serial port to the ring buffers, one block per step.
+    """
+
+    def __init__(self, ser, buffers, filtered_buffers, channels, sampling_rate, profiler=None, counter_bytes=0,
+                 interpolate_gaps=True, infer_gaps=False):
+        """
+        Constructor for AcquisitionEngine class.
+
+        Args:
+            ser (serial.Serial): Serial object for communication with the board, or a DeviceManager
+                serving the merged stream of several boards.
+            buffers (MultiChannelRingBuffer): Ring buffer for raw data storage, or None to only record.
+            filtered_buffers (MultiChannelRingBuffer): Ring buffer for filtered data storage.
+            channels (int): Number of channels.
+            sampling_rate (int): Sampling rate in Hz.
+            profiler (Profiler): Profiler timing each stage of the acquisition loop.
+            counter_bytes (int): Size of the frame counter sent by the firmware, 0 to detect gaps from arrival times.
+            interpolate_gaps (bool): Fill lost samples by linear interpolation in the live buffers, filters and
+                QRS detection. Recordings always keep the gaps.
+            infer_gaps (bool): Without a frame counter, leave the gaps found from arrival times in the sample
+                indices instead of only reporting them as suspected losses.
+        """
+        self.ser = ser
+        self.buffers = buffers
+        self.filtered_buffers = filtered_buffers
+        self.channels = channels
+        self.sampling_rate = sampling_rate
+        self.parser = FrameParser(channels, counter_bytes=counter_bytes)
+        # The server forwards 240-byte BLE packets, so samples are lost a whole packet at a time
+        self.clock = SampleClock(sampling_rate, packet_samples=240 // (channels + counter_bytes),
+                                 sequence_modulus=self.parser.sequence_modulus, infer_gaps=infer_gaps)
+        self.devices = ser if isinstance(ser, DeviceManager) else None
+        if self.devices is not None:
+            self.clock = self.devices  # the merged stream is indexed and timed by the manager
+            self.devices.interpolate_gaps = interpolate_gaps
+        self.interpolate_gaps = interpolate_gaps
+        self.last_sample = None  # last raw sample and its index, for interpolating across gaps
+        self.last_index = -1
+        self.bytes_received = 0
+        self.samples_received = 0
+        self.profiler = profiler if profiler is not None else Profiler()
+        self.timer = self.profiler.timer()
+        self.arrival = 0.0  # time the last chunk was read
+        self.battery_level = 100
+        self.recorder = None  # set while recording
+        # Notch, low-pass and high-pass stages, crossfaded over 0.1 s when they change
+        self.filters = FilterPipeline(channels, fade=sampling_rate // 10) if buffers is not None else None
+        self.qrs_detector = None  # created in the background, see load_qrs_detector
+        # Stream sample index of the last samples fed to the QRS detector, by detector sample count modulo its
+        # length, to place the R peaks it finds, up to a few RR intervals late, in the recording's index
+        self.qrs_indices = np.zeros(10 * int(sampling_rate), dtype=np.int64)
+        if buffers is not None:
+            threading.Thread(target=self.load_qrs_detector, daemon=True).start()
+        self.visible_channels = None  # channels shown by the GUI, None for all
+        self.filtered_channels = np.ones(channels, dtype=bool)  # channels whose filtered buffer is up to date
+        self.emulators = []  # emulated boards feeding the source, if any
+
+        self.ser.flushInput()
+        self.parser.reset()
+
+    def load_qrs_detector(self):
+        """Create the QRS detector. It needs scipy.signal, which takes longer to import than everything else
+        on the acquisition path, so samples flow while it loads."""
+        from qrs import StreamingQRSDetector
+        self.qrs_detector = StreamingQRSDetector(self.channels, self.sampling_rate)
+
+    def step(self):
+        """
+        Read and process the next block of samples.
+
+        Returns:
+            int: Total number of samples in the raw ring buffer, or received when only recording, or None if
+                no samples were read.
+        """
+        block, indices, received = self.receive_block()
+        if block is None:
+            return None
+        self.samples_received += len(block)
+        recorder = self.recorder
+        if recorder is not None:
+            if received is not None and not received.all():
+                # Samples a board lost are gaps in the recording rather than the values filled in for display
+                complete = received.all(axis=1)
+                if complete.any():
+                    recorder.push(block[complete], indices[complete], self.clock.time_of(indices[complete][0]))
+            else:
+                recorder.push(block, indices, self.clock.time_of(indices[0]))  # the full raw stream, gaps included
+            self.timer.lap("record")
+        if self.buffers is None:
+            return self.samples_received
+        if self.interpolate_gaps and self.last_sample is not None and indices[-1] - self.last_index > len(block):
+            filled = fill_gaps(block, indices, self.last_sample, self.last_index)
+            indices = np.arange(self.last_index + 1, indices[-1] + 1)
+        else:
+            filled = block
+        self.last_sample = block[-1]
+        self.last_index = int(indices[-1])
+        block = filled
+        self.buffers.write(block)
+        self.profiler.block_arrived(self.buffers.count, self.arrival)
+        self.timer.lap("buffer")
+        self.digital_filtering(block)
+        self.timer.lap("filter")
+        qrs_detector = self.qrs_detector
+        if qrs_detector is not None:
+            self.detect_beats(qrs_detector, block, indices)
+            self.timer.lap("qrs")
+        return self.buffers.count
+
+    def detect_beats(self, qrs_detector, block, indices):
+        """Run the QRS detector over a block and add the R peaks it finds to the index of the recording in
+        progress, if any, so the recorder does not need a detector of its own."""
+        start = qrs_detector.count
+        peaks = qrs_detector.process(block)
+        size = len(self.qrs_indices)
+        recorder = self.recorder
+        if recorder is not None and recorder.first_index is not None:
+            for channel, counts in enumerate(peaks):
+                for count in counts:
+                    if count >= start:
+                        sample = int(indices[count - start])
+                    elif 0 <= count and start - count <= size:
+                        sample = int(self.qrs_indices[count % size])
+                    else:
+                        continue
+                    if sample >= recorder.first_index:
+                        recorder.annotate("beat", channel=channel, sample=sample)
+        self.qrs_indices[(start + np.arange(len(block)))[-size:] % size] = indices[-size:]
+
+    def digital_filtering(self, block):
+        """
+        Filter newly arrived samples of the visible channels and store them in the filtered ring buffer.
+
+        Hidden channels are skipped. When a channel becomes visible again its filter is restarted over
+        the raw window so that its trace is complete as soon as it is drawn.
+
+        Args:
+            block (np.ndarray): New samples with shape (n_samples, channels).
+        """
+        active = np.ones(self.channels, dtype=bool)
+        if self.visible_channels is not None:
+            active[:] = False
+            active[self.visible_channels] = True
+        continuing = np.flatnonzero(active & self.filtered_channels)
+        resumed = np.flatnonzero(active & ~self.filtered_channels)
+
+        if len(continuing) == self.channels:
+            self.filtered_buffers.write(self.filters.process(block))
+        else:
+            self.filtered_buffers.write(self.filters.process(block, continuing), continuing)
+        if len(resumed):
+            history = self.buffers.view(len(self.filtered_buffers))[resumed].T
+            self.filtered_buffers.overwrite(resumed, self.filters.restart(resumed, history).T)
+        self.filtered_channels = active
+
+    def receive_block(self):
+        """
+        Read the next block of samples and assign their sample indices.
+
+        Returns:
+            tuple: Samples with shape (n_samples, channels), their sample indices, and for several boards
+                whether each board sent each sample, see DeviceManager.read, else None; (None, None, None)
+                if no samples were read.
+        """
+        if self.devices is not None:
+            self.timer.start()
+            block, indices, received = self.devices.read()
+            self.arrival = time.perf_counter()
+            self.timer.lap("merge")
+            return block, indices, received
+        block = self.receive_data()
+        if block is None or len(block) == 0:
+            return None, None, None
+        indices = self.clock.update(len(block), self.arrival, self.parser.sequence)
+        self.timer.lap("clock")
+        return block, indices, None
+
+    def receive_data(self):
+        """
+        Read all bytes waiting on the serial port and parse them into frames.
+
+        Returns:
+            np.ndarray: Block of samples with shape (n_samples, channels), or None if no data is read.
+        """
+        try:
+            if self.ser.isOpen():
+                waiting = self.ser.in_waiting
+                self.timer.start()
+                chunk = self.ser.read(max(1, waiting))  # blocks up to the timeout when idle
+                self.arrival = time.perf_counter()
+                self.bytes_received += len(chunk)
+                if waiting:
+                    self.timer.lap("receive")
+                else:
+                    self.timer.start()  # don't count time spent waiting for the board
+                block = self.parser.feed(chunk)
+                self.timer.lap("parse")
+                return block
+            else:
+                print("Could not open serial port.")
+                return None
+        except serial.SerialException as e:
+            print(f"Serial port error: {e}")
+            sys.exit(1)
+
+    def start_recording(self, path):
+        """Start writing the raw sample stream to a recording file on a writer thread."""
+        recorder = Recorder(path, self.channels, self.sampling_rate, profiler=self.profiler)
+        recorder.start()
+        self.recorder = recorder
+
+    def stop_recording(self):
+        """
+        Stop the recorder thread once all queued samples have been written.
+
+        Returns:
+            dict: Samples written and blocks dropped because the recorder queue was full.
+        """
+        recorder, self.recorder = self.recorder, None
+        recorder.stop()
+        return {"samples_written": recorder.samples_written, "dropped_blocks": recorder.dropped_blocks}
+
+    def annotate(self, kind, label=""):
+        """Add an event, e.g. a filter change or a marker, to the index of the recording in progress, if any."""
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.annotate(kind, label)
+
+    def stats(self, report=False):
+        """
+        Statistics shown by the GUI.
+
+        Args:
+            report (bool): Include the per-board report of a DeviceManager, which measures throughput
+                since the previous report.
+
+        Returns:
+            dict: Stream, clock, QRS and emulator statistics.
+        """
+        parsers = [device.parser for device in self.devices.devices] if self.devices is not None else [self.parser]
+        heart_rate = self.qrs_detector.heart_rate if self.qrs_detector is not None else np.array([np.nan])
+        stats = {
+            "bytes_received": self.bytes_received if self.devices is None else
+            sum(device.bytes_received for device in self.devices.devices),
+            "frames": sum(parser.frames for parser in parsers),
+            "malformed_frames": sum(parser.malformed_frames for parser in parsers),
+            "dropped_bytes": sum(parser.dropped_bytes for parser in parsers),
+            "samples_lost": self.clock.samples_lost,
+            "gaps": self.clock.gaps,
+            "suspected_lost": self.clock.suspected_lost,
+            "late_blocks": self.clock.late_blocks,
+            "rate": self.clock.rate,
+            "drift": self.clock.drift,
+            "heart_rate": float(np.nanmedian(heart_rate)) if np.isfinite(heart_rate).any() else float("nan"),
+            "battery_level": self.battery_level,
+            "filtered_all": bool(self.filtered_channels.all()),
+            "emulators": [{"samples_sent": e.samples_sent, "packets_dropped": e.packets_dropped,
+                           "packet_frames": e.packet_frames, "overflow_bytes": e.transport.overflow_bytes,
+                           "in_waiting": e.transport.in_waiting} for e in self.emulators],
+        }
+        if report and self.devices is not None:
+            stats["devices"] = self.devices.report()
+        return stats
+
+    def close(self):
+        """Stop recording and the emulated boards, and close the port or the DeviceManager's ports."""
+        if self.recorder is not None:
+            self.stop_recording()
+        for emulator in self.emulators:
+            emulator.stop()
+        if self.devices is not None:
+            self.devices.stop()
+        else:
+            self.ser.close()
+
+
+class FilterStages:
+    """
+    Stand-in for the FilterPipeline of an acquisition process, forwarding stage changes to it.
+    """
+
+    def __init__(self, send):
+        """
+        Constructor for FilterStages class.
+
+        Args:
+            send (callable): Sends a command tuple to the acquisition process.
+        """
+        self.send = send
+        self.stages = {}
+
+    def __contains__(self, name):
+        return name in self.stages
+
+    def set_stage(self, name, sos):
+        self.stages[name] = sos
+        self.send(("set_stage", name, sos))
+
+    def remove_stage(self, name):
+        self.stages.pop(name, None)
+        self.send(("remove_stage", name))
+
+
+class AcquisitionProcess(multiprocessing.get_context("spawn").Process):
+    """
+    Process opening the sample source and running an AcquisitionEngine into shared-memory ring buffers.
+
+    The process is spawned rather than forked, so it starts from a clean interpreter without the
+    GUI's threads and Qt state.
+    """
+
+    def __init__(self, spec, buffers, filtered_buffers, control, commands, notifications):
+        """
+        Constructor for AcquisitionProcess class.
+
+        Args:
+            spec (dict): Source spec for open_source, plus "interpolate_gaps".
+            buffers (dict): SharedRingBuffer.spec() of the raw ring buffer.
+            filtered_buffers (dict): SharedRingBuffer.spec() of the filtered ring buffer.
+            control (str): Shared-memory name of the (2, channels) visible and filtered channel flags.
+            commands (Connection): Pipe end receiving commands and sending their results.
+            notifications (Connection): Pipe end sending sample counts and statistics.
+        """
+        super(AcquisitionProcess, self).__init__(daemon=True)
+        self.spec = spec
+        self.buffer_specs = (buffers, filtered_buffers)
+        self.control_name = control
+        self.commands = commands
+        self.notifications = notifications
+
+    def run(self):
+        """Run method for the process."""
+        from multiprocessing import resource_tracker, shared_memory
+        buffers, filtered_buffers = (SharedRingBuffer(**spec) for spec in self.buffer_specs)
+        control_shm = shared_memory.SharedMemory(name=self.control_name)
+        resource_tracker.unregister(control_shm._name, "shared_memory")
+        channels = self.spec["channels"]
+        control = np.ndarray((2, channels), dtype=np.int8, buffer=control_shm.buf)
+
+        ser, emulators = open_source(self.spec)
+        engine = AcquisitionEngine(ser, buffers, filtered_buffers, channels, self.spec["sampling_rate"],
+                                   Profiler(), self.spec.get("counter_bytes", 0), self.spec.get("interpolate_gaps", True),
+                                   self.spec.get("infer_gaps", False))
+        engine.emulators = emulators
+        running = False
+        last_stats = 0.0
+        while True:
+            # Commands are handled between blocks; until the GUI starts monitoring the process only waits for them
+            while self.commands.poll(0 if running else 0.1):
+                command = self.commands.recv()
+                if command[0] == "close":
+                    engine.close()
+                    return
+                running = self.handle(engine, command, running)
+            if not running:
+                continue
+            now = time.perf_counter()
+            if now - last_stats >= 0.5:
+                self.notifications.send(("stats", self.stats(engine, report=True)))
+                last_stats = now
+            engine.visible_channels = np.flatnonzero(control[0])
+            count = engine.step()
+            control[1] = engine.filtered_channels
+            if count is not None:
+                self.notifications.send(("data", count, engine.arrival))
+                engine.timer.lap("emit")
+
+    def handle(self, engine, command, running):
+        """Carry out a command from the GUI and return whether the engine should be running."""
+        name, args = command[0], command[1:]
+        if name == "flush":
+            engine.ser.flushInput()
+            engine.parser.reset()
+        elif name == "run":
+            running = True
+        elif name == "set_stage":
+            engine.filters.set_stage(*args)
+        elif name == "remove_stage":
+            engine.filters.remove_stage(*args)
+        elif name == "record":
+            engine.start_recording(*args)
+        elif name == "stop_recording":
+            self.commands.send(engine.stop_recording())
+        elif name == "annotate":
+            engine.annotate(*args)
+        elif name == "profile":
+            engine.profiler.enabled = args[0]
+            if args[0]:
+                engine.profiler.reset()
+        elif name == "export_trace":
+            engine.profiler.export_trace(*args)
+        elif name == "stats":
+            self.commands.send(self.stats(engine, *args))
+        return running
+
+    def stats(self, engine, report=False):
+        """The engine's statistics, see AcquisitionEngine.stats, with its stage timings while profiling if
+        report is set."""
+        stats = engine.stats(report)
+        if report and engine.profiler.enabled:
+            stats["profile"] = engine.profiler.summary()
+        return stats
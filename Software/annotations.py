@@ -0,0 +1,556 @@
+"""
+Recording Annotation Index
+
+Sidecar index of a recording, saved next to it as "<recording>.idx.npz", so analyses can jump to
+beats, clean stretches or a time range instead of scanning the whole file. The index holds:
+
+- Events with their sample offsets: detected R peaks ("beat"), segments of lost samples ("gap"),
+  of samples at the ADC limits ("saturation") and of flat or jumping signal ("artefact"), filter
+  changes ("filter") and user markers ("annotation"). Events are sorted by sample, so a time
+  range is found by binary search.
+- Minimum, maximum, mean and RMS of every channel over fixed blocks of samples, from which a
+  view of any length of recording is drawn at any zoom level without reading the samples.
+
+The index is built block by block, by the recorder while recording or from an existing file, and
+is cheap to rebuild, so a recording is always the reference and the index only a shortcut to it.
+
+Classes:
+    IndexBuilder: Builds the index of a recording block by block.
+    RecordingIndex: Reader answering event, beat, clean segment and summary queries.
+
+Functions:
+    index_path: Sidecar index path of a recording.
+    build_index: Build and save the index of an existing recording.
+    load_index: Load the index of a recording, building it first if it is missing or out of date.
+
+Usage:
+    python Software/annotations.py "Data/ecg 1.csv" "Data/recording.bpr"
+"""
+import argparse
+import os
+import numpy as np
+from binary_recording import BinaryRecording, UV_PER_COUNT
+
+VERSION = 1
+EVENT_DTYPE = np.dtype([("sample", "<i8"), ("end", "<i8"), ("channel", "<i2"), ("kind", "<U12"), ("label", "<U128")])
+SEGMENT_KINDS = ("artefact", "saturation", "gap")  # events excluded from clean segments
+
+
+def index_path(path):
+    """Sidecar index path of a recording."""
+    return path + ".idx.npz"
+
+
+def events_array(samples, ends, channels, kind, label=""):
+    """Events of one kind as an EVENT_DTYPE array."""
+    events = np.empty(len(samples), dtype=EVENT_DTYPE)
+    events["sample"] = samples
+    events["end"] = ends
+    events["channel"] = channels
+    events["kind"] = kind
+    events["label"] = label
+    return events
+
+
+class Runs:
+    """
+    Open runs of flagged rows on each channel, closed into segments as the rows arrive.
+    """
+
+    def __init__(self, channels, kind):
+        """
+        Constructor for Runs class.
+
+        Args:
+            channels (int): Number of channels.
+            kind (str): Event kind of the segments.
+        """
+        self.kind = kind
+        self.since = np.full(channels, -1, dtype=np.int64)  # start of the open run of each channel, -1 if none
+
+    def feed(self, flags, positions):
+        """
+        Extend the runs over consecutive rows.
+
+        Args:
+            flags (np.ndarray): Flags with shape (rows, channels).
+            positions (np.ndarray): Sample index at which each row starts.
+
+        Returns:
+            np.ndarray: Events of the runs that ended.
+        """
+        padded = np.vstack([self.since >= 0, flags])
+        starts, ends, channels = [], [], []
+        for row, ch in zip(*np.nonzero(padded[1:] != padded[:-1])):  # in row order
+            if flags[row, ch]:
+                self.since[ch] = positions[row]
+            else:
+                starts.append(self.since[ch])
+                ends.append(positions[row])
+                channels.append(ch)
+                self.since[ch] = -1
+        return events_array(starts, ends, channels, self.kind)
+
+    def open(self, end):
+        """Events of the open runs, as if they ended at sample index end."""
+        channels = np.flatnonzero(self.since >= 0)
+        return events_array(self.since[channels], np.full(len(channels), end), channels, self.kind)
+
+    def close(self, end):
+        """End all open runs at sample index end and return their events."""
+        events = self.open(end)
+        self.since[:] = -1
+        return events
+
+
+class IndexBuilder:
+    """
+    Builds the annotation index of a recording from its samples, block by block.
+    """
+
+    def __init__(self, channels, sampling_rate, summary_samples=250, detect_beats=False, uv_per_count=UV_PER_COUNT,
+                 saturation=(0, 255), flat_rms=2.0, max_step=1000.0):
+        """
+        Constructor for IndexBuilder class.
+
+        Args:
+            channels (int): Number of channels.
+            sampling_rate (float): Sampling rate in Hz.
+            summary_samples (int): Samples per summary block.
+            detect_beats (bool): Detect R peaks with the streaming Pan-Tompkins detector, which imports
+                scipy.signal. Otherwise beats are only those added with add_event, e.g. by a recorder from
+                the live detector.
+            uv_per_count (float): Microvolts per unit of the samples, 1 for samples already in microvolts.
+            saturation (tuple): Lowest and highest sample values, at which samples are saturated; None to
+                not look for saturation.
+            flat_rms (float): RMS in microvolts below which a summary block is flat, e.g. from a lead off.
+            max_step (float): Step in microvolts between consecutive samples above which a summary block
+                is an artefact, e.g. from movement or an electrode pop.
+        """
+        self.channels = channels
+        self.sampling_rate = sampling_rate
+        self.summary_samples = summary_samples
+        self.uv_per_count = uv_per_count
+        self.saturation = saturation
+        self.flat_rms = flat_rms
+        self.max_step = max_step
+        self.next_index = None  # sample index after the last sample added
+        self.last_sample = None  # last sample added, for the step to the next one
+        self.partial = None  # statistics of the summary block still being filled
+        self.summaries = []  # (blocks, counts, minimum, maximum, mean, rms) of completed summary blocks
+        self.last_block = None  # summary block last completed
+        self.events = []  # arrays of events, in no particular order
+        self.saturated = Runs(channels, "saturation")
+        self.artefacts = Runs(channels, "artefact")
+
+        self.detector = None
+        if detect_beats:
+            from qrs import StreamingQRSDetector  # imports scipy.signal
+            self.detector = StreamingQRSDetector(channels, sampling_rate)
+        self.detector_runs = ([], [])  # detector sample count and sample index at the start of each run of samples
+
+    def add(self, block, start_index=None):
+        """
+        Index a block of consecutive samples.
+
+        Args:
+            block (np.ndarray): Samples with shape (n_samples, channels).
+            start_index (int): Sample index of the first sample. Defaults to following on from the
+                previous block; a jump is a gap of lost samples.
+
+        Raises:
+            ValueError: If the block starts before the end of the previous block.
+        """
+        if len(block) == 0:
+            return
+        start_index = (self.next_index or 0) if start_index is None else int(start_index)
+        if self.next_index is not None and start_index != self.next_index:
+            if start_index < self.next_index:
+                raise ValueError(f"samples must be added in order, block at {start_index} is before the end "
+                                 f"of the previous block at {self.next_index}")
+            self.events.append(events_array([self.next_index], [start_index], [-1], "gap"))
+            self.events.append(self.saturated.close(self.next_index))
+            self.last_sample = None
+        if self.detector is not None and (self.next_index is None or start_index != self.next_index):
+            self.detector_runs[0].append(self.detector.count)
+            self.detector_runs[1].append(start_index)
+        x = np.asarray(block, dtype=np.float64)
+        positions = start_index + np.arange(len(x))
+        self.next_index = start_index + len(x)
+
+        if self.saturation is not None:
+            low, high = self.saturation
+            self.events.append(self.saturated.feed((x <= low) | (x >= high), positions))
+        self.summarise(x, positions)
+        if self.detector is not None:
+            self.detect_beats(x)
+
+    def summarise(self, x, positions):
+        """Add samples to the summary blocks, completing the blocks they fill."""
+        steps = np.abs(np.diff(x, axis=0, prepend=x[:1] if self.last_sample is None else self.last_sample[None]))
+        self.last_sample = x[-1]
+        n = self.summary_samples
+        cuts = np.unique(np.r_[0, np.arange(-positions[0] % n, len(x), n)])  # first sample of each summary block
+        blocks = positions[cuts] // n
+        stats = {
+            "count": np.diff(np.r_[cuts, len(x)]),
+            "minimum": np.minimum.reduceat(x, cuts, axis=0),
+            "maximum": np.maximum.reduceat(x, cuts, axis=0),
+            "sum": np.add.reduceat(x, cuts, axis=0),
+            "squares": np.add.reduceat(x ** 2, cuts, axis=0),
+            "step": np.maximum.reduceat(steps, cuts, axis=0),
+        }
+        if self.partial is not None and self.partial["block"] == blocks[0]:
+            previous = self.partial
+            stats["count"][0] += previous["count"]
+            stats["minimum"][0] = np.minimum(stats["minimum"][0], previous["minimum"])
+            stats["maximum"][0] = np.maximum(stats["maximum"][0], previous["maximum"])
+            stats["step"][0] = np.maximum(stats["step"][0], previous["step"])
+            stats["sum"][0] += previous["sum"]
+            stats["squares"][0] += previous["squares"]
+        elif self.partial is not None:
+            self.complete(self.partial["block"][None], {key: value[None] for key, value in self.partial.items()})
+        self.partial = {key: value[-1] for key, value in stats.items()}
+        self.partial["block"] = blocks[-1]
+        if len(blocks) > 1:
+            self.complete(blocks[:-1], {key: value[:-1] for key, value in stats.items()})
+
+    def summary_rows(self, blocks, stats):
+        """Summaries in microvolts and artefact flags of summary blocks from their accumulated statistics."""
+        count = stats["count"][:, None]
+        mean = stats["sum"] / count
+        rms = np.sqrt(np.maximum(stats["squares"] / count - mean ** 2, 0)) * self.uv_per_count
+        flags = (rms < self.flat_rms) | (stats["step"] * self.uv_per_count > self.max_step)
+        rows = (blocks, stats["count"], stats["minimum"] * self.uv_per_count, stats["maximum"] * self.uv_per_count,
+                mean * self.uv_per_count, rms)
+        return rows, flags
+
+    def complete(self, blocks, stats):
+        """Store completed summary blocks and extend the artefact segments over them."""
+        rows, flags = self.summary_rows(blocks, stats)
+        self.summaries.append(rows)
+        # Artefact segments end at gaps of whole summary blocks
+        for rows in np.split(np.arange(len(blocks)), np.flatnonzero(np.diff(blocks) != 1) + 1):
+            if self.last_block is not None and blocks[rows[0]] != self.last_block + 1:
+                self.events.append(self.artefacts.close((self.last_block + 1) * self.summary_samples))
+            self.events.append(self.artefacts.feed(flags[rows], blocks[rows] * self.summary_samples))
+            self.last_block = blocks[rows[-1]]
+
+    def detect_beats(self, x):
+        """Run the QRS detector over samples and add the R peaks it finds as beat events."""
+        peaks = self.detector.process(x)
+        counts = np.concatenate([np.asarray(p, dtype=np.int64) for p in peaks])
+        if len(counts) == 0:
+            return
+        channels = np.repeat(np.arange(self.channels), [len(p) for p in peaks])
+        run_counts, run_starts = (np.asarray(values) for values in self.detector_runs)
+        run = np.maximum(np.searchsorted(run_counts, counts, side="right") - 1, 0)
+        samples = run_starts[run] + counts - run_counts[run]
+        self.events.append(events_array(samples, samples, channels, "beat"))
+
+    def add_event(self, kind, sample=None, end=None, channel=-1, label=""):
+        """
+        Add an event, e.g. a filter change or a user's marker.
+
+        Args:
+            kind (str): Event kind, e.g. "filter" or "annotation".
+            sample (int): Sample index of the event. Defaults to the sample after the last one added.
+            end (int): Sample index after the end of a segment. Defaults to sample, for a point event.
+            channel (int): Channel index, or -1 for all channels.
+            label (str): Description of the event.
+        """
+        sample = (self.next_index or 0) if sample is None else sample
+        self.events.append(events_array([sample], [sample if end is None else end], [channel], kind, label))
+
+    def finish(self):
+        """Complete the last summary block and close the open segments once all samples have been added."""
+        if self.partial is not None:
+            self.complete(self.partial["block"][None], {key: value[None] for key, value in self.partial.items()})
+            self.partial = None
+        end = self.next_index or 0
+        self.events.append(self.saturated.close(end))
+        self.events.append(self.artefacts.close(min((self.last_block + 1) * self.summary_samples, end)
+                                                if self.last_block is not None else end))
+
+    def save(self, path, source_size=None):
+        """
+        Save the index built so far, replacing the file in one step so a reader never sees it half-written.
+
+        Summary blocks still being filled and open segments are saved as they stand, so this can be
+        called at any time while recording.
+
+        Args:
+            path (str): Index path, see index_path.
+            source_size (int): Size in bytes of the recording the index was built from, to tell when it is out of date.
+        """
+        summaries = list(self.summaries)
+        end = self.next_index or 0
+        events = self.events + [self.saturated.open(end)]
+        if self.partial is not None:
+            rows, flags = self.summary_rows(self.partial["block"][None],
+                                            {key: value[None] for key, value in self.partial.items()})
+            summaries.append(rows)
+            runs = Runs(self.channels, "artefact")
+            runs.since = self.artefacts.since.copy()
+            runs.feed(flags, rows[0] * self.summary_samples)
+            events.append(runs.open(end))
+        else:
+            events.append(self.artefacts.open(end))
+        events = np.concatenate(events + [np.empty(0, dtype=EVENT_DTYPE)])
+        events = events[np.argsort(events["sample"], kind="stable")]
+        columns = [np.concatenate(column) for column in zip(*summaries)] if summaries else [np.empty(0)] * 6
+        blocks, counts, minimum, maximum, mean, rms = columns
+        shape = (-1, self.channels)
+
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as file:
+            np.savez(file, version=VERSION, channels=self.channels, sampling_rate=self.sampling_rate,
+                     summary_samples=self.summary_samples, end=end, source_size=-1 if source_size is None else source_size,
+                     summary_block=blocks.astype(np.int64), summary_count=counts.astype(np.int32),
+                     minimum=minimum.reshape(shape).astype(np.float32), maximum=maximum.reshape(shape).astype(np.float32),
+                     mean=mean.reshape(shape).astype(np.float32), rms=rms.reshape(shape).astype(np.float32),
+                     events=events)
+        os.replace(temporary, path)
+
+
+class RecordingIndex:
+    """
+    Reader of a recording's annotation index. Times are in seconds and sample indices in samples from
+    the start of the recording.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor for RecordingIndex class.
+
+        Args:
+            path (str): Index path, see index_path.
+
+        Raises:
+            ValueError: If the file is an index of another version.
+        """
+        with np.load(path) as data:
+            if int(data["version"]) != VERSION:
+                raise ValueError(f"{path} is an index of version {int(data['version'])}, expected {VERSION}")
+            self.channels = int(data["channels"])
+            self.sampling_rate = float(data["sampling_rate"])
+            self.summary_samples = int(data["summary_samples"])
+            self.n_samples = int(data["end"])
+            self.source_size = int(data["source_size"])
+            self.summary_block = data["summary_block"]
+            self.summary_count = data["summary_count"]
+            self.minimum, self.maximum, self.mean, self.rms = (data[key] for key in ("minimum", "maximum", "mean", "rms"))
+            self._events = data["events"]
+        self.longest = int((self._events["end"] - self._events["sample"]).max(initial=0))  # longest segment
+
+    @property
+    def duration(self):
+        """Length of the recording in seconds."""
+        return self.n_samples / self.sampling_rate
+
+    def sample(self, time):
+        """Sample index of a time in seconds."""
+        return int(np.ceil(time * self.sampling_rate - 1e-9))
+
+    def events(self, kind=None, start=0.0, stop=None, channel=None):
+        """
+        Events in a time range, found by binary search.
+
+        Args:
+            kind (str or tuple): Event kind or kinds. Defaults to all kinds.
+            start (float): Start of the range in seconds.
+            stop (float): End of the range in seconds. Defaults to the end of the recording.
+            channel (int): Channel index; events of all channels (channel -1) are included. Defaults to
+                events of every channel.
+
+        Returns:
+            np.ndarray: Events overlapping the range, with the fields of EVENT_DTYPE, in order of their sample.
+        """
+        first = self.sample(start)
+        last = self.n_samples if stop is None else self.sample(stop)
+        lower = np.searchsorted(self._events["sample"], first - self.longest, side="left")
+        upper = np.searchsorted(self._events["sample"], last, side="left")
+        events = self._events[lower:upper]
+        mask = (events["end"] > first) | (events["sample"] >= first)
+        if kind is not None:
+            mask &= np.isin(events["kind"], [kind] if isinstance(kind, str) else list(kind))
+        if channel is not None:
+            mask &= (events["channel"] == channel) | (events["channel"] == -1)
+        return events[mask]
+
+    def beats(self, channel, start=0.0, stop=None):
+        """Sample indices of the R peaks detected on a channel in a time range."""
+        return self.events("beat", start, stop, channel)["sample"]
+
+    def clean_segments(self, duration, channels=None, start=0.0, stop=None, exclude=SEGMENT_KINDS):
+        """
+        Consecutive windows without gaps, saturation or artefacts, e.g. as analysis intervals.
+
+        Args:
+            duration (float): Window length in seconds.
+            channels (list): Channel indices that must all be clean. Defaults to all channels.
+            start (float): Start of the range searched in seconds.
+            stop (float): End of the range searched in seconds. Defaults to the end of the recording.
+            exclude (tuple): Event kinds that make a stretch unclean.
+
+        Returns:
+            np.ndarray: (start, end) times in seconds of each window, with shape (windows, 2).
+        """
+        first = self.sample(start)
+        last = self.n_samples if stop is None else min(self.sample(stop), self.n_samples)
+        events = self.events(exclude, start, stop)
+        if channels is not None:
+            events = events[np.isin(events["channel"], np.r_[-1, channels])]
+        # Clean stretches are the gaps between the merged unclean segments
+        order = np.argsort(events["sample"], kind="stable")
+        ends = np.maximum.accumulate(np.maximum(events["end"][order], events["sample"][order] + 1))
+        bounds = np.r_[first, ends], np.r_[events["sample"][order], last]
+        length = int(round(duration * self.sampling_rate))
+        windows = []
+        for clean_start, clean_end in zip(*bounds):
+            clean_start = max(clean_start, first)
+            count = (min(clean_end, last) - clean_start) // length
+            windows.extend(clean_start + length * np.arange(max(count, 0)))
+        windows = np.asarray(windows, dtype=np.float64) / self.sampling_rate
+        return np.column_stack([windows, windows + duration])
+
+    def summary(self, start=0.0, stop=None, bins=1000, channels=None):
+        """
+        Minimum, maximum and RMS in microvolts over a time range, merged into at most `bins` bins, for
+        drawing a long recording at any zoom level without reading its samples.
+
+        Args:
+            start (float): Start of the range in seconds.
+            stop (float): End of the range in seconds. Defaults to the end of the recording.
+            bins (int): Largest number of bins.
+            channels (list): Channel indices. Defaults to all channels.
+
+        Returns:
+            dict: "time" of the start of each bin with shape (bins,), and "minimum", "maximum", "mean" and
+                "rms" with shape (bins, channels), at the resolution of the summary blocks at most.
+        """
+        n = self.summary_samples
+        first = np.searchsorted(self.summary_block, self.sample(start) // n, side="left")
+        last = np.searchsorted(self.summary_block, -(-(self.n_samples if stop is None else self.sample(stop)) // n),
+                               side="left")
+        columns = slice(None) if channels is None else channels
+        if last <= first:
+            empty = np.empty((0, self.channels))[:, columns]
+            return {"time": np.empty(0), "minimum": empty, "maximum": empty, "mean": empty, "rms": empty}
+
+        cuts = np.unique(np.linspace(first, last, min(bins, last - first) + 1).astype(int))[:-1]
+        counts = self.summary_count[first:last, None].astype(np.float64)
+        mean = self.mean[first:last, columns].astype(np.float64)
+        power = (self.rms[first:last, columns].astype(np.float64) ** 2 + mean ** 2) * counts
+        total = np.add.reduceat(counts, cuts - first, axis=0)
+        merged_mean = np.add.reduceat(mean * counts, cuts - first, axis=0) / total
+        merged_power = np.add.reduceat(power, cuts - first, axis=0) / total
+        return {
+            "time": self.summary_block[cuts] * n / self.sampling_rate,
+            "minimum": np.minimum.reduceat(self.minimum[first:last, columns], cuts - first, axis=0),
+            "maximum": np.maximum.reduceat(self.maximum[first:last, columns], cuts - first, axis=0),
+            "mean": merged_mean,
+            "rms": np.sqrt(np.maximum(merged_power - merged_mean ** 2, 0)),
+        }
+
+
+def recording_runs(path, chunk_samples=250 * 600, microvolts=False):
+    """
+    Runs of consecutive samples of a recording, read chunk by chunk.
+
+    Args:
+        path (str): CSV or binary recording.
+        chunk_samples (int): Samples per chunk read from a binary recording.
+        microvolts (bool): Scale the samples of a binary recording to microvolts instead of ADC counts.
+
+    Yields:
+        tuple: Samples with shape (n_samples, channels) and the sample index of the first.
+    """
+    if path.endswith(".bpr"):
+        recording = BinaryRecording(path)
+        start = int(recording.block_index.min(initial=0))
+        end = int((recording.block_index + recording.block_counts).max(initial=0))
+        for first in range(start, end, chunk_samples):
+            indices = recording.indices(first, first + chunk_samples)
+            data = recording.read(first, first + chunk_samples, microvolts=microvolts)
+            bounds = np.r_[0, np.flatnonzero(np.diff(indices) != 1) + 1, len(indices)]
+            for run_start, run_stop in zip(bounds[:-1], bounds[1:]):
+                yield data[run_start:run_stop], int(indices[run_start])
+    else:
+        import pandas as pd
+        df = pd.read_csv(path, usecols=lambda column: column != "Timestamp")
+        data = df[[c for c in df.columns if c.startswith("Channel_")]].to_numpy()
+        indices = df["Sample"].to_numpy() - df["Sample"].iloc[0] if "Sample" in df.columns else np.arange(len(df))
+        bounds = np.r_[0, np.flatnonzero(np.diff(indices) != 1) + 1, len(indices)]
+        for run_start, run_stop in zip(bounds[:-1], bounds[1:]):
+            yield data[run_start:run_stop], int(indices[run_start])
+
+
+def build_index(path, sampling_rate=250, detect_beats=True, **kwargs):
+    """
+    Build the index of an existing recording and save it next to it.
+
+    Args:
+        path (str): CSV or binary recording.
+        sampling_rate (float): Sampling rate of a CSV recording in Hz; binary recordings store theirs.
+        detect_beats (bool): Detect R peaks in the recording.
+        **kwargs: Other IndexBuilder options.
+
+    Returns:
+        RecordingIndex: The saved index.
+    """
+    microvolts = False
+    if path.endswith(".bpr"):
+        recording = BinaryRecording(path)
+        channels, sampling_rate = recording.channels, recording.sampling_rate
+        if recording.dtype != np.uint8:
+            # Filtered recordings are indexed in microvolts, and are not limited by the ADC range
+            microvolts = True
+            kwargs = dict(kwargs, uv_per_count=1.0, saturation=None)
+    else:
+        import pandas as pd
+        values = pd.read_csv(path, usecols=lambda column: column.startswith("Channel_")).to_numpy()
+        channels = values.shape[1]
+        if not (np.all(values == np.round(values)) and values.min(initial=0) >= 0 and values.max(initial=0) <= 255):
+            kwargs = dict(kwargs, saturation=None)  # fractional (filtered) counts
+    builder = IndexBuilder(channels, sampling_rate, detect_beats=detect_beats, **kwargs)
+    for run, start_index in recording_runs(path, microvolts=microvolts):
+        builder.add(run, start_index)
+    builder.finish()
+    builder.save(index_path(path), os.path.getsize(path))
+    return RecordingIndex(index_path(path))
+
+
+def load_index(path, **kwargs):
+    """
+    Load the index of a recording, building it first if it is missing or was built from an earlier
+    state of the file, e.g. by a recorder that did not finish.
+
+    Args:
+        path (str): CSV or binary recording.
+        **kwargs: build_index options.
+
+    Returns:
+        RecordingIndex: The recording's index.
+    """
+    if os.path.exists(index_path(path)):
+        try:
+            index = RecordingIndex(index_path(path))
+            if index.source_size == os.path.getsize(path):
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+    return build_index(path, **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the annotation index of recordings.")
+    parser.add_argument("recordings", nargs="+", help="CSV or .bpr recordings")
+    parser.add_argument("--sampling-rate", type=float, default=250, help="sampling rate of CSV recordings in Hz")
+    args = parser.parse_args()
+
+    for path in args.recordings:
+        index = build_index(path, args.sampling_rate)
+        kinds, counts = np.unique(index.events()["kind"], return_counts=True)
+        found = ", ".join(f"{count} {kind}" for kind, count in zip(kinds, counts)) or "no events"
+        print(f"{os.path.basename(path)}: {index.duration:.0f} s, {found} -> {os.path.basename(index_path(path))}")
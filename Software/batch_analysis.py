@@ -0,0 +1,196 @@
+"""
+Batch Analysis
+
+Runs the analyses from plotting.py on every recording in a directory, spreading the
+file x channel work across a process pool and collecting the numeric results into one
+summary table. Channels are indexed by sample number, with samples lost in transmission
+interpolated, so analysis intervals refer to the same samples however many were lost
+before them. SNR analyses run headless unless --plots is given. Results are cached by
+recording content hash and analysis parameters, so reruns only process recordings or
+settings that changed. With --clean, each channel is analysed over its first stretch of the
+interval's length without gaps, saturation or artefacts, found in the recording's annotation
+index, rather than over the same fixed interval in every file.
+
+Usage:
+    python Software/batch_analysis.py --analyses snr snr_emg --interval 0 10
+    python Software/batch_analysis.py --analyses snr --interval 0 10 --clean
+    python Software/batch_analysis.py --analyses channels spectrogram --output Software/Plots/summary.parquet
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import matplotlib
+matplotlib.use("Agg")  # workers render figures without a display
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import plotting
+from annotations import load_index
+from binary_recording import BinaryRecording
+
+ANALYSES = ("snr", "snr_emg", "channels", "spectrogram")
+ANALYSIS_VERSION = 2  # part of the cache key; increment when the analyses change their results
+
+
+def find_recordings(directory):
+    """Find recordings in a directory, listing each recording once even if it has a .bpr copy."""
+    recordings = {}
+    for filename in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(filename)
+        if ext == ".csv" or (ext == ".bpr" and stem not in recordings):
+            recordings[stem] = os.path.join(directory, filename)
+    return list(recordings.values())
+
+
+def file_hash(path):
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load(path):
+    """Load a CSV or binary recording as a DataFrame."""
+    if path.endswith(".bpr"):
+        return BinaryRecording(path).to_dataframe()
+    return plotting.load_recording(path)
+
+
+def channel_numbers(path):
+    """Channel numbers of a recording, read from its header only."""
+    if path.endswith(".bpr"):
+        return list(range(1, BinaryRecording(path).channels + 1))
+    columns = pd.read_csv(path, nrows=0).columns
+    return [int(c.split("_")[1]) for c in columns if c.startswith("Channel_")]
+
+
+def channel_samples(df, channel):
+    """
+    Samples of one channel at consecutive sample numbers.
+
+    Args:
+        df (pd.DataFrame): Recording loaded by `load`.
+        channel (int): Channel number, starting at 1.
+
+    Returns:
+        pd.Series: Samples from the first to the last recorded sample number, with any missing
+            samples linearly interpolated. Recordings without a Sample column are returned as they are.
+    """
+    y = df[f"Channel_{channel}"]
+    if "Sample" not in df.columns:
+        return y
+    samples = df["Sample"].to_numpy()
+    y = pd.Series(y.to_numpy(dtype=float), index=samples)
+    return y.reindex(np.arange(samples[0], samples[-1] + 1)).interpolate().reset_index(drop=True)
+
+
+def analyse_channel(path, channel, params):
+    """
+    Run the requested analyses on one channel of one recording.
+
+    Args:
+        path (str): Recording path.
+        channel (int): Channel number, starting at 1.
+        params (dict): Analysis parameters from the command line.
+
+    Returns:
+        list: Summary rows as dictionaries.
+    """
+    df = load(path)
+    y = channel_samples(df, channel)
+    name = os.path.splitext(os.path.basename(path))[0]
+    interval = tuple(params["interval"])
+    if params["clean"]:
+        start, end = interval
+        windows = load_index(path).clean_segments(end - start, channels=[channel - 1], start=start)
+        if len(windows) == 0:
+            return [{"file": os.path.basename(path), "channel": channel, "analysis": analysis, "start": None,
+                     "end": None, "value": None} for analysis in params["analyses"]]
+        interval = tuple(windows[0])
+    rows = []
+    for analysis in params["analyses"]:
+        row = {"file": os.path.basename(path), "channel": channel, "analysis": analysis, "start": interval[0],
+               "end": interval[1], "value": None}
+        if analysis == "snr":
+            row["value"] = plotting.SNR(y, interval, threshold=params["threshold"], plot=params["plots"])
+        elif analysis == "snr_emg":
+            row["value"] = plotting.SNR_emg(y, interval, plot=params["plots"])
+        elif analysis == "channels":
+            plotting.save_plot_channels2(df, title=f"{name} Channel {channel} ", xlims=interval, channels=[channel])
+        elif analysis == "spectrogram":
+            plotting.save_subplots_spectogram(y, xlims=interval, title=f"{name} Channel {channel} Spectogram ")
+        plt.close("all")
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run analyses on every recording in a directory.")
+    parser.add_argument("--data", default=os.path.join(os.getcwd(), "Data"), help="directory of recordings")
+    parser.add_argument("--analyses", nargs="+", choices=ANALYSES, default=["snr"])
+    parser.add_argument("--interval", nargs=2, type=float, default=(0, 10), help="analysis interval in seconds")
+    parser.add_argument("--threshold", type=float, default=250, help="R-peak threshold for snr (uV)")
+    parser.add_argument("--clean", action="store_true",
+                        help="analyse the first clean stretch of the interval's length from the interval start")
+    parser.add_argument("--plots", action="store_true", help="also save SNR figures (snr and snr_emg are headless by default)")
+    parser.add_argument("--output", default=os.path.join(os.getcwd(), "Software", "Plots", "summary.csv"),
+                        help="summary table, .csv or .parquet")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--force", action="store_true", help="ignore cached results")
+    args = parser.parse_args(argv)
+
+    params = {"analyses": sorted(args.analyses), "interval": list(args.interval), "threshold": args.threshold,
+              "plots": args.plots, "clean": args.clean}
+    cache_path = os.path.splitext(args.output)[0] + ".cache.json"
+    cache = {}
+    if os.path.exists(cache_path) and not args.force:
+        with open(cache_path) as file:
+            cache = json.load(file)
+
+    # One task per file x channel, skipping those whose content and parameters are unchanged
+    tasks = {}
+    results = {}
+    for path in find_recordings(args.data):
+        if args.clean:
+            load_index(path)  # built here if needed, rather than by several workers at once
+        content = file_hash(path)
+        for channel in channel_numbers(path):
+            key = hashlib.sha256(json.dumps([content, channel, params, ANALYSIS_VERSION]).encode()).hexdigest()
+            if key in cache:
+                results[key] = cache[key]
+            else:
+                tasks[key] = (path, channel)
+    print(f"{len(tasks)} tasks to run, {len(results)} cached")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(analyse_channel, path, channel, params): key
+                   for key, (path, channel) in tasks.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            path, channel = tasks[key]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                print(f"{os.path.basename(path)} channel {channel} failed: {e}", file=sys.stderr)
+
+    cache.update(results)
+    with open(cache_path, "w") as file:
+        json.dump(cache, file)
+
+    summary = pd.DataFrame([row for rows in results.values() for row in rows],
+                           columns=["file", "channel", "analysis", "start", "end", "value"])
+    summary = summary.sort_values(["file", "channel", "analysis"]).reset_index(drop=True)
+    if args.output.endswith(".parquet"):
+        summary.to_parquet(args.output, index=False)
+    else:
+        summary.to_csv(args.output, index=False)
+    print(f"Summary of {len(summary)} results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Binary Recording Format
+
+Compact container for multi-channel recordings (.bpr). A 64-byte header holds the channel
+count, sampling rate, ADC scaling and start time, followed by fixed-size records of raw
+integer samples, each tagged with the sample index of its first sample. Fixed-size records
+let the reader expose the samples as np.memmap views, so analysis can slice long recordings
+without loading them.
+
+Classes:
+    BinaryRecordingWriter: Appends sample blocks to a .bpr file.
+    BinaryRecording: Memory-mapped reader for .bpr files.
+
+Functions:
+    convert_csv: Convert a CSV recording from the Data/ directory to a .bpr file.
+
+Usage:
+    Run the script to convert every CSV recording in Data/ to the binary format.
+"""
+import os
+import struct
+import numpy as np
+
+MAGIC = b"BPR1"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI4sdddd16x")  # padded to 64 bytes
+UV_PER_COUNT = 3.3 / 256 / 1100 * 1000000  # 8-bit ADC, 3.3 V reference, front-end gain of 1100
+
+
+def record_dtype(channels, block_samples, sample_dtype):
+    """Structured dtype of one fixed-size record: first sample index, valid samples and data."""
+    return np.dtype([
+        ("index", "<i8"),
+        ("count", "<u4"),
+        ("reserved", "<u4"),
+        ("data", np.dtype(sample_dtype), (block_samples, channels)),
+    ])
+
+
+class BinaryRecordingWriter:
+    """
+    Writer for .bpr recordings.
+
+    Samples are gathered into the current record, which is rewritten in place on every flush
+    so that a crash loses at most the samples since the last flush.
+    """
+
+    def __init__(self, path, channels, sampling_rate, dtype=np.uint8, block_samples=250,
+                 uv_per_count=UV_PER_COUNT, counts_per_unit=1.0, start_time=None):
+        """
+        Constructor for BinaryRecordingWriter class.
+
+        Args:
+            path (str): Output file path.
+            channels (int): Number of channels.
+            sampling_rate (float): Sampling rate in Hz.
+            dtype: Stored sample type, uint8, int8 or int16.
+            block_samples (int): Samples per record.
+            uv_per_count (float): Microvolts per ADC count.
+            counts_per_unit (float): Stored units per ADC count, for fractional (filtered) data.
+            start_time (float): POSIX time of the first sample. Defaults to the time of the first block.
+        """
+        self.channels = channels
+        self.sampling_rate = sampling_rate
+        self.uv_per_count = uv_per_count
+        self.start_time = start_time
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        self.block_samples = block_samples
+        self.counts_per_unit = counts_per_unit
+        self.record = np.zeros(1, dtype=record_dtype(channels, block_samples, self.dtype))[0]
+        self.next_index = 0
+        self.file = open(path, "wb")
+        self.write_header()
+        self.record_offset = self.file.tell()
+
+    def write_header(self):
+        """Write the header at the start of the file."""
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.channels, self.block_samples, self.dtype.str.encode(),
+                                    self.sampling_rate, self.uv_per_count, self.counts_per_unit,
+                                    self.start_time or 0.0))
+
+    def write(self, block, timestamp=None, start_index=None):
+        """
+        Append a block of samples.
+
+        Args:
+            block (np.ndarray): Samples with shape (n_samples, channels).
+            timestamp (datetime): Arrival time of the block, used as the start time if none was given.
+            start_index (int): Sample index of the first sample. Defaults to following on from
+                the previous block; a jump starts a new record so that gaps are preserved.
+        """
+        if self.start_time is None and timestamp is not None:
+            self.start_time = timestamp.timestamp()
+            self.write_header()
+        if start_index is not None and start_index != self.next_index:
+            self._finish_record()
+            self.next_index = start_index
+        if self.record["count"] == 0:
+            self.record["index"] = self.next_index
+
+        pos = 0
+        while pos < len(block):
+            count = int(self.record["count"])
+            n = min(len(block) - pos, self.block_samples - count)
+            self.record["data"][count:count + n] = block[pos:pos + n]
+            self.record["count"] = count + n
+            pos += n
+            if self.record["count"] == self.block_samples:
+                self._finish_record()
+                self.record["index"] = self.next_index + pos
+        self.next_index += len(block)
+
+    def _finish_record(self):
+        """Write the current record and start a new one."""
+        if self.record["count"]:
+            self.flush()
+            self.record_offset = self.file.tell()
+            self.record["count"] = 0
+            self.record["data"] = 0
+
+    def flush(self):
+        """Write the current (possibly partial) record in place and flush to disk."""
+        if self.record["count"]:
+            self.file.seek(self.record_offset)
+            self.file.write(self.record.tobytes())
+        self.file.flush()
+
+    def close(self):
+        """Write any remaining samples and close the file."""
+        self._finish_record()
+        self.file.close()
+
+
+class BinaryRecording:
+    """
+    Memory-mapped reader for .bpr recordings.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor for BinaryRecording class.
+
+        Args:
+            path (str): Path to a .bpr file.
+        """
+        with open(path, "rb") as file:
+            fields = HEADER.unpack(file.read(HEADER.size))
+        magic, version, self.channels, self.block_samples, dtype, self.sampling_rate, \
+            self.uv_per_count, self.counts_per_unit, self.start_time = fields
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a binary recording")
+        self.dtype = np.dtype(dtype.rstrip(b"\x00").decode())
+
+        dtype = record_dtype(self.channels, self.block_samples, self.dtype)
+        n_records = (os.path.getsize(path) - HEADER.size) // dtype.itemsize
+        self.records = np.memmap(path, dtype=dtype, mode="r", offset=HEADER.size, shape=(n_records,))
+        self.block_index = np.asarray(self.records["index"])
+        self.block_counts = np.asarray(self.records["count"])
+        self.n_samples = int(self.block_counts.sum())
+
+    @property
+    def data(self):
+        """Memory-mapped samples with shape (n_records, block_samples, channels)."""
+        return self.records["data"]
+
+    def channel(self, i):
+        """Memory-mapped samples of one channel with shape (n_records, block_samples)."""
+        return self.records["data"][:, :, i]
+
+    def read(self, start=0, stop=None, microvolts=False):
+        """
+        Read the samples with sample indices in [start, stop).
+
+        Only the records overlapping the range are touched. Samples missing from the
+        recording (gaps) are not returned; use `indices` to get matching sample indices.
+
+        Args:
+            start (int): First sample index.
+            stop (int): Sample index after the last sample. Defaults to the end of the recording.
+            microvolts (bool): Scale to microvolts instead of ADC counts.
+
+        Returns:
+            np.ndarray: Samples with shape (n_samples, channels).
+        """
+        first, last, mask = self._select(start, stop)
+        data = self.records["data"][first:last].reshape(-1, self.channels)[mask]
+        if self.counts_per_unit != 1 or microvolts:
+            data = data / self.counts_per_unit
+        if microvolts:
+            data = data * self.uv_per_count
+        return data
+
+    def indices(self, start=0, stop=None):
+        """Sample indices of the samples returned by `read` for the same range."""
+        first, last, mask = self._select(start, stop)
+        offsets = self.block_index[first:last, None] + np.arange(self.block_samples)
+        return offsets.reshape(-1)[mask]
+
+    def _select(self, start, stop):
+        """Find the records overlapping [start, stop) and a mask of the valid samples in them."""
+        end = self.block_index + self.block_counts
+        stop = end.max(initial=0) if stop is None else stop
+        first = int(np.searchsorted(end, start, side="right"))
+        last = int(np.searchsorted(self.block_index, stop, side="left"))
+        offsets = self.block_index[first:last, None] + np.arange(self.block_samples)
+        valid = np.arange(self.block_samples) < self.block_counts[first:last, None]
+        mask = valid & (offsets >= start) & (offsets < stop)
+        return first, last, mask.reshape(-1)
+
+    def to_dataframe(self):
+        """Load the recording as a DataFrame with the same Sample and Channel_i columns as the CSV files."""
+        import pandas as pd
+        df = pd.DataFrame(self.read(), columns=[f"Channel_{i+1}" for i in range(self.channels)])
+        df.insert(0, "Sample", self.indices())
+        return df
+
+
+def parse_timestamp(text):
+    """Parse a recording timestamp, either ISO (as written by the monitor) or day-first."""
+    import pandas as pd
+    try:
+        return pd.to_datetime(text, format="ISO8601")
+    except ValueError:
+        return pd.to_datetime(text, dayfirst=True)
+
+
+def convert_csv(csv_path, out_path=None, sampling_rate=250):
+    """
+    Convert a CSV recording to the binary format.
+
+    Recordings of raw 8-bit ADC counts are stored as uint8. Recordings holding fractional
+    (filtered) values are stored as int16 with a power-of-two number of stored units per count.
+    Gaps in the Sample column of recordings that have one are kept.
+
+    Args:
+        csv_path (str): Path to the CSV recording.
+        out_path (str): Output path. Defaults to the CSV path with a .bpr extension.
+        sampling_rate (float): Sampling rate of the recording in Hz.
+
+    Returns:
+        str: Output path.
+    """
+    import pandas as pd
+    df = pd.read_csv(csv_path)
+    columns = [c for c in df.columns if c.startswith("Channel_")]
+    values = df[columns].to_numpy()
+    start_time = parse_timestamp(df["Timestamp"].iloc[0]).timestamp() if len(df) else 0.0
+
+    if np.all(values == np.round(values)) and values.min(initial=0) >= 0 and values.max(initial=0) <= 255:
+        dtype, counts_per_unit = np.uint8, 1.0
+    else:
+        max_abs = max(np.abs(values).max(), 1.0)
+        dtype, counts_per_unit = np.int16, 2.0 ** np.floor(np.log2(32767 / max_abs))
+    samples = np.round(values * counts_per_unit).astype(dtype)
+
+    out_path = out_path or os.path.splitext(csv_path)[0] + ".bpr"
+    writer = BinaryRecordingWriter(out_path, len(columns), sampling_rate, dtype=dtype,
+                                   counts_per_unit=counts_per_unit, start_time=start_time)
+    if "Sample" in df.columns:
+        indices = df["Sample"].to_numpy()
+        bounds = [0, *(np.flatnonzero(np.diff(indices) != 1) + 1), len(samples)]
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            writer.write(samples[start:stop], start_index=int(indices[start] - indices[0]))
+    else:
+        writer.write(samples)
+    writer.close()
+    return out_path
+
+
+if __name__ == "__main__":
+    path = os.getcwd() + "/Data/"
+    for filename in sorted(os.listdir(path)):
+        if filename.endswith(".csv"):
+            out_path = convert_csv(path + filename)
+            print(f"{filename} ({os.path.getsize(path + filename)} bytes) -> "
+                  f"{os.path.basename(out_path)} ({os.path.getsize(out_path)} bytes)")
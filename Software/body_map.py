@@ -0,0 +1,108 @@
+"""
+Body-Surface Potential Map
+
+Live heatmap of the potential across the electrode array. Electrode positions are read from a
+layout file and inverse-distance interpolation weights from the electrodes to every pixel of
+a torso grid are computed once, so each frame is a single matrix-vector product of the weight
+matrix with the latest sample of every channel.
+
+Layout files are CSVs with the columns Channel (1-based), Label, x and y, where x and y are in
+torso coordinates from 0 to 1: x runs from the patient's right to left, y from waist to neck.
+
+Classes:
+    BodySurfaceMap: Plot widget drawing the interpolated potential map.
+
+Functions:
+    load_layout: Read electrode positions from a layout file.
+    idw_matrix: Inverse-distance interpolation weights from electrodes to grid pixels.
+"""
+import numpy as np
+import pyqtgraph as pg
+
+
+def load_layout(path):
+    """
+    Read electrode positions from a layout file.
+
+    Args:
+        path (str): Layout CSV path.
+
+    Returns:
+        tuple: Zero-based channel indices, labels and (electrodes, 2) positions.
+    """
+    import pandas as pd
+    layout = pd.read_csv(path)
+    return layout["Channel"].to_numpy() - 1, layout["Label"].astype(str).tolist(), layout[["x", "y"]].to_numpy(float)
+
+
+def idw_matrix(positions, resolution=64, power=2):
+    """
+    Inverse-distance weights interpolating electrode values onto a square grid.
+
+    Args:
+        positions (np.ndarray): Electrode positions with shape (electrodes, 2) in torso coordinates.
+        resolution (int): Grid size in pixels along each axis.
+        power (float): Distance exponent; higher values make each electrode's area sharper.
+
+    Returns:
+        np.ndarray: Weights with shape (resolution * resolution, electrodes), each row summing to 1.
+            Row r * resolution + c is the pixel at x = c, y = r.
+    """
+    axis = (np.arange(resolution) + 0.5) / resolution
+    grid = np.stack(np.meshgrid(axis, axis), axis=-1).reshape(-1, 2)
+    distance = np.linalg.norm(grid[:, None, :] - positions[None, :, :], axis=-1)
+    weights = 1 / np.maximum(distance, 1e-6) ** power  # pixels on an electrode take its value
+    return (weights / weights.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+class BodySurfaceMap(pg.PlotWidget):
+    """
+    Plot widget drawing the body-surface potential interpolated from the latest samples.
+    """
+
+    def __init__(self, layout_path, channels, resolution=64, parent=None):
+        """
+        Constructor for BodySurfaceMap class.
+
+        Args:
+            layout_path (str): Electrode layout CSV path.
+            channels (int): Number of channels in the stream; layout entries beyond it are ignored.
+            resolution (int): Grid size in pixels along each axis.
+            parent: Parent widget.
+        """
+        super(BodySurfaceMap, self).__init__(parent)
+        indices, labels, positions = load_layout(layout_path)
+        used = indices < channels
+        self.indices = indices[used]
+        self.resolution = resolution
+        self.weights = idw_matrix(positions[used], resolution)
+
+        # Image in torso coordinates with the electrodes marked on top
+        self.setAspectLocked(True)
+        self.setMouseEnabled(x=False, y=False)
+        self.setMenuEnabled(False)
+        self.hideButtons()
+        self.hideAxis("left")
+        self.hideAxis("bottom")
+        self.image = pg.ImageItem(np.zeros((resolution, resolution), dtype=np.float32), axisOrder="row-major")
+        self.image.setRect(0, 0, 1, 1)  # the rect scales the current image, so it must be set after one exists
+        self.image.setColorMap(pg.colormap.get("CET-D1"))
+        self.addItem(self.image)
+        self.addItem(pg.ScatterPlotItem(*positions[used].T, size=6, brush="w", pen=None))
+        labelled = used if used.sum() <= 16 else np.zeros_like(used)  # dense arrays are unreadable with labels
+        for label, (x, y) in zip(np.array(labels)[labelled], positions[labelled]):
+            text = pg.TextItem(label, anchor=(0.5, 1.2))
+            text.setPos(x, y)
+            self.addItem(text)
+        self.setRange(xRange=(0, 1), yRange=(0, 1), padding=0.02)
+
+    def set_frame(self, values, level):
+        """
+        Redraw the map from one value per channel.
+
+        Args:
+            values (np.ndarray): Value of every channel, shape (channels,).
+            level (float): Magnitude mapped to the ends of the diverging colour map.
+        """
+        frame = self.weights @ np.asarray(values, dtype=np.float32)[self.indices]
+        self.image.setImage(frame.reshape(self.resolution, self.resolution), levels=(-level, level), autoLevels=False)
@@ -0,0 +1,194 @@
+"""
+Multi-Channel Ring Buffer
+
+Preallocated (channels, capacity) ring buffer used to share samples between the serial
+thread, the plots and the recorder. Every sample is stored twice in a double-length
+array, so the most recent N samples of each channel are always contiguous and can be
+returned as a read-only view without copying.
+
+The only state shared with readers is the total sample count, which the writer publishes
+with a single store after the samples are in place, and from which the write position is
+derived. A shared-memory variant keeps the samples and the count in a
+multiprocessing.shared_memory block, so that an acquisition process can fill the buffer
+while the GUI process maps it read-only.
+
+Classes:
+    MultiChannelRingBuffer: Mirrored 2-D ring buffer accepting whole sample blocks.
+    SharedRingBuffer: MultiChannelRingBuffer stored in shared memory.
+"""
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+
+
+class MultiChannelRingBuffer:
+    """
+    Mirrored ring buffer holding the latest `capacity` samples of every channel.
+    """
+
+    def __init__(self, channels, capacity, dtype=np.uint8):
+        """
+        Constructor for MultiChannelRingBuffer class.
+
+        Args:
+            channels (int): Number of channels.
+            capacity (int): Number of samples kept per channel.
+            dtype: Sample data type.
+        """
+        self.channels = channels
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self._data = np.zeros((channels, 2 * capacity), dtype=self.dtype)
+        self.count = 0  # total number of samples written
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def index(self):
+        """Next write position in [0, capacity)."""
+        return self.count % self.capacity
+
+    def write(self, block, channels=None):
+        """
+        Append a block of samples for all channels in a single write.
+
+        Args:
+            block (np.ndarray): Samples with shape (n_samples, channels), or (n_samples, len(channels))
+                when only some channels are written.
+            channels (np.ndarray): Indices of the channels in block. The buffer still advances for all
+                channels; the samples of the others are left stale until they are overwritten.
+        """
+        n = len(block)
+        if n == 0:
+            return
+        data = np.asarray(block)[-self.capacity:].T
+        m = data.shape[1]
+        rows = slice(None) if channels is None else channels
+
+        # Write into [start, start + m) and mirror each sample half a buffer away; samples of
+        # blocks longer than the buffer that would be overwritten straight away are skipped
+        start = (self.count + n - m) % self.capacity
+        split = min(start + m, self.capacity) - start
+        self._data[rows, start:start + m] = data
+        self._data[rows, start + self.capacity:start + split + self.capacity] = data[:, :split]
+        self._data[rows, :m - split] = data[:, split:]
+
+        # Publish the new samples only once they are in place
+        self.count += n
+
+    def overwrite(self, channels, window):
+        """
+        Replace the most recent samples of some channels, e.g. to backfill stale channels.
+
+        Args:
+            channels (np.ndarray): Channel indices.
+            window (np.ndarray): Samples with shape (len(channels), n), oldest first, n <= len(self).
+        """
+        n = window.shape[1]
+        positions = (self.index - n + np.arange(n)) % self.capacity
+        self._data[np.ix_(channels, positions)] = window
+        self._data[np.ix_(channels, positions + self.capacity)] = window
+
+    def view(self, n=None):
+        """
+        Get the most recent samples of every channel without copying.
+
+        Args:
+            n (int): Number of samples. Defaults to all samples currently held.
+
+        Returns:
+            np.ndarray: Read-only view with shape (channels, n), oldest sample first.
+        """
+        count = self.count  # read once, as a writer in another thread or process may publish meanwhile
+        available = min(count, self.capacity)
+        n = available if n is None else max(0, min(n, available))
+        end = count % self.capacity + self.capacity
+        window = self._data[:, end - n:end]
+        window.flags.writeable = False
+        return window
+
+    def since(self, count, until=None):
+        """
+        Get all samples written after the buffer had received `count` samples.
+
+        Samples that have already been overwritten are skipped.
+
+        Args:
+            count (int): Total sample count at the previous read.
+            until (int): Total sample count to read up to, so that a reader can record exactly where it
+                stopped while a writer publishes more samples. Defaults to the current count.
+
+        Returns:
+            np.ndarray: Read-only view with shape (channels, n_new).
+        """
+        if until is None:
+            return self.view(self.count - count)
+        n = max(0, min(until - count, self.capacity))
+        end = until % self.capacity + self.capacity
+        window = self._data[:, end - n:end]
+        window.flags.writeable = False
+        return window
+
+
+class SharedRingBuffer(MultiChannelRingBuffer):
+    """
+    Mirrored ring buffer in shared memory, written by one process and read by others.
+    """
+
+    def __init__(self, channels, capacity, dtype=np.uint8, name=None, readonly=False):
+        """
+        Constructor for SharedRingBuffer class.
+
+        Args:
+            channels (int): Number of channels.
+            capacity (int): Number of samples kept per channel.
+            dtype: Sample data type.
+            name (str): Name of an existing buffer to attach to. Defaults to creating a new one,
+                which is removed when the creating process closes it.
+            readonly (bool): Map the samples read-only, for processes that only read.
+        """
+        self.channels = channels
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        size = 8 + channels * 2 * capacity * self.dtype.itemsize
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        if not self.owner:
+            # Only the creating process may remove the block; attaching must not register it for cleanup
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        self._count = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)  # 8-byte aligned, stored atomically
+        self._data = np.ndarray((channels, 2 * capacity), dtype=self.dtype, buffer=self.shm.buf, offset=8)
+        if self.owner:
+            self._count[0] = 0
+        if readonly:
+            self._data.flags.writeable = False
+            self._count.flags.writeable = False
+
+    @property
+    def name(self):
+        """Name under which other processes attach to the buffer."""
+        return self.shm.name
+
+    @property
+    def count(self):
+        return int(self._count[0])
+
+    @count.setter
+    def count(self, value):
+        self._count[0] = value
+
+    def spec(self):
+        """Arguments for attaching to the buffer from another process."""
+        return {"channels": self.channels, "capacity": self.capacity, "dtype": self.dtype.str, "name": self.name}
+
+    def close(self):
+        """Unmap the buffer, and remove it if this process created it."""
+        del self._count, self._data
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # views handed out are still alive; the mapping goes when the process exits
+        if self.owner:
+            # A child process sharing this process's resource tracker unregistered the block when attaching
+            resource_tracker.register(self.shm._name, "shared_memory")
+            self.shm.unlink()
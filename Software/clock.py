@@ -0,0 +1,223 @@
+"""
+Sample Clock
+
+Assigns every received sample a monotonic sample index, so that samples lost on the BLE link
+leave a gap in the indices instead of silently shortening the recording, and maps sample
+indices to high-resolution wall-clock timestamps.
+
+Indices are taken from per-frame sequence counters when the firmware sends them. Without
+counters, a straight line is fitted to the arrival time of the last sample of every block
+against its index, and the lower envelope of the recent residuals gives the transport latency
+without jitter. A lost packet delays every later sample by the duration of the missing samples,
+so a block arriving later than the envelope by more than the tolerance probably follows a gap
+of that many samples, rounded to whole packets. A packet that was merely delayed looks the same
+until the next block arrives, so the gap is provisional: if the next block is closer to the
+schedule from before the gap than to the one after it, the late block was only delayed and the
+gap is dropped from the arrival line. The line is therefore fitted on arrival-line positions,
+never on inferred gaps that turned out to be delays, and a wrong guess cannot skew the rate and
+cascade into more. Timing-based gaps are only reported as suspected losses by default; with gap
+inference enabled they are also left in the sample indices.
+
+Classes:
+    SampleClock: Sample index assignment, gap detection and sample timestamps.
+
+Functions:
+    fill_gaps: Linearly interpolate the samples missing from a block.
+"""
+import time
+from collections import deque
+import numpy as np
+
+
+class SampleClock:
+    """
+    Monotonic sample indices from sequence counters or arrival-time regression.
+    """
+
+    def __init__(self, sampling_rate, gap_tolerance=0.05, packet_samples=1, window=10.0, sequence_modulus=256,
+                 infer_gaps=False, speed=1.0):
+        """
+        Constructor for SampleClock class.
+
+        Args:
+            sampling_rate (float): Nominal sampling rate of the board in Hz.
+            gap_tolerance (float): Arrival delay in seconds beyond the latency envelope that is taken as a gap.
+                Delays shorter than this (jitter, late reads) are never counted as lost samples. It is capped at
+                half a packet's duration, as longer tolerances would miss the loss of a single short packet.
+            packet_samples (int): Samples per transport packet; timing-based gaps are whole packets.
+            window (float): Seconds of arrival history used for the regression.
+            sequence_modulus (int): Number of distinct frame counter values, 256 for one counter byte.
+            infer_gaps (bool): Without frame counters, leave probable gaps in the sample indices instead of
+                only counting them in suspected_lost.
+            speed (float): Multiple of real time at which the samples arrive, for emulated boards. Sample
+                timestamps stay spaced by the nominal sampling interval.
+        """
+        self.sampling_rate = sampling_rate
+        self.gap_tolerance = gap_tolerance
+        self.packet_samples = max(1, int(packet_samples))
+        self.window = window
+        self.sequence_modulus = sequence_modulus
+        self.infer_gaps = infer_gaps
+        self.speed = speed
+        self.reset()
+
+    def reset(self):
+        """Restart indexing at sample 0."""
+        self.next_index = 0
+        self.start_time = None  # wall-clock time of sample 0
+        self.rate = float(self.sampling_rate * self.speed)  # samples per second of host time, nominal until the first fit
+        self.offset = None  # fitted arrival time of sample 0 (time.perf_counter() seconds)
+        self.baseline = 0.0  # lower envelope of the arrival time residuals
+        self.last_fit = 0.0
+        self.history = deque()  # (last sample index, arrival time) of recent blocks
+        self.last_sequence = None
+        self.samples_lost = 0
+        self.gaps = 0
+        self.suspected_lost = 0  # samples of probable gaps found from timing but kept out of the indices
+        self.late_blocks = 0  # blocks later than the tolerance that were not preceded by a gap
+        self.pending = 0  # samples of the last timing-based gap, until the next block confirms it
+        self.line_offset = 0  # position on the arrival line minus sample index
+        self.last_arrival = None  # arrival time and arrival-line position of the previous block's last sample
+        self.last_position = None
+
+    def update(self, n, arrival, sequence=None):
+        """
+        Assign sample indices to a block of received samples.
+
+        Args:
+            n (int): Number of samples in the block.
+            arrival (float): time.perf_counter() time at which the block was read.
+            sequence (np.ndarray): Frame counters of the samples, or None to infer gaps from timing.
+
+        Returns:
+            np.ndarray: Sample index of every sample, increasing and with gaps where samples were lost.
+        """
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        gap = 0
+        if sequence is not None:
+            indices = self._sequence_indices(sequence)
+        else:
+            gap = self._timing_gap(n, arrival)
+            indices = self.next_index + gap + np.arange(n, dtype=np.int64)
+        last = int(indices[-1])
+        if self.start_time is None:
+            self.start_time = time.time() - (time.perf_counter() - arrival) - last / self.sampling_rate
+        if not self.pending:  # a block after an unconfirmed gap is left out of the fit
+            self._fit(last + self.line_offset, arrival)
+        self.next_index = last + 1
+        self.last_arrival, self.last_position = arrival, last + self.line_offset
+        return indices
+
+    def _sequence_indices(self, sequence):
+        """Indices from frame counters, which wrap around at the sequence modulus."""
+        sequence = np.asarray(sequence, dtype=np.int64)
+        previous = self.last_sequence if self.last_sequence is not None else sequence[0] - 1
+        steps = np.diff(sequence, prepend=previous) % self.sequence_modulus
+        steps[steps == 0] = self.sequence_modulus  # a repeated counter means a whole cycle of frames was lost
+        lost = steps - 1
+        self.samples_lost += int(lost.sum())
+        self.gaps += int(np.count_nonzero(lost))
+        self.last_sequence = int(sequence[-1])
+        return self.next_index - 1 + np.cumsum(steps)
+
+    def _timing_gap(self, n, arrival):
+        """Number of samples lost before a block, inferred from how late its last sample arrived."""
+        if self.offset is None:
+            return 0
+        last = self.next_index + self.line_offset + n - 1
+        excess = arrival - (self.offset + last / self.rate) - self.baseline
+        if self.pending:
+            if excess < -self.pending / self.rate / 2:
+                # Closer to the schedule from before the gap: the previous block was delayed, not preceded by a loss
+                self.line_offset -= self.pending
+                if not self.infer_gaps:
+                    self.suspected_lost -= self.pending
+                self.late_blocks += 1
+                excess += self.pending / self.rate
+            self.pending = 0
+        if excess <= min(self.gap_tolerance, self.packet_samples / self.rate / 2):
+            return 0
+        lost = round(excess * self.rate / self.packet_samples) * self.packet_samples
+        # A loss delays the block after the previous one too, whereas a block drifting later than the
+        # line, as it does between fits while the rate is off, is not taken as a gap to feed the rate
+        step = arrival - self.last_arrival - (last - self.last_position) / self.rate
+        if lost == 0 or step < lost / self.rate / 2:
+            self.late_blocks += 1
+            return 0
+        self.pending = lost
+        if not self.infer_gaps:
+            self.line_offset += lost
+            self.suspected_lost += lost
+            return 0
+        self.samples_lost += lost
+        self.gaps += 1
+        return lost
+
+    def _fit(self, last, arrival):
+        """Add a block to the arrival history and refit the arrival line once a second."""
+        self.history.append((last, arrival))
+        while arrival - self.history[0][1] > self.window:
+            self.history.popleft()
+        if self.offset is None:
+            self.offset = arrival - last / self.rate
+        residual = arrival - (self.offset + last / self.rate)
+        self.baseline = min(self.baseline, residual)
+        if arrival - self.last_fit < 1.0 or arrival - self.history[0][1] < 1.0:
+            return
+        index, times = np.array(self.history).T
+        slope, intercept = np.polyfit(index, times, 1)
+        # Refit on the blocks in the lower half of the residuals, as late blocks (scheduling delays,
+        # reads that waited for the next packet) only ever arrive after the line and would bias the rate
+        residuals = times - (intercept + index * slope)
+        early = residuals <= np.median(residuals)
+        if early.sum() >= 2:
+            slope, intercept = np.polyfit(index[early], times[early], 1)
+        if slope > 0:
+            self.rate = 1 / slope
+            self.offset = intercept
+            # The envelope of the last two seconds only, as older residuals bend away from the line
+            # while the rate is still settling, e.g. after losses that were missed at first
+            recent = times >= arrival - 2.0
+            self.baseline = float((times - (intercept + index * slope))[recent].min())
+        self.last_fit = arrival
+
+    def time_of(self, index):
+        """
+        Wall-clock time of a sample.
+
+        Args:
+            index (int or np.ndarray): Sample index.
+
+        Returns:
+            float or np.ndarray: POSIX time in seconds, spaced by the nominal sampling interval.
+        """
+        return self.start_time + np.asarray(index) / self.sampling_rate
+
+    @property
+    def drift(self):
+        """Relative difference of the measured sample rate from the nominal rate, e.g. 1e-4 for 100 ppm fast."""
+        return self.rate / (self.sampling_rate * self.speed) - 1
+
+
+def fill_gaps(block, indices, previous, previous_index):
+    """
+    Linearly interpolate the samples missing from a block.
+
+    Args:
+        block (np.ndarray): Received samples with shape (n_samples, channels).
+        indices (np.ndarray): Sample index of every received sample.
+        previous (np.ndarray): Last sample received before the block, shape (channels,).
+        previous_index (int): Sample index of the previous sample.
+
+    Returns:
+        np.ndarray: Samples for every index from previous_index + 1 to indices[-1], in the block's dtype.
+    """
+    known = np.concatenate([[previous_index], indices])
+    values = np.vstack([previous, block]).astype(np.float64)
+    full = np.arange(previous_index + 1, indices[-1] + 1)
+    filled = np.empty((len(full), block.shape[1]), dtype=block.dtype)
+    for channel in range(block.shape[1]):
+        column = np.interp(full, known, values[:, channel])
+        filled[:, channel] = np.round(column) if np.issubdtype(block.dtype, np.integer) else column
+    return filled
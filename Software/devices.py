@@ -0,0 +1,406 @@
+"""
+Multi-Device Acquisition
+
+Reads several receiver boards at once and merges their channels into a single stream, so that
+electrode arrays larger than one board's multiplexer feed the same buffers, filters, plots and
+recordings as a single board.
+
+Each board is read by its own thread, which parses frames and assigns sample indices with a
+SampleClock of its own. Boards sample on independent crystals, so their streams are aligned
+onto the clock of the first board (the reference): the arrival-time lines fitted by each
+board's clock map its samples to the reference sample index that arrived at the same time.
+Blocks are placed contiguously from where the board's previous block ended, and the placement
+is only corrected, by skipping or repeating samples, once it is more than `slip_samples` away
+from the mapped index, so arrival jitter does not make boards slip back and forth.
+
+Merged samples are released once every board has delivered them. A board that falls more than
+`max_lag` seconds behind the others holds its last value instead of stalling the stream, and
+the samples it delivers late are discarded. Samples a board lost keep their gap in its sample
+indices, and are filled in the merged stream by holding its last value or, with `interpolate_gaps`,
+by interpolating across the gap. Every merged sample is flagged with whether each board actually
+sent it, so that recordings keep the gaps while the live display stays continuous.
+
+Classes:
+    Device: Reader thread for one board.
+    DeviceManager: Opens the boards, aligns their streams and serves merged blocks.
+
+Functions:
+    find_board_ports: Serial ports of the attached receiver boards.
+"""
+import threading
+import time
+import numpy as np
+import serial
+import serial.tools.list_ports
+from clock import SampleClock, fill_gaps
+from framing import FrameParser
+
+
+def find_board_ports():
+    """
+    Serial ports of the attached receiver boards.
+
+    Returns:
+        list: Port names of Seeed XIAO boards, recognised by their description (macOS) or
+            their USB vendor ID 2886 (Windows, Linux).
+    """
+    return [p.device for p in serial.tools.list_ports.comports()
+            if "XIAO" in (p.description or "") or "2886" in (p.hwid or "")]
+
+
+class Device(threading.Thread):
+    """
+    Reader thread parsing one board's stream and handing contiguous blocks to the DeviceManager.
+    """
+
+    def __init__(self, name, ser, channels, sampling_rate, manager, index, counter_bytes=0, infer_gaps=False,
+                 speed=1.0):
+        """
+        Constructor for Device class.
+
+        Args:
+            name (str): Port name or label shown in reports.
+            ser (serial.Serial): Open port, or any object with the same read/in_waiting interface.
+            channels (int): Number of channels sent by the board.
+            sampling_rate (int): Nominal sampling rate in Hz.
+            manager (DeviceManager): Manager receiving the parsed blocks.
+            index (int): Position of the board in the manager, which sets its channels in the merged stream.
+            counter_bytes (int): Size of the frame counter sent by the firmware, 0 for none.
+            infer_gaps (bool): Without a frame counter, leave the gaps found from arrival times in the sample indices.
+            speed (float): Multiple of real time at which an emulated board sends its samples.
+        """
+        super(Device, self).__init__(daemon=True)
+        self.name = name
+        self.ser = ser
+        self.channels = channels
+        self.manager = manager
+        self.index = index
+        self.parser = FrameParser(channels, counter_bytes=counter_bytes)
+        # A long regression window keeps the rate estimate steady enough to align boards by
+        self.clock = SampleClock(sampling_rate, packet_samples=240 // (channels + counter_bytes), window=60.0,
+                                 sequence_modulus=self.parser.sequence_modulus, infer_gaps=infer_gaps, speed=speed)
+        self.running = True
+        self.bytes_received = 0
+        self.samples_received = 0
+        self.lock = threading.Lock()  # held while parsing, so that flushing never clears a buffer in use
+
+    def run(self):
+        """Run method for the thread."""
+        while self.running:
+            try:
+                chunk = self.ser.read(max(1, self.ser.in_waiting))  # blocks up to the timeout when idle
+            except serial.SerialException as e:
+                print(f"{self.name}: serial port error: {e}")
+                break
+            arrival = time.perf_counter()
+            self.bytes_received += len(chunk)
+            with self.lock:
+                block = self.parser.feed(chunk)
+                sequence = self.parser.sequence
+            if len(block) == 0:
+                continue
+            indices = self.clock.update(len(block), arrival, sequence)
+            self.samples_received += len(block)
+            self.manager.push(self, indices, block)
+
+    def flush(self):
+        """Discard the bytes waiting on the port and any partial frame."""
+        with self.lock:
+            self.ser.flushInput()
+            self.parser.reset()
+
+    def stop(self):
+        """Stop reading and wait for the thread to finish."""
+        self.running = False
+        if self.is_alive():
+            self.join()
+
+
+class DeviceManager:
+    """
+    Several boards merged into one stream of samples on the reference board's clock.
+    """
+
+    def __init__(self, sources, channels, sampling_rate, counter_bytes=0, max_lag=0.5, slip_samples=2,
+                 infer_gaps=False, interpolate_gaps=True, speed=1.0):
+        """
+        Constructor for DeviceManager class.
+
+        Args:
+            sources (list): (name, port) pairs, where port is an open serial.Serial or emulated transport.
+            channels (list): Number of channels sent by each board, in the same order.
+            sampling_rate (int): Nominal sampling rate of every board in Hz.
+            counter_bytes (int): Size of the frame counter sent by the firmware, 0 for none.
+            max_lag (float): Seconds a board may fall behind before the merged stream continues without it.
+            slip_samples (int): Misalignment in samples beyond which a board's placement is corrected.
+            infer_gaps (bool): Without a frame counter, leave the gaps found from arrival times in the sample indices.
+            interpolate_gaps (bool): Fill the samples a board lost by interpolating across the gap rather than
+                holding its last value.
+            speed (float): Multiple of real time at which emulated boards send their samples.
+        """
+        self.sampling_rate = sampling_rate
+        self.channels = sum(channels)
+        bounds = np.cumsum([0] + list(channels))
+        self.slices = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+        self.devices = [Device(name, port, n, sampling_rate, self, i, counter_bytes, infer_gaps, speed)
+                        for i, ((name, port), n) in enumerate(zip(sources, channels))]
+        self.max_lag = int(max_lag * sampling_rate * speed)
+        self.slip_samples = slip_samples
+        self.capacity = max(4 * self.max_lag, 4096)
+        self.merged = np.zeros((self.capacity, self.channels), dtype=np.uint8)
+        self.received = np.zeros((self.capacity, len(self.devices)), dtype=bool)  # whether each board sent each sample
+        self.interpolate_gaps = interpolate_gaps
+        self.condition = threading.Condition()
+        self.last_report = None
+        self.reset()
+
+    @classmethod
+    def open(cls, ports, channels, sampling_rate, baudrate=1000000, **kwargs):
+        """
+        Open serial ports and create a manager reading them.
+
+        Args:
+            ports (list): Port names.
+            channels (list): Number of channels sent by each board.
+            sampling_rate (int): Nominal sampling rate in Hz.
+            baudrate (int): Serial baud rate.
+            **kwargs: Further DeviceManager arguments.
+
+        Returns:
+            DeviceManager: Manager whose readers have not been started yet.
+        """
+        sources = [(port, serial.Serial(port, baudrate, timeout=1)) for port in ports]
+        return cls(sources, channels, sampling_rate, **kwargs)
+
+    @property
+    def reference(self):
+        """Board whose sample clock the merged stream follows."""
+        return self.devices[0]
+
+    def reset(self):
+        """Forget all merged samples; the merged stream restarts with the reference's next block."""
+        self.written = np.full(len(self.devices), -1)  # last merged index written by each board
+        self.position = [None] * len(self.devices)  # merged index of each board's next sample
+        self.expected = [None] * len(self.devices)  # each board's own index of its next sample
+        self.emitted = None  # last merged index returned by read, None until the reference delivers samples
+        self.overrun_samples = 0
+        self.late_samples = [0] * len(self.devices)
+        self.slips = [0] * len(self.devices)
+
+    def start(self):
+        """Start a reader thread per board."""
+        for device in self.devices:
+            device.start()
+
+    def stop(self):
+        """Stop the reader threads and close their ports."""
+        for device in self.devices:
+            device.running = False
+        with self.condition:
+            self.condition.notify_all()
+        for device in self.devices:
+            device.stop()
+            device.ser.close()
+
+    # ------------------------------------------------------------------------------------------
+    #                                         Alignment
+    # ------------------------------------------------------------------------------------------
+
+    def mapped_index(self, device, index):
+        """Reference sample index that arrived at the same time as a board's sample."""
+        # The clocks fit their arrival lines on indices shifted by the samples suspected lost but kept out of them
+        clock, reference = device.clock, self.reference.clock
+        arrival = clock.offset + clock.baseline + (index + clock.line_offset) / clock.rate
+        return (arrival - reference.offset - reference.baseline) * reference.rate - reference.line_offset
+
+    def push(self, device, indices, block):
+        """
+        Place a block from a board in the merged stream.
+
+        Args:
+            device (Device): Board the block came from.
+            indices (np.ndarray): The board's sample index of every sample, which jump where samples were lost.
+            block (np.ndarray): Samples with shape (n_samples, device.channels).
+        """
+        runs = np.flatnonzero(np.diff(indices) != 1) + 1
+        with self.condition:
+            for run_indices, run in zip(np.split(indices, runs), np.split(block, runs)):
+                self._place(device, int(run_indices[0]), run)
+            if self.emitted is not None and self.frontier() > self.emitted:
+                self.condition.notify()
+
+    def _place(self, device, first, block):
+        """Place a run of consecutive samples from a board, whose first has the board's sample index first."""
+        i = device.index
+        lost = first - self.expected[i] if self.expected[i] is not None else 0
+        self.expected[i] = first + len(block)
+        if device is self.reference:
+            start = first
+            if self.emitted is None:
+                self.emitted = start - 1  # the merged stream starts with the reference
+        elif self.emitted is None:
+            return  # nothing to align to until the reference has delivered samples
+        else:
+            target = int(round(self.mapped_index(device, first)))
+            start = self.position[i] + lost if self.position[i] is not None else target
+            if abs(target - start) > self.slip_samples:
+                if self.position[i] is not None:
+                    self.slips[i] += 1
+                start = target
+        self.position[i] = start + len(block)
+
+        # Samples for merged indices already written (late or after a backward slip) are discarded
+        begin = max(self.written[i], self.emitted) + 1
+        self.late_samples[i] += max(0, min(len(block), self.emitted + 1 - start))
+        skip = max(0, min(len(block), begin - start))
+        block, start = block[skip:], start + skip
+        if len(block) == 0:
+            return
+        if start > begin:
+            # Samples the board lost, or a board joining late, are filled but flagged as not received;
+            # a forward slip only repeats a sample
+            self._fill(i, begin, start, block[0], received=lost == 0 and self.written[i] >= 0)
+        self._write(i, start, block)
+        self.written[i] = start + len(block) - 1
+
+    def _write(self, i, start, block, received=True):
+        """Write a board's samples at merged indices start onwards."""
+        positions = np.arange(start, start + len(block)) % self.capacity
+        self.merged[positions, self.slices[i]] = block
+        self.received[positions, i] = received
+
+    def _fill(self, i, start, stop, following=None, received=False):
+        """
+        Fill a board's channels at merged indices [start, stop), which it sent no samples for.
+
+        The board's last written sample is held, or with interpolate_gaps interpolated towards the
+        following sample if it is known. A board that has written nothing yet holds the following
+        sample, or mid-scale if there is none.
+        """
+        if stop <= start:
+            return
+        shape = (stop - start, self.slices[i].stop - self.slices[i].start)
+        if self.written[i] < 0:
+            values = np.broadcast_to(128 if following is None else following, shape)
+        else:
+            last = self.merged[self.written[i] % self.capacity, self.slices[i]]
+            if self.interpolate_gaps and following is not None:
+                values = fill_gaps(following[None], np.array([stop]), last, start - 1)[:-1]
+            else:
+                values = np.broadcast_to(last, shape)
+        self._write(i, start, values, received)
+
+    def frontier(self):
+        """Last merged index that can be released: every board has written it, or a lagging board is skipped."""
+        return max(int(self.written.min()), int(self.written.max()) - self.max_lag)
+
+    # ------------------------------------------------------------------------------------------
+    #                                        Merged feed
+    # ------------------------------------------------------------------------------------------
+
+    def read(self, timeout=1.0):
+        """
+        Wait for and return the merged samples that every board has delivered.
+
+        Args:
+            timeout (float): Maximum time in seconds to wait for new samples.
+
+        Returns:
+            tuple: Samples with shape (n_samples, channels), their merged sample indices, and whether each
+                board sent each sample with shape (n_samples, boards), or (None, None, None) if no samples
+                were released within the timeout.
+        """
+        with self.condition:
+            ready = lambda: self.emitted is not None and self.frontier() > self.emitted
+            if not self.condition.wait_for(lambda: ready() or not self.reference.running, timeout) or not ready():
+                return None, None, None
+            stop = self.frontier()
+            start = max(self.emitted + 1, stop + 1 - self.capacity // 2)  # if the reader fell far behind, skip ahead
+            self.overrun_samples += start - self.emitted - 1
+            for i in np.flatnonzero(self.written < stop):
+                self._fill(i, max(start, self.written[i] + 1), stop + 1)  # lagging board holds its last value
+                self.written[i] = stop
+            indices = np.arange(start, stop + 1)
+            block = self.merged[indices % self.capacity]
+            received = self.received[indices % self.capacity]
+            self.emitted = stop
+        return block, indices, received
+
+    # The merged stream follows the reference board, so the manager stands in for the
+    # SampleClock and serial port of a single board where AcquisitionEngine uses them
+
+    def time_of(self, index):
+        return self.reference.clock.time_of(index)
+
+    @property
+    def samples_lost(self):
+        return sum(device.clock.samples_lost for device in self.devices)
+
+    @property
+    def gaps(self):
+        return sum(device.clock.gaps for device in self.devices)
+
+    @property
+    def suspected_lost(self):
+        return sum(device.clock.suspected_lost for device in self.devices)
+
+    @property
+    def late_blocks(self):
+        return sum(device.clock.late_blocks for device in self.devices)
+
+    @property
+    def rate(self):
+        return self.reference.clock.rate
+
+    @property
+    def drift(self):
+        return self.reference.clock.drift
+
+    def isOpen(self):
+        return all(device.ser.isOpen() for device in self.devices)
+
+    def flushInput(self):
+        """Discard the bytes waiting on every port and restart the merged stream."""
+        with self.condition:
+            for device in self.devices:
+                device.flush()
+            self.reset()
+
+    # ------------------------------------------------------------------------------------------
+    #                                         Reporting
+    # ------------------------------------------------------------------------------------------
+
+    def report(self):
+        """
+        Per-board throughput, loss and drift since the previous report.
+
+        Returns:
+            list: One dict per board with its name, channels, samples/s, kB/s, lost samples, drift
+                from its nominal rate and from the reference in ppm, lag behind the merged stream in
+                samples, late samples discarded and alignment slips.
+        """
+        now = time.perf_counter()
+        counts = [(device.samples_received, device.bytes_received) for device in self.devices]
+        if self.last_report is None:
+            self.last_report = (now, counts)
+            elapsed, previous = None, counts
+        else:
+            elapsed, previous = now - self.last_report[0], self.last_report[1]
+        self.last_report = (now, counts)
+
+        rows = []
+        for i, device in enumerate(self.devices):
+            samples, received = counts[i][0] - previous[i][0], counts[i][1] - previous[i][1]
+            rows.append({
+                "name": device.name,
+                "channels": device.channels,
+                "samples_per_s": samples / elapsed if elapsed else 0.0,
+                "kB_per_s": received / elapsed / 1000 if elapsed else 0.0,
+                "lost": device.clock.samples_lost,
+                "drift_ppm": 1e6 * device.clock.drift,
+                "relative_ppm": 1e6 * (device.clock.rate / self.reference.clock.rate - 1),
+                "lag": int(self.written.max() - self.written[i]) if self.emitted is not None else 0,
+                "late": self.late_samples[i],
+                "slips": self.slips[i],
+            })
+        return rows
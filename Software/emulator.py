@@ -0,0 +1,397 @@
+"""
+Board Emulator
+
+Stands in for the client board when no hardware is attached. Deterministic synthetic ECG, EMG
+or EEG (or a replayed recording from Data/) is quantised to the 8-bit ADC codes sent by the
+board and streamed with the client firmware's framing, "\\r\\n" followed by one byte per channel,
+in packets matching the server's 240-byte BLE buffer, optionally with a frame counter after the
+sync word. Packets can be dropped to emulate BLE packet loss, and the stream can be paced at a
+multiple of real time for load testing.
+
+The byte stream is written either to an in-process LoopbackSerial, which the acquisition engine reads
+like a serial.Serial, or to a pseudo-terminal that the monitor can open as a serial port.
+
+Classes:
+    BoardEmulator: Thread streaming samples as board packets at a paced rate.
+    LoopbackSerial: In-process transport with the subset of the serial.Serial interface used by AcquisitionEngine.
+    PtyTransport: Pseudo-terminal transport (POSIX only).
+
+Functions:
+    synthetic_recording: Deterministic multi-channel ECG, EMG or EEG as ADC codes.
+    load_replay: Load a recording as ADC codes for replay.
+    encode_frames: Encode samples as the board's byte stream.
+    start_boards: Start emulated boards sharing the channels and return the stream to read from.
+
+Usage:
+    python Software/emulator.py --source ecg --channels 5 --speed 1
+    python Software/emulator.py --source "Data/ecg unfiltered.csv" --loss 0.01
+"""
+import argparse
+import os
+import threading
+import time
+import numpy as np
+from binary_recording import BinaryRecording, UV_PER_COUNT
+from devices import DeviceManager
+from filter_design import design
+
+SOURCES = ("ecg", "emg", "eeg")
+
+# P, Q, R, S and T waves as (offset from the R peak in s, width in s, amplitude in mV)
+ECG_WAVES = ((-0.20, 0.025, 0.15), (-0.03, 0.010, -0.10), (0.0, 0.012, 1.2), (0.03, 0.010, -0.25), (0.25, 0.060, 0.30))
+
+
+def synthetic_ecg(n, sampling_rate, rng, heart_rate=70, variability=0.05):
+    """ECG in microvolts as a sum of Gaussian P-QRS-T waves around jittered beat times."""
+    rr = 60 / heart_rate * (1 + variability * rng.standard_normal(int(n / sampling_rate * heart_rate / 60) + 3))
+    beats = np.cumsum(rr) - rr[0] / 2
+    t = np.arange(n) / sampling_rate
+    nearest = np.clip(np.searchsorted(beats, t), 1, len(beats) - 1)
+    ecg = np.zeros(n)
+    for beat in (beats[nearest - 1], beats[nearest]):  # each sample is only affected by its two closest beats
+        for offset, width, amplitude in ECG_WAVES:
+            ecg += amplitude * np.exp(-0.5 * ((t - beat - offset) / width) ** 2)
+    return ecg * 1000
+
+
+def synthetic_emg(n, sampling_rate, rng, burst=1.0, rest=1.5):
+    """EMG in microvolts as band-limited noise gated by smooth contraction bursts."""
+    nyquist = sampling_rate / 2
+    import scipy.signal as signal  # slow to import, and only needed for EMG
+    sos = design("bandpass", (20, min(150, 0.9 * nyquist)), sampling_rate, 4).sos
+    noise = signal.sosfilt(sos, rng.standard_normal(n))
+    noise /= noise.std()
+    t = np.arange(n) / sampling_rate
+    envelope = 0.5 - 0.5 * np.cos(2 * np.pi * np.clip((t % (burst + rest)) / burst, 0, 1))
+    return noise * (10 + 200 * envelope)
+
+
+def synthetic_eeg(n, sampling_rate, rng, alpha_hz=10.0):
+    """EEG in microvolts as 1/f background with a waxing and waning alpha rhythm."""
+    spectrum = np.fft.rfft(rng.standard_normal(n))
+    f = np.fft.rfftfreq(n, 1 / sampling_rate)
+    spectrum[1:] /= np.sqrt(f[1:])
+    spectrum[0] = 0
+    background = np.fft.irfft(spectrum, n)
+    background *= 20 / background.std()
+    t = np.arange(n) / sampling_rate
+    alpha = 15 * (0.6 + 0.4 * np.sin(2 * np.pi * 0.1 * t)) * np.sin(2 * np.pi * alpha_hz * t)
+    return background + alpha
+
+
+def synthetic_recording(source="ecg", channels=5, duration=60.0, sampling_rate=250, noise_uv=5.0, mains_uv=20.0,
+                        mains_hz=50.0, seed=0):
+    """
+    Generate a deterministic multi-channel recording as ADC codes.
+
+    Each channel sees the source signal with its own gain and baseline wander, plus white noise
+    and mains hum, and is quantised around mid-scale like the board's 8-bit ADC.
+
+    Args:
+        source (str): "ecg", "emg" or "eeg".
+        channels (int): Number of channels.
+        duration (float): Length in seconds.
+        sampling_rate (int): Sampling rate in Hz.
+        noise_uv (float): RMS of the white noise in microvolts.
+        mains_uv (float): Amplitude of the mains hum in microvolts.
+        mains_hz (float): Mains frequency in Hz.
+        seed (int): Random seed; the same arguments always give the same recording.
+
+    Returns:
+        np.ndarray: ADC codes with shape (n_samples, channels), dtype uint8.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(duration * sampling_rate)
+    t = np.arange(n)[:, None] / sampling_rate
+    if source == "ecg":
+        # One heart seen from every electrode with a different lead gain
+        uv = synthetic_ecg(n, sampling_rate, rng)[:, None] * rng.uniform(0.3, 0.9, channels)
+    elif source == "emg":
+        uv = np.column_stack([synthetic_emg(n, sampling_rate, rng) for _ in range(channels)])
+    elif source == "eeg":
+        uv = np.column_stack([synthetic_eeg(n, sampling_rate, rng) for _ in range(channels)])
+    else:
+        raise ValueError(f"Unknown source {source!r}, expected one of {SOURCES}")
+
+    wander = 100 * np.sin(2 * np.pi * 0.3 * t + rng.uniform(0, 2 * np.pi, channels))
+    mains = mains_uv * np.sin(2 * np.pi * mains_hz * t + rng.uniform(0, 2 * np.pi, channels))
+    uv = uv + wander + mains + noise_uv * rng.standard_normal((n, channels))
+    return np.clip(np.round(128 + uv / UV_PER_COUNT), 0, 255).astype(np.uint8)
+
+
+def load_replay(path, channels=None):
+    """
+    Load a CSV or binary recording as ADC codes for replay.
+
+    Args:
+        path (str): Recording path.
+        channels (int): Number of channels to stream. Recorded channels are repeated as needed.
+
+    Returns:
+        np.ndarray: ADC codes with shape (n_samples, channels), dtype uint8.
+    """
+    if path.endswith(".bpr"):
+        data = BinaryRecording(path).read()
+    else:
+        import pandas as pd
+        df = pd.read_csv(path)
+        data = df[[c for c in df.columns if c.startswith("Channel_")]].to_numpy()
+    channels = channels or data.shape[1]
+    data = np.tile(data, (1, -(-channels // data.shape[1])))[:, :channels]
+    return np.clip(np.round(data), 0, 255).astype(np.uint8)
+
+
+def encode_frames(samples, counter_bytes=0, first=0):
+    """
+    Encode samples as the client board's byte stream.
+
+    Args:
+        samples (np.ndarray): ADC codes with shape (n_samples, channels).
+        counter_bytes (int): Size of the little-endian frame counter sent after the sync word, 0 for none.
+        first (int): Counter value of the first sample.
+
+    Returns:
+        bytes: "\\r\\n", the frame counter and one byte per channel for every sample.
+    """
+    frames = np.empty((len(samples), 2 + counter_bytes + samples.shape[1]), dtype=np.uint8)
+    frames[:, 0] = ord("\r")
+    frames[:, 1] = ord("\n")
+    counters = first + np.arange(len(samples), dtype=np.int64)
+    for k in range(counter_bytes):
+        frames[:, 2 + k] = (counters >> (8 * k)) & 0xFF
+    frames[:, 2 + counter_bytes:] = samples
+    return frames.tobytes()
+
+
+class LoopbackSerial:
+    """
+    In-process byte pipe with the subset of the serial.Serial interface used by AcquisitionEngine.
+    """
+
+    def __init__(self, timeout=1, max_buffer=1 << 20):
+        """
+        Constructor for LoopbackSerial class.
+
+        Args:
+            timeout (float): Maximum time in seconds read() waits for data.
+            max_buffer (int): Bytes held before further writes are dropped, like a full OS serial buffer.
+        """
+        self.timeout = timeout
+        self.max_buffer = max_buffer
+        self.overflow_bytes = 0
+        self.is_open = True
+        self._buffer = bytearray()
+        self._condition = threading.Condition()
+
+    @property
+    def in_waiting(self):
+        return len(self._buffer)
+
+    def isOpen(self):
+        return self.is_open
+
+    def write(self, data):
+        """Append bytes for the reader, dropping them if the buffer is full."""
+        with self._condition:
+            if len(self._buffer) + len(data) > self.max_buffer:
+                self.overflow_bytes += len(data)
+                return 0
+            self._buffer += data
+            self._condition.notify()
+        return len(data)
+
+    def read(self, size=1):
+        """Read up to size bytes, waiting up to the timeout for the first one."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._buffer or not self.is_open, self.timeout)
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        return data
+
+    def reset_input_buffer(self):
+        with self._condition:
+            self._buffer.clear()
+
+    flushInput = reset_input_buffer
+
+    def close(self):
+        with self._condition:
+            self.is_open = False
+            self._condition.notify_all()
+
+
+class PtyTransport:
+    """
+    Pseudo-terminal carrying the emulated stream; open `port` with serial.Serial to read it.
+    """
+
+    def __init__(self):
+        """Constructor for PtyTransport class."""
+        import pty
+        import tty
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)  # pass bytes through unmodified, e.g. no "\n" to "\r\n" translation
+        self.port = os.ttyname(self.slave)
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.master, view):]
+        return len(data)
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+
+class BoardEmulator(threading.Thread):
+    """
+    Thread streaming samples to a transport as board packets, paced at a multiple of real time.
+    """
+
+    def __init__(self, samples, transport, sampling_rate=250, speed=1.0, packet_bytes=240, packet_loss=0.0, seed=0,
+                 counter_bytes=0):
+        """
+        Constructor for BoardEmulator class.
+
+        Args:
+            samples (np.ndarray): ADC codes with shape (n_samples, channels), streamed in a loop.
+            transport: LoopbackSerial, PtyTransport or any object with a write(bytes) method.
+            sampling_rate (int): Sampling rate in Hz.
+            speed (float): Multiple of real time at which samples are sent.
+            packet_bytes (int): Payload of each BLE packet; the server sends 240-byte buffers.
+            packet_loss (float): Probability of dropping each packet.
+            seed (int): Random seed for packet loss.
+            counter_bytes (int): Size of the frame counter sent with every frame, 0 for the current firmware.
+        """
+        super(BoardEmulator, self).__init__(daemon=True)
+        self.transport = transport
+        self.channels = samples.shape[1]
+        self.sampling_rate = sampling_rate
+        self.speed = speed
+        self.packet_frames = max(1, packet_bytes // (self.channels + counter_bytes))
+        self.packet_loss = packet_loss
+        self.rng = np.random.default_rng(seed)
+        self.counter_bytes = counter_bytes
+        self.frame_size = 2 + counter_bytes + self.channels
+        self.n_samples = len(samples)
+        self.samples = np.concatenate([samples, samples[:self.packet_frames]])  # wraps around
+        self.stream = encode_frames(self.samples)
+        self.running = True
+        self.samples_generated = 0
+        self.samples_sent = 0
+        self.packets_sent = 0
+        self.packets_dropped = 0
+
+    def run(self):
+        """Run method for the thread."""
+        start = time.perf_counter()
+        interval = self.packet_frames / (self.sampling_rate * self.speed)
+        while self.running:
+            due = int((time.perf_counter() - start) * self.sampling_rate * self.speed)
+            while self.samples_generated + self.packet_frames <= due and self.running:
+                self.send_packet()
+            time.sleep(min(interval, 0.005))
+
+    def send_packet(self):
+        """Send the next packet of frames, or drop it."""
+        position = self.samples_generated % self.n_samples
+        self.samples_generated += self.packet_frames
+        if self.packet_loss and self.rng.random() < self.packet_loss:
+            self.packets_dropped += 1
+            return
+        if self.counter_bytes:
+            # Counters run on across loops of the samples, so frames are encoded as they are sent
+            packet = encode_frames(self.samples[position:position + self.packet_frames], self.counter_bytes,
+                                   self.samples_generated - self.packet_frames)
+        else:
+            start = position * self.frame_size
+            packet = self.stream[start:start + self.packet_frames * self.frame_size]
+        self.transport.write(packet)
+        self.packets_sent += 1
+        self.samples_sent += self.packet_frames
+
+    def stop(self):
+        """Stop streaming and wait for the thread to finish."""
+        self.running = False
+        if self.is_alive():
+            self.join()
+
+
+def start_boards(source, channels, sampling_rate=250, boards=1, speed=1.0, packet_loss=0.0, counter_bytes=0,
+                 infer_gaps=False):
+    """
+    Start emulated boards, each streaming an equal share of the channels to a LoopbackSerial.
+
+    Args:
+        source (str): "ecg", "emg", "eeg" or a recording to replay.
+        channels (int): Total number of channels.
+        sampling_rate (int): Nominal sampling rate in Hz. Each board's crystal is made 40 ppm faster
+            than the previous board's, as with real boards.
+        boards (int): Number of boards.
+        speed (float): Multiple of real time at which samples are sent.
+        packet_loss (float): Probability of dropping each packet.
+        counter_bytes (int): Size of the frame counter sent with every frame.
+        infer_gaps (bool): Have the DeviceManager of several boards leave the gaps found from arrival times
+            in the sample indices.
+
+    Returns:
+        tuple: The LoopbackSerial of a single board or a started DeviceManager merging several boards,
+            and the list of started emulators.
+    """
+    per_board = channels // boards
+    if source not in SOURCES:
+        replay = load_replay(source, channels)
+    emulators = []
+    for board in range(boards):
+        if source in SOURCES:
+            samples = synthetic_recording(source, per_board, sampling_rate=sampling_rate, seed=board)
+        else:
+            samples = replay[:, board * per_board:(board + 1) * per_board]
+        rate = sampling_rate * (1 + 40e-6 * board)
+        emulator = BoardEmulator(samples, LoopbackSerial(), rate, speed, packet_loss=packet_loss, seed=board,
+                                 counter_bytes=counter_bytes)
+        emulator.start()
+        emulators.append(emulator)
+    if boards == 1:
+        return emulators[0].transport, emulators
+    sources = [(f"Emulated board {i + 1}", emulator.transport) for i, emulator in enumerate(emulators)]
+    devices = DeviceManager(sources, [per_board] * boards, sampling_rate, counter_bytes=counter_bytes,
+                            infer_gaps=infer_gaps, speed=speed)
+    devices.start()
+    return devices, emulators
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Emulate the client board on a pseudo-terminal.")
+    parser.add_argument("--source", default="ecg", help="ecg, emg, eeg or a recording to replay")
+    parser.add_argument("--channels", type=int, default=5)
+    parser.add_argument("--rate", type=int, default=250, help="sampling rate in Hz")
+    parser.add_argument("--speed", type=float, default=1.0, help="multiple of real time")
+    parser.add_argument("--loss", type=float, default=0.0, help="packet loss probability")
+    parser.add_argument("--noise", type=float, default=5.0, help="white noise RMS in uV")
+    parser.add_argument("--mains", type=float, default=20.0, help="mains hum amplitude in uV")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--counter-bytes", type=int, default=0, help="size of the frame counter, 0 for none")
+    args = parser.parse_args(argv)
+
+    if args.source in SOURCES:
+        samples = synthetic_recording(args.source, args.channels, sampling_rate=args.rate, noise_uv=args.noise,
+                                      mains_uv=args.mains, seed=args.seed)
+    else:
+        samples = load_replay(args.source, args.channels)
+    transport = PtyTransport()
+    emulator = BoardEmulator(samples, transport, args.rate, args.speed, packet_loss=args.loss, seed=args.seed,
+                             counter_bytes=args.counter_bytes)
+    emulator.start()
+    print(f"Emulating {args.channels}-channel {args.source} at {args.speed}x on {transport.port}, Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emulator.stop()
+        transport.close()
+
+
+if __name__ == "__main__":
+    main()
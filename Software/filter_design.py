@@ -0,0 +1,153 @@
+"""
+Filter Design
+
+Registry of the IIR filters used by the monitor and the analysis scripts. Designs are keyed by
+(type, family, order, cutoff, fs, quality) and kept in an LRU cache, so toggling a filter in the
+GUI, retuning it while it is applied, or filtering every channel of every recording designs
+each filter once. Every design is returned as second-order sections, which stay numerically
+stable at the orders used here where transfer-function coefficients do not, together with its
+sosfilt_zi initial conditions for a unit step. The cached arrays are read-only, as they are
+shared by every caller, and each caller gets its own copy.
+
+Parameters are checked against the Nyquist frequency before a filter is designed, so invalid
+settings raise a ValueError with a readable message instead of a SciPy error or an unstable
+filter.
+
+Classes:
+    FilterDesign: SOS coefficients and step-response initial conditions of one filter.
+
+Functions:
+    design: Cached design of a notch, low-pass, high-pass, band-pass or band-stop filter.
+    validate: Check filter parameters against the sampling rate.
+"""
+from functools import lru_cache
+import numpy as np
+
+KINDS = ("notch", "lowpass", "highpass", "bandpass", "bandstop")
+FAMILIES = ("butter", "bessel")
+
+
+class FilterDesign:
+    """
+    Second-order sections of a filter and their initial conditions for a unit step.
+    """
+
+    def __init__(self, sos, zi, key):
+        """
+        Constructor for FilterDesign class.
+
+        Args:
+            sos (np.ndarray): Second-order sections with shape (n_sections, 6).
+            zi (np.ndarray): Initial conditions with shape (n_sections, 2) for which the filter is at
+                steady state for a constant input of 1; scale by the first sample to start without a transient.
+            key (tuple): Registry key the filter was designed for.
+        """
+        self._sos = sos
+        self._zi = zi
+        self.key = key
+
+    def __repr__(self):
+        return f"FilterDesign{self.key}"
+
+    @property
+    def sos(self):
+        """Copy of the second-order sections; SciPy's filter functions need writable coefficients."""
+        return self._sos.copy()
+
+    @property
+    def zi(self):
+        """Copy of the initial conditions for a unit step."""
+        return self._zi.copy()
+
+    @property
+    def dc_gain(self):
+        """Gain of the filter for a constant input."""
+        return float(np.prod(self._sos[:, :3].sum(axis=1) / self._sos[:, 3:].sum(axis=1)))
+
+
+def validate(kind, cutoff, fs, order=2, family="butter", quality=30.0):
+    """
+    Check filter parameters against the sampling rate.
+
+    Args:
+        kind (str): "notch", "lowpass", "highpass", "bandpass" or "bandstop".
+        cutoff (float or tuple): Cutoff or notch frequency in Hz, or (low, high) band edges.
+        fs (float): Sampling rate in Hz.
+        order (int): Filter order (per band edge for band filters); not used by the notch.
+        family (str): "butter" or "bessel"; not used by the notch.
+        quality (float): Quality factor of the notch.
+
+    Raises:
+        ValueError: If a parameter is out of range, naming the parameter and the valid range.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"unknown filter type {kind!r}, expected one of {', '.join(KINDS)}")
+    if not fs > 0:
+        raise ValueError(f"sampling rate must be positive, got {fs}")
+    nyquist = fs / 2
+    edges = np.atleast_1d(np.asarray(cutoff, dtype=float))
+    expected = 2 if kind in ("bandpass", "bandstop") else 1
+    if len(edges) != expected:
+        raise ValueError(f"{kind} filter needs {expected} cutoff frequenc{'ies' if expected > 1 else 'y'}, got {len(edges)}")
+    if not np.all((edges > 0) & (edges < nyquist)):
+        raise ValueError(f"cutoff must be between 0 and the Nyquist frequency {nyquist:g} Hz, got {cutoff}")
+    if expected == 2 and not edges[0] < edges[1]:
+        raise ValueError(f"band edges must be increasing, got {cutoff}")
+    if kind == "notch":
+        if not quality > 0:
+            raise ValueError(f"quality factor must be positive, got {quality}")
+        return
+    if family not in FAMILIES:
+        raise ValueError(f"unknown filter family {family!r}, expected one of {', '.join(FAMILIES)}")
+    if int(order) != order or order < 1:
+        raise ValueError(f"order must be a positive integer, got {order}")
+
+
+def design(kind, cutoff, fs, order=2, family="butter", quality=30.0):
+    """
+    Design a filter, or return the cached design for the same parameters.
+
+    Args:
+        kind (str): "notch", "lowpass", "highpass", "bandpass" or "bandstop".
+        cutoff (float or tuple): Cutoff or notch frequency in Hz, or (low, high) band edges.
+        fs (float): Sampling rate in Hz.
+        order (int): Filter order (per band edge for band filters); not used by the notch.
+        family (str): "butter" or "bessel"; not used by the notch.
+        quality (float): Quality factor of the notch.
+
+    Returns:
+        FilterDesign: Read-only SOS coefficients and initial conditions.
+
+    Raises:
+        ValueError: If the parameters are invalid for the sampling rate, or the design is unstable.
+    """
+    validate(kind, cutoff, fs, order, family, quality)
+    # Normalise the key so that 40 and 40.0, or a list and a tuple of band edges, share a design
+    cutoff = tuple(float(f) for f in np.atleast_1d(cutoff))
+    if kind == "notch":
+        return _design(kind, cutoff, float(fs), 2, None, float(quality))
+    return _design(kind, cutoff, float(fs), int(order), family, None)
+
+
+@lru_cache(maxsize=256)
+def _design(kind, cutoff, fs, order, family, quality):
+    """Design a filter from normalised parameters; cached by design()."""
+    import scipy.signal as signal  # slow to import, so not until a filter is designed
+
+    if kind == "notch":
+        sos = signal.tf2sos(*signal.iirnotch(cutoff[0], quality, fs))
+    else:
+        edges = cutoff if len(cutoff) > 1 else cutoff[0]
+        filter_function = signal.butter if family == "butter" else signal.bessel
+        sos = filter_function(order, edges, kind, fs=fs, output="sos")
+    poles = np.concatenate([np.roots(section[3:]) for section in sos])
+    if np.any(np.abs(poles) >= 1):
+        raise ValueError(f"{kind} filter of order {order} at {cutoff} Hz is numerically unstable at {fs:g} Hz")
+    zi = signal.sosfilt_zi(sos)
+    sos.flags.writeable = False
+    zi.flags.writeable = False
+    return FilterDesign(sos, zi, (kind, family, order, cutoff, fs, quality))
+
+
+cache_info = _design.cache_info
+cache_clear = _design.cache_clear
@@ -0,0 +1,212 @@
+"""
+Streaming Digital Filters
+
+Filter pipeline used by the serial thread. The enabled notch, low-pass and high-pass
+stages are cascaded into one second-order-section (SOS) bank and applied only to newly
+arrived samples of all channels at once, carrying the filter state between blocks.
+
+Adaptive mains cancellers (see mains.py) can be added as stages too, and run on the samples
+before the SOS bank.
+
+Stages can be replaced while data is streaming. The previous stages keep running for a short
+fade and their output is crossfaded into the new stages', so retuning a filter does not put a
+step into the traces.
+
+Classes:
+    FilterBank: One cascade of SOS stages with the filter state of every channel.
+    FilterPipeline: Cascaded SOS filter bank with persisted initial conditions.
+"""
+import threading
+import numpy as np
+from filter_design import FilterDesign
+from mains import MainsCanceller
+
+
+class FilterBank:
+    """
+    One cascade of SOS stages with the filter state of every channel.
+    """
+
+    def __init__(self, stages, channels):
+        """
+        Constructor for FilterBank class.
+
+        Args:
+            stages (list): FilterDesign of each stage, in cascade order.
+            channels (int): Number of channels.
+        """
+        self.sos = np.vstack([stage.sos for stage in stages])
+        # Steady-state conditions of the cascade for a unit step: each stage's own, scaled by the DC gain before it
+        gains = np.cumprod([1.0] + [stage.dc_gain for stage in stages[:-1]])
+        self.zi_step = np.vstack([stage.zi * gain for stage, gain in zip(stages, gains)])
+        self.zi = np.zeros((len(self.sos), 2, channels))
+        self.primed = np.zeros(channels, dtype=bool)  # channels whose state in zi is initialised
+
+    def run(self, x, rows):
+        """Filter samples of the channels in rows (all channels if None) and update their state."""
+        import scipy.signal as signal  # slow to import, so not until a stage is applied
+        index = np.arange(self.zi.shape[2]) if rows is None else rows
+        # Start new channels from the steady state for their first sample to avoid a step transient
+        start = ~self.primed[index]
+        if start.any():
+            self.zi[:, :, index[start]] = self.zi_step[:, :, None] * x[0, start]
+            self.primed[index[start]] = True
+        if rows is None:
+            y, self.zi = signal.sosfilt(self.sos, x, axis=0, zi=self.zi)
+        else:
+            y, self.zi[:, :, rows] = signal.sosfilt(self.sos, x, axis=0, zi=self.zi[:, :, rows])
+        return y
+
+
+class FilterPipeline:
+    """
+    Cascade of named filter stages applied block by block to all channels: adaptive mains cancellers,
+    then the SOS stages cascaded into one bank.
+    """
+
+    def __init__(self, channels, fade=0):
+        """
+        Constructor for FilterPipeline class.
+
+        Args:
+            channels (int): Number of channels.
+            fade (int): Samples over which the output is crossfaded from the previous stages when they
+                change, 0 to switch at once.
+        """
+        self.channels = channels
+        self.fade = fade
+        self.stages = {}
+        self.cancellers = ()  # MainsCanceller stages, applied first
+        self.bank = None  # FilterBank of the SOS stages, None when there are none
+        self.previous = None  # (cancellers, bank) being faded out
+        self.remaining = np.zeros(channels, dtype=int)  # samples of each channel left to fade
+        self.started = np.zeros(channels, dtype=bool)  # channels that have been through the pipeline
+        self.lock = threading.Lock()  # stages are changed from the GUI thread
+
+    def __contains__(self, name):
+        return name in self.stages
+
+    def set_stage(self, name, sos):
+        """
+        Add or replace a filter stage.
+
+        Args:
+            name (str): Stage name, e.g. "notch", "lpf" or "hpf".
+            sos (FilterDesign, np.ndarray or MainsCanceller): Design from filter_design.design, second-order
+                sections with shape (n_sections, 6), or an adaptive mains canceller.
+        """
+        if not isinstance(sos, (FilterDesign, MainsCanceller)):
+            import scipy.signal as signal
+            sos = np.atleast_2d(sos)
+            sos = FilterDesign(sos, signal.sosfilt_zi(sos), None)
+        with self.lock:
+            self.stages[name] = sos
+            self._rebuild()
+
+    def remove_stage(self, name):
+        """Remove a filter stage if it is applied."""
+        with self.lock:
+            if self.stages.pop(name, None) is not None:
+                self._rebuild()
+
+    def _rebuild(self):
+        """Cascade the stages into a new bank, fading out the current stages; state is initialised on the next block."""
+        previous = (self.cancellers, self.bank)
+        primed = self.bank.primed if self.bank is not None else self.started
+        designs = [stage for stage in self.stages.values() if isinstance(stage, FilterDesign)]
+        self.cancellers = tuple(stage for stage in self.stages.values() if isinstance(stage, MainsCanceller))
+        self.bank = FilterBank(designs, self.channels) if designs else None
+        if self.fade and primed.any():
+            self.previous = previous
+            self.remaining = np.where(primed, self.fade, 0)
+        else:
+            self.previous = None
+            self.remaining[:] = 0
+
+    def process(self, block, channels=None):
+        """
+        Filter a block of new samples, continuing from the state left by the previous block.
+
+        Must be called once for every block of the stream, as adaptive stages keep time by the blocks.
+
+        Args:
+            block (np.ndarray): Samples with shape (n_samples, channels).
+            channels (np.ndarray): Indices of the channels to filter. Defaults to all channels.
+
+        Returns:
+            np.ndarray: Filtered samples with shape (n_samples, channels), or (n_samples, len(channels)).
+        """
+        x = np.asarray(block, dtype=np.float64)
+        if channels is None:
+            return self._filter(x, None)
+        index = np.arange(self.channels)[channels]
+        return self._filter(x[:, index], index)
+
+    def restart(self, channels, history):
+        """
+        Filter some channels from scratch over their raw history, leaving their state at its end.
+
+        Used when channels that were skipped start being filtered again. The history must end with the
+        block last passed to process.
+
+        Args:
+            channels (np.ndarray): Channel indices.
+            history (np.ndarray): Raw samples with shape (n_samples, len(channels)).
+
+        Returns:
+            np.ndarray: Filtered history with shape (n_samples, len(channels)).
+        """
+        index = np.arange(self.channels)[channels]
+        with self.lock:
+            if self.bank is not None:
+                self.bank.primed[index] = False
+            self.remaining[index] = 0  # the whole history is filtered by the current stages
+        return self._filter(np.asarray(history, dtype=np.float64), index, history=True)
+
+    def _filter(self, x, index, history=False):
+        """Filter samples of the channels in index (all channels if None) and update their state."""
+        with self.lock:
+            if len(x) == 0:
+                return x
+            self.started[slice(None) if index is None else index] = True
+            if not self.cancellers and self.bank is None and self.previous is None:
+                return x
+            cancelled = {}  # output of each canceller, shared by the current and previous stages
+            y = self._run(self.cancellers, self.bank, x, index, history, cancelled)
+            if self.previous is None:
+                return y
+            if index is not None and not history:
+                # Channels skipped by this block are restarted over their history with the current stages
+                # once they are filtered again, so they have nothing left to fade
+                skipped = np.ones(self.channels, dtype=bool)
+                skipped[index] = False
+                self.remaining[skipped] = 0
+
+            remaining = self.remaining if index is None else self.remaining[index]
+            fading = remaining > 0
+            if fading.any():
+                old = self._run(*self.previous, x, index, history, cancelled)
+                done = (self.fade - remaining)[None, :] + np.arange(1, len(x) + 1)[:, None]
+                weight = np.minimum(done / self.fade, 1.0)
+                y = old + weight * (y - old)
+                if index is None:
+                    self.remaining = np.maximum(remaining - len(x), 0)
+                else:
+                    self.remaining[index] = np.maximum(remaining - len(x), 0)
+            if not self.remaining.any():
+                self.previous = None
+        return y
+
+    @staticmethod
+    def _run(cancellers, bank, x, index, history, cancelled):
+        """Apply cancellers then a bank to x. Cancellers shared with the other stages being crossfaded
+        run once per block, as they adapt to each sample, and their output is taken from cancelled."""
+        chain = ()
+        for canceller in cancellers:
+            chain += (id(canceller),)
+            if chain not in cancelled:
+                cancelled[chain] = canceller.restart(index, x) if history else canceller.process(x, index)
+            x = cancelled[chain]
+        if bank is None:
+            return x
+        return bank.run(x, index)
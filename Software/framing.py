@@ -0,0 +1,141 @@
+"""
+Serial Frame Parsing
+
+Vectorised parser for the byte stream sent by the client board. The client firmware
+(Client firmware ADC.ino) prefixes every sample with a sync word ("\\r\\n" from
+Serial.println) followed by one byte per channel. Bytes are fed in whatever chunks the
+serial port hands back and complete frames are returned as a (n_samples, channels) block.
+Firmware that numbers its frames can send a little-endian counter between the sync word and
+the payload; the counters of the last block are then kept for gap detection.
+
+Classes:
+    FrameParser: Finds fixed-size or sync-word frames in a reusable byte buffer.
+"""
+import numpy as np
+
+
+class FrameParser:
+    """
+    Parser for fixed-size or sync-word framed sample streams.
+
+    Once locked onto the stream, frames are checked for their sync word at fixed strides
+    with a single NumPy comparison, so payload bytes may take any value (including 0x0A or
+    whitespace). Lock is (re)acquired by requiring two consecutive sync words one frame apart.
+    """
+
+    def __init__(self, channels, sync=b"\r\n", dtype=np.uint8, counter_bytes=0):
+        """
+        Constructor for FrameParser class.
+
+        Args:
+            channels (int): Number of channels per frame.
+            sync (bytes): Sync word preceding each frame. Empty for unframed fixed-size frames.
+            dtype: Sample data type of the payload.
+            counter_bytes (int): Size of the frame counter following the sync word, 0 if frames are not numbered.
+        """
+        self.channels = channels
+        self.sync = bytes(sync)
+        self.dtype = np.dtype(dtype)
+        self.counter_bytes = counter_bytes
+        self.sequence_modulus = 256 ** counter_bytes
+        self.sequence = None  # frame counters of the last block
+        self.payload_size = channels * self.dtype.itemsize
+        self.frame_size = len(self.sync) + counter_bytes + self.payload_size
+        self.buffer = bytearray()
+        self.locked = False
+
+        # Stream statistics
+        self.frames = 0
+        self.malformed_frames = 0
+        self.dropped_bytes = 0
+
+    def feed(self, data):
+        """
+        Append bytes to the internal buffer and extract all complete frames.
+
+        Args:
+            data (bytes): Bytes read from the serial port.
+
+        Returns:
+            np.ndarray: Samples with shape (n_samples, channels).
+        """
+        self.buffer += data
+        raw = np.frombuffer(self.buffer, dtype=np.uint8)
+        if self.sync:
+            starts, consumed = self._find_frames(raw)
+        else:
+            n = len(raw) // self.frame_size
+            starts = np.arange(n) * self.frame_size
+            consumed = n * self.frame_size
+
+        if self.counter_bytes:
+            counters = raw[starts[:, None] + len(self.sync) + np.arange(self.counter_bytes)].astype(np.int64)
+            self.sequence = counters @ (256 ** np.arange(self.counter_bytes, dtype=np.int64))
+        offsets = starts[:, None] + len(self.sync) + self.counter_bytes + np.arange(self.payload_size)
+        payload = raw[offsets]  # fancy indexing copies, so the buffer can be resized below
+        del raw
+        del self.buffer[:consumed]
+
+        self.frames += len(starts)
+        return payload.view(self.dtype).reshape(len(starts), self.channels)
+
+    def _find_frames(self, raw):
+        """
+        Locate the start offsets of complete sync-word frames.
+
+        Args:
+            raw (np.ndarray): Buffered bytes as uint8.
+
+        Returns:
+            tuple: Array of frame start offsets and number of bytes consumed.
+        """
+        size = self.frame_size
+        n = len(raw)
+        sync_len = len(self.sync)
+        if n < sync_len:
+            return np.empty(0, dtype=np.intp), 0
+
+        # Mark every offset at which the sync word begins
+        is_sync = np.ones(n - sync_len + 1, dtype=bool)
+        for k, byte in enumerate(self.sync):
+            is_sync &= raw[k:n - sync_len + 1 + k] == byte
+
+        starts = []
+        pos = 0
+        while True:
+            if not self.locked:
+                # Require two consecutive sync words one frame apart to acquire lock
+                last = n - size - sync_len  # last offset whose successor sync can be checked
+                if last < pos:
+                    break
+                candidates = np.flatnonzero(is_sync[pos:last + 1] & is_sync[pos + size:last + size + 1])
+                if candidates.size == 0:
+                    self.dropped_bytes += last + 1 - pos
+                    pos = last + 1
+                    break
+                self.dropped_bytes += int(candidates[0])
+                pos += int(candidates[0])
+                self.locked = True
+
+            # Locked: frames are expected at fixed strides from the current position
+            k = (n - pos) // size
+            if k == 0:
+                break
+            offsets = pos + size * np.arange(k)
+            bad = np.flatnonzero(~is_sync[offsets])
+            good = k if bad.size == 0 else int(bad[0])
+            starts.append(offsets[:good])
+            pos += good * size
+            if good == k:
+                break
+            self.locked = False
+            self.malformed_frames += 1
+
+        if starts:
+            return np.concatenate(starts), pos
+        return np.empty(0, dtype=np.intp), pos
+
+    def reset(self):
+        """Discard buffered bytes and drop lock."""
+        self.buffer.clear()
+        self.locked = False
@@ -0,0 +1,1344 @@
+"""
+Biopotential Monitor GUI
+
+The Qt window and the threads feeding it, started by Biopotential Monitor.py. The window shows
+a real-time plot of every channel, a body-surface map and, on request, the spectrogram and PSD
+of one channel; the user can start and stop monitoring, filter the traces, record data to a CSV
+or binary file with markers and filter changes in its annotation index, and save the plot as a
+PNG image. In demo mode an emulated board streams synthetic or replayed signals through the same
+acquisition path. Acquisition runs on a thread by default, or in a separate process writing to
+shared memory with backend="process".
+
+Classes:
+    App: Main application class for the biopotential signal monitor.
+    AcquisitionThread: Base class for the threads notifying the GUI of new samples.
+    SerialThread: Thread for reading data from the serial port.
+    AcquisitionProcessThread: Thread relaying between the GUI and an acquisition process.
+"""
+import sys
+import time
+import os
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+from PyQt5.QtWidgets import *
+from PyQt5.QtCore import *
+from PyQt5.QtGui import *
+from datetime import datetime
+import numpy as np
+import pyqtgraph as pg
+from buffers import MultiChannelRingBuffer, SharedRingBuffer
+from acquisition import AcquisitionEngine, AcquisitionProcess, FilterStages, open_source
+from stacked_plot import StackedTracePlot
+from body_map import BodySurfaceMap
+from mains import MainsCanceller
+from spectral import StreamingSTFT
+from spectrum_panel import SpectrumPanel
+from preprocessing import to_microvolts
+from profiling import Profiler
+import filter_design
+from emulator import start_boards
+from devices import find_board_ports
+
+
+class App(QMainWindow):
+    """
+    Main application class for BSPM Monitor.
+    """
+
+    source_ready = pyqtSignal() # the board, emulator or acquisition process is connected and monitoring can start
+
+    # ------------------------------------------------------------------------------------------
+    #                                 Initialisation and Setup
+    # ------------------------------------------------------------------------------------------
+
+    def __init__(self, channels: int, baudrate=1000000, demo_mode=False, sampling_rate=250, target_fps=30,
+                 record_format="csv", render_mode="auto", use_opengl=False, show_map=True, layout_path=None,
+                 demo_source="ecg", demo_speed=1.0, counter_bytes=0, interpolate_gaps=True, boards=1, ports=None,
+                 backend="thread", demo_loss=0.0, start=False, launch_time=None, infer_gaps=False):
+        """
+        Constructor for App class.
+
+        Args:
+            channels (int): Number of plots to display.
+            parent: Parent widget.
+            demo_mode (bool): Flag indicating whether the application is in demo mode, reading from an
+                emulated board instead of the serial port.
+            target_fps (int): Rate at which the plots are redrawn from the ring buffers.
+            record_format (str): Recording file format, "csv" or "bpr" (binary).
+            render_mode (str): "channels" for one plot per channel, "stacked" for all channels as offset
+                traces in a single plot, or "auto" to stack above 16 channels.
+            use_opengl (bool): Draw the stacked plot through OpenGL.
+            show_map (bool): Show the body-surface potential map next to the traces.
+            layout_path (str): Electrode layout CSV for the map, defaults to assets/electrode_layout.csv.
+            demo_source (str): Demo mode signal, "ecg", "emg", "eeg" or a recording to replay.
+            demo_speed (float): Demo mode streaming speed as a multiple of real time.
+            counter_bytes (int): Size of the frame counter sent by the firmware, 0 to detect lost samples
+                from arrival times.
+            interpolate_gaps (bool): Interpolate lost samples in the live plots; recordings keep the gaps.
+            boards (int): Number of receiver boards, each sending an equal share of the channels. Several
+                boards are merged into one stream on the first board's sample clock.
+            ports (list): Serial ports of the boards, in channel order. Defaults to the boards found attached.
+            backend (str): "thread" to acquire on a thread of the GUI process, or "process" to read, parse,
+                record and filter in a separate process writing to shared-memory ring buffers.
+            demo_loss (float): Demo mode probability of dropping each packet.
+            start (bool): Start monitoring as soon as the board is connected.
+            launch_time (float): time.perf_counter() time at which the program was launched, to report
+                the time to the first samples.
+            infer_gaps (bool): Without a frame counter, leave the gaps found from arrival times in the sample
+                indices instead of only reporting them.
+        """
+        super(App, self).__init__()
+
+        # Test mode
+        self.demo_mode = demo_mode
+        self.demo_source = demo_source
+        self.demo_speed = demo_speed
+        self.demo_loss = demo_loss
+        self.start = start
+        self.launch_time = launch_time
+
+        # Initialise parameters for data acquisition
+        self.sampling_rate = sampling_rate  # Hz
+        self.buffer_size = 6 * self.sampling_rate  # 4 second window
+        self.channels = channels
+        self.baudrate = baudrate
+        self.counter_bytes = counter_bytes
+        self.interpolate_gaps = interpolate_gaps
+        self.infer_gaps = infer_gaps
+        if channels % boards:
+            raise ValueError(f"{channels} channels cannot be split equally between {boards} boards")
+        self.boards = boards
+        self.ports = ports
+        if backend not in ("thread", "process"):
+            raise ValueError(f"Unknown acquisition backend {backend!r}")
+        self.backend = backend
+        self.calls = 0  # fps counter variable
+        self.t = np.linspace(-self.buffer_size/self.sampling_rate, 0, num=self.buffer_size)
+        self.fps = 0.
+        self.fps_text = ""
+        self.lastupdate = time.time()
+
+        # Initialise render scheduling, independent of the acquisition rate
+        self.target_fps = target_fps
+        self.render_interval = 1 / self.target_fps
+        self.last_render = time.perf_counter()
+        self.rendered_samples = 0 # buffer sample count at the last redraw
+        self.dropped_frames = 0 # timer ticks missed because the GUI fell behind
+        self.render_timer = QTimer()
+        self.render_timer.setTimerType(Qt.PreciseTimer)
+        self.render_timer.timeout.connect(self.render_frame)
+        if render_mode == "auto":
+            render_mode = "stacked" if channels > 16 else "channels"
+        self.render_mode = render_mode
+        self.use_opengl = use_opengl
+        self.show_map = show_map
+        self.layout_path = layout_path or self.resource_path("assets/electrode_layout.csv")
+
+        # Initialize flags
+        self.started_monitoring = False # check for first time monitoring
+        self.update_enabled = False # flag to enable/disable plot updates
+        self.recording_active = False # flag to enable/disable recording to file
+        self.render_override = False # flag to render all plots upon update_enable=False
+
+        # Create a ring buffer shared by all channels for data storage; the acquisition process fills
+        # buffers in shared memory, which the GUI only reads
+        if self.backend == "process":
+            self.buffers = SharedRingBuffer(self.channels, self.buffer_size, dtype=np.uint8, readonly=True)
+            self.filtered_buffers = SharedRingBuffer(self.channels, self.buffer_size, dtype=np.float32, readonly=True)
+        else:
+            self.buffers = MultiChannelRingBuffer(self.channels, self.buffer_size, dtype=np.uint8)
+            self.filtered_buffers = MultiChannelRingBuffer(self.channels, self.buffer_size, dtype=np.float32)
+
+        # Instrumentation of the acquisition and render paths, enabled from the profiling panel
+        self.profiler = Profiler()
+        self.render_timer_laps = self.profiler.timer()
+        self.last_profile_update = 0.0
+        self.last_bytes_received = 0
+
+        # Streaming STFT of the raw samples, fed by the render timer while the spectrum panel is shown
+        self.stft = None
+        self.spectrum_count = 0 # raw buffer sample count fed to the STFT
+
+        # Recordings are written by the acquisition thread or process
+        self.record_format = record_format
+        self.recording_stats = None # samples written and blocks dropped by the last recording
+        self.emulators = [] # emulated boards in demo mode, when acquiring on a thread
+
+        # Initialise the application window
+        self.setWindowTitle("Biopotential Signal Monitor")  # Set the window title
+        self.setupUi()
+        self.showMaximized()
+        self.console_append("Initialising...")
+
+        # Connect to board once the window is shown
+        self.console_append("Searching for board..." if not demo_mode else "Demo mode")
+        QTimer.singleShot(0, self.initialise_serial)
+
+    def initialise_serial(self):
+        """Delayed initialisation after the window is shown."""
+        if self.backend == "process":
+            self.ser = self.start_acquisition_process()
+        else:
+            # Connect to the board, or to emulated boards in demo mode; several boards are read through a DeviceManager
+            if self.demo_mode:
+                self.ser = self.start_emulator()
+            else:
+                self.ser = self.connect_to_boards() if self.boards > 1 else self.connect_to_board()
+            if self.ser is None:
+                return
+
+            # Create a serial thread for reading data from the board
+            self.serial_thread = SerialThread(self.ser, self.buffers, self.filtered_buffers, self.channels,
+                                              self.sampling_rate, self.profiler, self.counter_bytes, self.interpolate_gaps,
+                                              self.infer_gaps)
+            self.serial_thread.engine.emulators = self.emulators
+
+            # Connect the data received signal to the notification handler; plots are redrawn by the render timer
+            self.serial_thread.data_received.connect(self.on_data_received)
+
+            # self.ser.write(self.channels.to_bytes(1, byteorder='big'))  # Tell the board how many channels to expect
+        if self.ser is not None:
+            self.source_ready.emit()
+        if self.start and self.ser is not None:
+            self.toggle_update()
+
+    def setupUi(self):
+        """Set up user interface."""
+
+        # Create the main layout
+        self.mainbox = QWidget()
+        self.setCentralWidget(self.mainbox)
+        self.layout = QHBoxLayout(self.mainbox)
+        self.layout.setSpacing(0)
+
+        # Create a widget for controls
+        self.controls_widget = QWidget()
+        self.controls_layout = QVBoxLayout(self.controls_widget)
+        self.layout.addWidget(self.controls_widget)
+        self.controls_widget.setMaximumWidth(400)
+        self.controls_layout.setAlignment(Qt.AlignTop)
+        self.controls_layout.setSpacing(5)  # Adjust the spacing here
+
+        # Create a Battery Level Label
+        self.battery_label = QLabel("Battery Level: 100%")
+        self.controls_layout.addWidget(self.battery_label)
+        self.battery_label.setAlignment(Qt.AlignBottom | Qt.AlignCenter)
+
+        # Create a console widget
+        self.console = QTextEdit()
+        self.console.setReadOnly(True)
+        font = QFont("Courier New", 10)
+        self.console.setFont(font)
+        self.controls_layout.addWidget(self.console)
+
+        # Create an hpf widget
+        self.hpf_widget = QWidget()
+        self.hpf_layout = QHBoxLayout(self.hpf_widget)
+        self.controls_layout.addWidget(self.hpf_widget)
+        self.hpf_layout.setAlignment(Qt.AlignTop)
+        self.hpf_layout.setSpacing(5)
+
+        # Add a high pass filter button
+        self.hpf_button = QPushButton("")
+        self.hpf_button.setIcon(QIcon(self.resource_path("assets/hpf.png")))
+        self.hpf_button.setMaximumWidth(38)
+        self.hpf_button.setEnabled(False)
+        self.hpf_button.setIconSize(QSize(30, 20))
+        self.hpf_button.setCheckable(True)
+        self.hpf_button.clicked.connect(self.apply_high_pass_filter)
+        self.hpf_layout.addWidget(self.hpf_button)
+
+        # Add high pass filter function dropdown
+        self.hpf_function_dropdown = QComboBox()
+        self.hpf_function_dropdown.addItem("Bessel")
+        self.hpf_function_dropdown.addItem("Butterworth")
+        self.hpf_function_dropdown.setMaximumWidth(80)
+        self.hpf_function_dropdown.currentIndexChanged.connect(lambda: self.retune_filter("hpf"))
+        self.hpf_layout.addWidget(self.hpf_function_dropdown)
+
+        # Add high pass filter order input label
+        self.hpf_order_input_label = QLabel("Order")
+        self.hpf_layout.addWidget(self.hpf_order_input_label)
+
+        # Add high pass filter order input
+        self.hpf_order_input = QLineEdit()
+        self.hpf_order_input.setText("2")
+        self.hpf_order_input.setMaximumWidth(40)
+        self.hpf_order_input.editingFinished.connect(lambda: self.retune_filter("hpf"))
+        self.hpf_layout.addWidget(self.hpf_order_input)
+
+        # Add high pass filter frequency input label
+        self.hpf_freq_input_label = QLabel("Cutoff")
+        self.hpf_layout.addWidget(self.hpf_freq_input_label)
+
+        # Add high pass filter frequency input
+        self.hpf_freq_input = QLineEdit()
+        self.hpf_freq_input.setText("0.05")
+        self.hpf_freq_input.setMaximumWidth(40)
+        self.hpf_freq_input.editingFinished.connect(lambda: self.retune_filter("hpf"))
+        self.hpf_layout.addWidget(self.hpf_freq_input)
+
+        # Hz label
+        self.hz_label = QLabel("Hz")
+        self.hpf_layout.addWidget(self.hz_label)
+
+        # Create an lpf widget
+        self.lpf_widget = QWidget()
+        self.lpf_layout = QHBoxLayout(self.lpf_widget)
+        self.controls_layout.addWidget(self.lpf_widget)
+        self.lpf_layout.setSpacing(5)
+        self.lpf_layout.setAlignment(Qt.AlignTop)
+
+        # Add a low pass filter button
+        self.lpf_button = QPushButton("")
+        self.lpf_button.setIcon(QIcon(self.resource_path("assets/lpf.png")))
+        self.lpf_button.setMaximumWidth(38)
+        self.lpf_button.setEnabled(False)
+        self.lpf_button.setIconSize(QSize(30, 20))
+        self.lpf_button.setCheckable(True)
+        self.lpf_button.clicked.connect(self.apply_low_pass_filter)
+        self.lpf_layout.addWidget(self.lpf_button)
+
+        # Add low pass filter function dropdown
+        self.lpf_function_dropdown = QComboBox()
+        self.lpf_function_dropdown.addItem("Bessel")
+        self.lpf_function_dropdown.addItem("Butterworth")
+        self.lpf_function_dropdown.setMaximumWidth(80)
+        self.lpf_function_dropdown.currentIndexChanged.connect(lambda: self.retune_filter("lpf"))
+        self.lpf_layout.addWidget(self.lpf_function_dropdown)
+
+        # Add low pass filter order input label
+        self.lpf_order_input_label = QLabel("Order")
+        self.lpf_layout.addWidget(self.lpf_order_input_label)
+
+        # Add low pass filter order input
+        self.lpf_order_input = QLineEdit()
+        self.lpf_order_input.setText("2")
+        self.lpf_order_input.setMaximumWidth(40)
+        self.lpf_order_input.editingFinished.connect(lambda: self.retune_filter("lpf"))
+        self.lpf_layout.addWidget(self.lpf_order_input)
+
+        # Add low pass filter frequency input label
+        self.lpf_freq_input_label = QLabel("Cutoff")
+        self.lpf_layout.addWidget(self.lpf_freq_input_label)
+
+        # Add low pass filter frequency input
+        self.lpf_freq_input = QLineEdit()
+        self.lpf_freq_input.setText("40.0")
+        self.lpf_freq_input.setMaximumWidth(40)
+        self.lpf_freq_input.editingFinished.connect(lambda: self.retune_filter("lpf"))
+        self.lpf_layout.addWidget(self.lpf_freq_input)
+
+        # Hz label
+        self.hz_label = QLabel("Hz")
+        self.lpf_layout.addWidget(self.hz_label)
+
+        # Add a notch filter widget
+        self.notch_widget = QWidget()
+        self.notch_layout = QHBoxLayout(self.notch_widget)
+        self.controls_layout.addWidget(self.notch_widget)
+        self.notch_layout.setSpacing(5)
+        self.notch_layout.setAlignment(Qt.AlignTop)
+
+        # Add a notch filter button
+        self.notch_button = QPushButton("")
+        self.notch_button.setIcon(QIcon(self.resource_path("assets/notch.png")))
+        self.notch_button.setMaximumWidth(38)
+        self.notch_button.setEnabled(False)
+        self.notch_button.setIconSize(QSize(30, 20))
+        self.notch_button.setCheckable(True)
+        self.notch_button.clicked.connect(self.apply_notch_filter)
+        self.notch_layout.addWidget(self.notch_button)
+
+        # Add notch filter type dropdown, a fixed IIR notch or the adaptive mains canceller
+        self.notch_type_dropdown = QComboBox()
+        self.notch_type_dropdown.addItem("Fixed")
+        self.notch_type_dropdown.addItem("Adaptive")
+        self.notch_type_dropdown.setMaximumWidth(80)
+        self.notch_type_dropdown.currentIndexChanged.connect(self.select_notch_type)
+        self.notch_layout.addWidget(self.notch_type_dropdown)
+
+        # Add notch filter quality factor input label
+        self.notch_qf_input_label = QLabel("Q-Factor")
+        self.notch_layout.addWidget(self.notch_qf_input_label)
+
+        # Add notch filter quality factor input
+        self.notch_qf_input = QLineEdit()
+        self.notch_qf_input.setText("10.0")
+        self.notch_qf_input.setMaximumWidth(40)
+        self.notch_qf_input.editingFinished.connect(lambda: self.retune_filter("notch"))
+        self.notch_layout.addWidget(self.notch_qf_input)
+
+        # Add notch filter frequency input label
+        self.notch_freq_input_label = QLabel("Notch Frequency")
+        self.notch_layout.addWidget(self.notch_freq_input_label)
+
+        # Add notch filter frequency input
+        self.notch_freq_input = QLineEdit()
+        self.notch_freq_input.setText("50.0")
+        self.notch_freq_input.setMaximumWidth(40)
+        self.notch_freq_input.editingFinished.connect(lambda: self.retune_filter("notch"))
+        self.notch_layout.addWidget(self.notch_freq_input)
+
+        # Hz label
+        self.hz_label = QLabel("Hz")
+        self.notch_layout.addWidget(self.hz_label)
+
+        # Create button widgets
+        self.buttons_widget = QWidget()
+        self.buttons_layout = QHBoxLayout(self.buttons_widget)
+        self.controls_layout.addWidget(self.buttons_widget)
+        self.buttons_layout.setAlignment(Qt.AlignTop)
+
+        # Add pause button
+        self.pause_button = QPushButton("Start Monitoring")
+        self.pause_button.setMaximumWidth(120)
+        self.pause_button.clicked.connect(self.toggle_update)
+        self.buttons_layout.addWidget(self.pause_button)
+
+        # Add a save as png button
+        self.save_button = QPushButton("Save as PNG")
+        self.save_button.setMaximumWidth(120)
+        self.save_button.clicked.connect(self.save_as_png)
+        self.buttons_layout.addWidget(self.save_button)
+        self.save_button.setEnabled(False)
+
+        # Add record to CSV button
+        self.record_button = QPushButton(f"Record to {self.record_format.upper()}")
+        self.record_button.setMaximumWidth(120)
+        self.record_button.clicked.connect(self.toggle_record)
+        self.buttons_layout.addWidget(self.record_button)
+        self.record_button.setEnabled(False)
+
+        # Add marker text input and button, to annotate the recording in progress
+        self.marker_input = QLineEdit()
+        self.marker_input.setPlaceholderText("Marker")
+        self.marker_input.setMaximumWidth(120)
+        self.marker_input.returnPressed.connect(self.add_marker)
+        self.buttons_layout.addWidget(self.marker_input)
+        self.marker_button = QPushButton("Add Marker")
+        self.marker_button.setMaximumWidth(120)
+        self.marker_button.clicked.connect(self.add_marker)
+        self.buttons_layout.addWidget(self.marker_button)
+        self.marker_button.setEnabled(False)
+
+        # Create profiling widgets
+        self.profiling_widget = QWidget()
+        self.profiling_layout = QHBoxLayout(self.profiling_widget)
+        self.controls_layout.addWidget(self.profiling_widget)
+        self.profiling_layout.setAlignment(Qt.AlignTop)
+
+        # Add profiling toggle button
+        self.profiling_button = QPushButton("Profiling")
+        self.profiling_button.setMaximumWidth(120)
+        self.profiling_button.setCheckable(True)
+        self.profiling_button.clicked.connect(self.toggle_profiling)
+        self.profiling_layout.addWidget(self.profiling_button)
+
+        # Add export trace button
+        self.trace_button = QPushButton("Export Trace")
+        self.trace_button.setMaximumWidth(120)
+        self.trace_button.clicked.connect(self.export_trace)
+        self.profiling_layout.addWidget(self.trace_button)
+        self.trace_button.setEnabled(False)
+
+        # Create spectrum widgets
+        self.spectrum_widget = QWidget()
+        self.spectrum_layout = QHBoxLayout(self.spectrum_widget)
+        self.controls_layout.addWidget(self.spectrum_widget)
+        self.spectrum_layout.setAlignment(Qt.AlignTop)
+
+        # Add spectrum toggle button
+        self.spectrum_button = QPushButton("Spectrum")
+        self.spectrum_button.setMaximumWidth(120)
+        self.spectrum_button.setCheckable(True)
+        self.spectrum_button.clicked.connect(self.toggle_spectrum)
+        self.spectrum_layout.addWidget(self.spectrum_button)
+
+        # Add spectrum channel selector
+        self.spectrum_channel_label = QLabel("Channel")
+        self.spectrum_layout.addWidget(self.spectrum_channel_label)
+        self.spectrum_channel_input = QSpinBox()
+        self.spectrum_channel_input.setRange(1, self.channels)
+        self.spectrum_channel_input.setMaximumWidth(60)
+        self.spectrum_channel_input.valueChanged.connect(self.select_spectrum_channel)
+        self.spectrum_layout.addWidget(self.spectrum_channel_input)
+
+        # Profiling panel, hidden until profiling is enabled
+        self.profiling_label = QLabel()
+        self.profiling_label.setFont(QFont("Courier New", 9))
+        self.controls_layout.addWidget(self.profiling_label)
+        self.profiling_label.hide()
+
+        # Info Box
+        self.info_label = QLabel()
+        self.info_label.setAlignment(Qt.AlignBottom | Qt.AlignCenter)
+        self.controls_layout.addWidget(self.info_label)
+        self.update_info_box()
+
+        # Create a scroll area widget for plots
+        self.scroll = QScrollArea()
+        self.scroll.setWidgetResizable(True)
+        self.layout.addWidget(self.scroll)
+
+        # Create a widget for plots
+        self.canvas = QWidget()
+        self.scroll.setWidget(self.canvas)
+        self.canvas_layout = QVBoxLayout(self.canvas)
+        self.canvas_layout.setSpacing(0)
+
+        # Create plots, schedule first update
+        self.create_plots()
+
+        # Body-surface potential map beside the traces
+        self.body_map = None
+        if self.show_map:
+            try:
+                self.body_map = BodySurfaceMap(self.layout_path, self.channels)
+                self.body_map.setMinimumWidth(300)
+                self.body_map.setMaximumWidth(400)
+                self.layout.addWidget(self.body_map)
+            except (OSError, KeyError, ValueError) as e:
+                self.console_append(f"Could not load electrode layout: {e}")
+
+        # Spectrogram and PSD beside the traces, created when first shown
+        self.spectrum_panel = None
+
+    def create_plots(self):
+        """Creates a plot widget for each channel, or one stacked plot, and adds it to the scroll area."""
+        self.plots = []
+        self.stacked_plot = None
+        if self.render_mode == "stacked":
+            x_range = (-self.buffer_size/self.sampling_rate + 1, 0)
+            try:
+                self.stacked_plot = StackedTracePlot(self.channels, x_range, use_opengl=self.use_opengl)
+            except Exception as e:  # no usable OpenGL implementation
+                self.console_append(f"OpenGL unavailable ({e}), using the default renderer")
+                self.stacked_plot = StackedTracePlot(self.channels, x_range)
+            self.canvas_layout.addWidget(self.stacked_plot)
+            return
+
+        # Style the plots
+        cmap = pg.ColorMap([0, self.channels-1], [pg.mkColor('#729ece'), pg.mkColor('#ff9e4a')])
+        font = QFont()
+        font.setPixelSize(10)
+
+        # Create a plot for each channel
+        for i in range(self.channels):
+            color = cmap.map(i)
+            plot = pg.PlotWidget()
+            plot.setLabel("left", f"Channel {i+1}")
+            plot.getAxis("bottom").setStyle(tickFont=font)
+            plot.getAxis("left").setStyle(tickFont=font)
+            plot.setMinimumHeight(120)
+            plot.setYRange(0, 255)
+            plot.setXRange(-self.buffer_size/self.sampling_rate + 1, 0)
+            curve = plot.plot(pen=color)
+            self.plots.append((curve, plot))  # Store both the plot and the curve handle
+            self.canvas_layout.addWidget(plot)
+
+    def connect_to_board(self):
+        """Connect to the first board found."""
+        board_ports = self.ports or find_board_ports()
+        if board_ports:
+            board_port = board_ports[0]
+            self.console_append("Connected to board on port: " + board_port)
+            self.pause_button.setText("Start Monitoring")
+            ser, _ = open_source({"channels": self.channels, "sampling_rate": self.sampling_rate,
+                                  "ports": [board_port], "baudrate": self.baudrate})
+            return ser
+        self.console_append("Couldn't find board")
+        self.pause_button.setText("Connect to Board")
+
+    def connect_to_boards(self):
+        """Connect to several boards and merge their channels into one stream."""
+        board_ports = self.ports or find_board_ports()
+        if len(board_ports) < self.boards:
+            self.console_append(f"Found {len(board_ports)} of {self.boards} boards")
+            self.pause_button.setText("Connect to Board")
+            return None
+        devices, _ = open_source(self.source_spec(ports=board_ports[:self.boards]))
+        self.console_append("Connected to boards on ports: " + ", ".join(board_ports[:self.boards]))
+        self.pause_button.setText("Start Monitoring")
+        return devices
+
+    def on_data_received(self, count):
+        """
+        Handle a new data notification from the serial thread.
+
+        Args:
+            count (int): Total number of samples written to the ring buffer.
+        """
+        self.serial_thread.signals_handled += 1
+        if self.launch_time is not None:
+            message = f"First samples {time.perf_counter() - self.launch_time:.2f} s after launch"
+            self.console_append(message)
+            print(message, flush=True)
+            self.launch_time = None
+
+    def on_acquisition_exited(self, message):
+        """
+        Stop monitoring once the acquisition process has exited, e.g. on a serial port error.
+
+        Args:
+            message (str): Description of the exit.
+        """
+        self.console_append(message)
+        if self.recording_active:
+            self.toggle_record()
+        self.render_timer.stop()
+        for button in (self.pause_button, self.record_button, self.marker_button):
+            button.setEnabled(False)
+
+    def render_frame(self):
+        """
+        Redraw the plots from the latest filtered window on each render timer tick.
+
+        The timer does not queue ticks while the GUI is busy, so frames are dropped rather than
+        accumulated when rendering falls behind. Ticks with no new samples are skipped.
+        """
+        self.serial_thread.visible_channels = self.visible_channels()
+        now = time.perf_counter()
+        elapsed = now - self.last_render
+        self.last_render = now
+        if elapsed > 1.5 * self.render_interval:
+            self.dropped_frames += int(elapsed / self.render_interval) - 1
+        if self.filtered_buffers.count == self.rendered_samples and not self.render_override:
+            return
+        if self.render_override and not self.serial_thread.filtered_channels.all():
+            return  # wait for the serial thread to backfill hidden channels before rendering all plots
+        self.rendered_samples = self.filtered_buffers.count
+        self.render_timer_laps.start()
+        self.update_plots(self.filtered_buffers.view())
+        self.render_timer_laps.lap("render")
+        if self.stft is not None and self.update_enabled:
+            self.update_spectrum()
+            self.render_timer_laps.lap("spectrum")
+        self.profiler.rendered(self.rendered_samples)
+
+    def update_plots(self, data):
+        """ 
+        Update plots with new data.
+
+        Checks if the plot update flag is enabled and the plot is visible in the scroll area.
+        If the plot is not visible, the data is not updated. This is done to reduce the computational 
+        load when many plots are used. The data is still stored in the ring buffers and is consequently 
+        available for saving to CSV. The render override flag renders all plots when the update flag is 
+        disabled to allow saving of plots as a PNG. Recording data to CSV is possible even when the plot 
+        update flag is disabled. The serial thread only filters the channels returned by visible_channels,
+        so hidden channels cost no filtering either.
+
+        Args:
+            data (np.ndarray): Filtered window with shape (channels, n_samples).
+        """
+
+        if self.stacked_plot is not None:
+            if self.update_enabled or self.render_override:
+                self.stacked_plot.set_data(self.t[:data.shape[1]], data)
+                if self.update_enabled:
+                    self.fps_counter()
+                self.render_override = False
+        elif self.update_enabled:
+            for i, (curve, plot) in enumerate(self.plots):
+                if self.is_plot_visible(plot):
+                    curve.setData(self.t[:len(data[i])], data[i])
+            self.fps_counter()
+        elif self.render_override:
+            for i, (curve, plot) in enumerate(self.plots):
+                curve.setData(self.t[:len(data[i])], data[i])
+            self.render_override = False
+        if self.body_map is not None and self.update_enabled:
+            self.update_map(data)
+        self.update_info_box()
+        # self.update_battery_level()
+
+    def update_map(self, data):
+        """
+        Redraw the body-surface map from the latest sample of every channel.
+
+        Each channel's mean over the window is removed so the map shows deviations from baseline,
+        and the colour scale follows the largest deviation in the window.
+
+        Args:
+            data (np.ndarray): Filtered window with shape (channels, n_samples).
+        """
+        if data.shape[1] == 0:
+            return
+        deviation = data - data.mean(axis=1, keepdims=True)
+        self.body_map.set_frame(deviation[:, -1], max(float(np.abs(deviation).max()), 1.0))
+
+    def update_spectrum(self):
+        """
+        Feed the raw samples that arrived since the last frame to the STFT and redraw the spectrum panel.
+
+        The raw samples are used rather than the filtered ones, as hidden channels are not filtered and
+        the spectrum should show what the filters are removing. If more samples arrived than the raw
+        buffer holds, e.g. while paused, the STFT starts again from the samples still held.
+        """
+        count = self.buffers.count
+        if count - self.spectrum_count > self.buffers.capacity:
+            self.stft.reset()
+            self.spectrum_count = count - self.buffers.capacity
+        block = self.buffers.since(self.spectrum_count, count)
+        self.spectrum_count = count
+        self.stft.update(to_microvolts(block.T))
+        self.spectrum_panel.refresh()
+
+    def start_emulator(self):
+        """Start emulated boards and return the in-process serial port they stream to, or a DeviceManager
+        merging them if there are several."""
+        source, self.emulators = start_boards(self.demo_source, self.channels, self.sampling_rate, self.boards,
+                                              self.demo_speed, self.demo_loss, self.counter_bytes, self.infer_gaps)
+        self.console_append(f"Emulating {self.channels}-channel {os.path.basename(self.demo_source)} "
+                            f"{'board' if self.boards == 1 else f'on {self.boards} boards'}")
+        return source
+
+    def start_acquisition_process(self):
+        """Start the acquisition process on the boards found, or on emulated boards in demo mode, and
+        return the thread relaying between it and the GUI."""
+        if self.demo_mode:
+            spec = self.source_spec(demo_source=self.demo_source, demo_speed=self.demo_speed, demo_loss=self.demo_loss)
+            self.console_append(f"Emulating {self.channels}-channel {os.path.basename(self.demo_source)} "
+                                f"{'board' if self.boards == 1 else f'on {self.boards} boards'} in the acquisition process")
+        else:
+            board_ports = self.ports or find_board_ports()
+            if len(board_ports) < self.boards:
+                self.console_append(f"Found {len(board_ports)} of {self.boards} boards" if self.boards > 1
+                                    else "Couldn't find board")
+                self.pause_button.setText("Connect to Board")
+                return None
+            spec = self.source_spec(ports=board_ports[:self.boards])
+            self.console_append("Connecting to board on port: " + ", ".join(board_ports[:self.boards]))
+            self.pause_button.setText("Start Monitoring")
+        self.serial_thread = AcquisitionProcessThread(spec, self.buffers, self.filtered_buffers, self.profiler)
+        self.serial_thread.data_received.connect(self.on_data_received)
+        self.serial_thread.process_exited.connect(self.on_acquisition_exited)
+        return self.serial_thread
+
+    def source_spec(self, **source):
+        """Description of the sample source for acquisition.open_source."""
+        spec = {"channels": self.channels, "sampling_rate": self.sampling_rate, "boards": self.boards,
+                "baudrate": self.baudrate, "counter_bytes": self.counter_bytes, "interpolate_gaps": self.interpolate_gaps,
+                "infer_gaps": self.infer_gaps}
+        spec.update(source)
+        return spec
+
+    # ------------------------------------------------------------------------------------------
+    #                                      Utility functions
+    # ------------------------------------------------------------------------------------------
+
+    def is_plot_visible(self, plot):
+        """
+        Check if the plot is visible in the scroll area.
+
+        Args:
+            plot (pg.PlotWidget): Plot widget.
+
+        Returns:
+            bool: True if the plot is visible, False otherwise.
+        """
+        if not self.update_enabled:
+            return True
+        scroll_pos = self.scroll.verticalScrollBar().value()
+        plot_pos = plot.pos().y()
+        return scroll_pos - plot.height() < plot_pos < scroll_pos + self.scroll.viewport().height()
+
+    def visible_channels(self):
+        """
+        Get the channels currently on screen, which are the only ones the serial thread filters.
+
+        Returns:
+            np.ndarray: Indices of the visible channels, including those drawn on the body-surface map,
+                or None when all channels are needed (stacked plot, or paused for saving).
+        """
+        if self.stacked_plot is not None or not self.update_enabled:
+            return None
+        visible = {i for i, (curve, plot) in enumerate(self.plots) if self.is_plot_visible(plot)}
+        if self.body_map is not None:
+            visible.update(self.body_map.indices.tolist())
+        return np.array(sorted(visible), dtype=int)
+
+    def get_timestamp(self):
+        """Get the current date and time as a string."""
+        return datetime.now().strftime("%H:%M:%S") + " "
+
+    def resource_path(self, relative_path):
+        """ Get absolute path to resource for image icons."""
+        base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+        return os.path.join(base_path, relative_path)
+
+    def console_append(self, text):
+        """Append text to the console."""
+        self.console.append(self.get_timestamp() + text)
+
+    # ------------------------------------------------------------------------------------------
+    #                                User Interactions and Controls
+    # ------------------------------------------------------------------------------------------
+
+    def toggle_update(self):
+        """Toggle update of plots."""
+        if not self.started_monitoring: # check for first time monitoring
+            if self.ser: # Check if the serial object was created successfully
+                self.ser.flushInput() # Clear the input buffer
+                self.started_monitoring = True # Start monitoring
+                self.record_button.setEnabled(True)
+                self.notch_button.setEnabled(True)
+                self.lpf_button.setEnabled(True)
+                self.hpf_button.setEnabled(True)
+                self.update_enabled = True # Start updating the plots
+                new_label = "Pause"
+                self.pause_button.setText(new_label)
+                self.console_append("Monitoring started")
+                self.serial_thread.start()
+                self.lastupdate = time.time()
+                self.last_render = time.perf_counter()
+                self.render_timer.start(int(1000 / self.target_fps))
+            else: # If the serial object was not created, try again
+                self.console_append("Attempting to connect to board...")
+                self.initialise_serial() # Try to connect to the board
+        else: # If monitoring has already started, toggle update state: pause/resume
+            self.update_enabled = not self.update_enabled
+            new_label = "Resume" if not self.update_enabled else "Pause"
+            self.pause_button.setText(new_label)
+            self.console_append(("Monitoring paused" if not self.update_enabled else "Monitoring resumed"))
+            if self.update_enabled:
+                self.save_button.setEnabled(False)
+            else:
+                self.render_override = True # renders all plots on next update regardless of visibility to allow png saving
+                self.save_button.setEnabled(True)
+
+    def toggle_record(self):
+        """Toggle recording to file."""
+        self.recording_active = not self.recording_active
+        new_label = "Save recording" if self.recording_active else f"Record to {self.record_format.upper()}"
+        self.record_button.setText(new_label)
+        self.console_append(("Recording started" if self.recording_active else "Recording stopped"))
+        self.marker_button.setEnabled(self.recording_active)
+        if self.recording_active:
+            self.start_recorder()
+        else:
+            self.stop_recorder()
+
+    def start_recorder(self):
+        """Start writing the raw sample stream to a recording file on a writer thread."""
+        current_datetime = datetime.now()
+        datetime_string = current_datetime.strftime("%Y-%m-%d %H-%M-%S.%f")
+        self.recording_filename = datetime_string + "." + self.record_format
+        self.serial_thread.start_recording("Data/"+self.recording_filename)
+
+    def stop_recorder(self):
+        """Stop the recorder thread once all queued samples have been written."""
+        self.recording_stats = self.serial_thread.stop_recording()
+        if self.recording_stats is None:
+            self.console_append(f"Acquisition process exited, {self.recording_filename} holds the samples written until then")
+            return
+        self.console_append(f"Data saved as {self.recording_filename}")
+        if self.recording_stats["dropped_blocks"]:
+            self.console_append(f"Recorder queue overflowed, {self.recording_stats['dropped_blocks']} blocks dropped")
+
+    def add_marker(self):
+        """Mark the current sample in the recording's index, labelled with the marker text."""
+        if not self.recording_active:
+            return
+        label = self.marker_input.text().strip() or "marker"
+        self.serial_thread.annotate("annotation", label)
+        self.marker_input.clear()
+        self.console_append(f"Marker added: {label}")
+
+    def save_as_png(self):
+        """Save the plot as a PNG file."""
+        current_datetime = datetime.now()
+        datetime_string = current_datetime.strftime("%Y-%m-%d-%H-%M-%S")
+        filename = datetime_string + ".png"
+        if filename:
+            self.canvas.grab().save("Pictures/"+filename)
+            self.console_append(f"Plot saved as {filename}")
+
+    def closeEvent(self, event):
+        """Finish the recording and stop acquisition when the window is closed."""
+        if self.recording_active:
+            self.toggle_record()
+        if hasattr(self, "serial_thread"):
+            self.serial_thread.stop()
+            self.serial_thread.wait(2000)
+        for emulator in self.emulators:
+            emulator.stop()
+        if self.backend == "process":
+            self.buffers.close()
+            self.filtered_buffers.close()
+        super(App, self).closeEvent(event)
+
+    def toggle_profiling(self):
+        """Toggle the profiling instrumentation and panel."""
+        self.profiler.enabled = self.profiling_button.isChecked()
+        if isinstance(getattr(self, "serial_thread", None), AcquisitionProcessThread):
+            self.serial_thread.set_profiling(self.profiler.enabled)
+        self.profiling_label.setVisible(self.profiler.enabled)
+        self.trace_button.setEnabled(self.profiler.enabled)
+        if self.profiler.enabled:
+            self.profiler.reset()
+            self.console_append("Profiling started")
+        else:
+            self.console_append("Profiling stopped")
+
+    def toggle_spectrum(self):
+        """Show or hide the spectrogram and PSD panel; the STFT only runs while it is shown."""
+        if self.spectrum_button.isChecked():
+            self.stft = StreamingSTFT(self.channels, self.sampling_rate)
+            self.spectrum_count = self.buffers.count
+            if self.spectrum_panel is None:
+                self.spectrum_panel = SpectrumPanel(self.stft)
+                self.spectrum_panel.setMinimumWidth(300)
+                self.spectrum_panel.setMaximumWidth(400)
+                self.layout.addWidget(self.spectrum_panel)
+            else:
+                self.spectrum_panel.stft = self.stft
+            self.spectrum_panel.set_channel(self.spectrum_channel_input.value() - 1)
+            self.spectrum_panel.show()
+        else:
+            self.stft = None
+            self.spectrum_panel.hide()
+
+    def select_spectrum_channel(self, channel):
+        """Show the spectra of another channel in the spectrum panel."""
+        if self.spectrum_panel is not None:
+            self.spectrum_panel.set_channel(channel - 1)
+            if self.stft is not None:
+                self.spectrum_panel.refresh()
+
+    def export_trace(self):
+        """Save the profiled stages as a Chrome trace file."""
+        filename = datetime.now().strftime("%Y-%m-%d-%H-%M-%S") + ".trace.json"
+        self.profiler.export_trace("Data/" + filename)
+        if isinstance(getattr(self, "serial_thread", None), AcquisitionProcessThread):
+            filename = filename.replace(".trace.json", ".acquisition.trace.json")
+            self.serial_thread.export_trace("Data/" + filename) # stages timed in the acquisition process
+        self.console_append(f"Trace saved as {filename}")
+
+    def update_profiling_panel(self):
+        """Update the profiling panel with stage timings and stream statistics, twice a second."""
+        now = time.perf_counter()
+        if now - self.last_profile_update < 0.5:
+            return
+        text = self.profiler.summary()
+        stats = self.serial_thread.stats(report=True) if hasattr(self, "serial_thread") else {}
+        if "bytes_received" in stats: # not before an acquisition process has sent its first statistics
+            if "profile" in stats:
+                # Stages timed in the acquisition process, then the GUI's; latency is measured by the GUI
+                acquisition = [line for line in stats["profile"].split("\n") if not line.startswith("latency")]
+                text = "\n".join(acquisition + text.split("\n")[1:])
+            rate = (stats["bytes_received"] - self.last_bytes_received) / (now - self.last_profile_update)
+            self.last_bytes_received = stats["bytes_received"]
+            text += (f"\nSerial: {rate / 1000:.1f} kB/s | Malformed frames: {stats['malformed_frames']}"
+                     f" | Dropped bytes: {stats['dropped_bytes']}"
+                     f"\nSignal queue: {stats['signal_backlog']} (max {stats['max_queue_depth']})"
+                     f" | Coalesced: {stats['signals_coalesced']}"
+                     f"\nGaps: {stats['gaps']} | Suspected lost: {stats['suspected_lost']}"
+                     f" | Late blocks: {stats['late_blocks']} | Measured rate: {stats['rate']:.2f} Hz"
+                     f" ({1e6 * stats['drift']:+.0f} ppm)")
+            if "devices" in stats:
+                text += f"\n{'board':<16}{'S/s':>7}{'kB/s':>6}{'lost':>6}{'ppm':>6}{'lag':>5}{'slips':>6}"
+                for row in stats["devices"]:
+                    text += (f"\n{row['name'][-16:]:<16}{row['samples_per_s']:>7.0f}{row['kB_per_s']:>6.1f}"
+                             f"{row['lost']:>6}{row['relative_ppm']:>+6.0f}{row['lag']:>5}{row['slips']:>6}")
+        self.last_profile_update = now
+        self.profiling_label.setText(text)
+
+    def fps_counter(self):
+        """Calculate and update FPS counter label."""
+        self.calls += 1
+        now = time.time()
+
+        # Update the FPS counter every 50 frames
+        if self.calls >= 50:
+            self.calls = 0
+            dt = (now - self.lastupdate)
+            self.fps = 50 / dt
+            self.lastupdate = now
+        tx = 'Frame Rate: {fps:.0f} FPS'.format(fps=self.fps)
+        self.fps_text = tx
+
+    def update_info_box(self):
+        """Update information box."""
+        current_time = datetime.now().strftime("%H:%M:%S")
+        fps_info = f"{self.fps_text} (target {self.target_fps})"
+        channels_info = f"Channels: {self.channels}" + (f" on {self.boards} boards" if self.boards > 1 else "")
+        sampling_rate_info = f"Sampling Rate: {self.sampling_rate} Hz"
+        info_text = f"{current_time} | {fps_info} | {channels_info} | {sampling_rate_info}"
+        stats = self.serial_thread.stats() if hasattr(self, "serial_thread") else {}
+        if "samples_lost" in stats: # not before an acquisition process has sent its first statistics
+            info_text += (f"\nDropped Frames: {self.dropped_frames} | Signal Backlog: {stats['signal_backlog']}"
+                          f" | Lost Samples: {stats['samples_lost']}")
+            if np.isfinite(stats["heart_rate"]):
+                info_text += f" | Heart Rate: {stats['heart_rate']:.0f} bpm"
+        self.info_label.setText(info_text)
+        if self.profiler.enabled:
+            self.update_profiling_panel()
+
+    def update_battery_level(self):
+        """Update the battery level label."""
+        stats = self.serial_thread.stats()
+        if "battery_level" in stats:
+            self.battery_label.setText(f"Battery Level: {stats['battery_level']}%")
+
+    def filter_design(self, name):
+        """
+        Design a filter stage from its inputs, through the cached filter-design registry.
+
+        Args:
+            name (str): "notch", "lpf" or "hpf".
+
+        Returns:
+            FilterDesign or MainsCanceller: Coefficients and initial conditions of the stage, or a new
+                adaptive mains canceller for the adaptive notch.
+
+        Raises:
+            ValueError: If an input is not a number or the filter cannot be realised at the sampling rate.
+        """
+        fs = float(self.sampling_rate)
+        if name == "notch" and self.notch_type_dropdown.currentText() == "Adaptive":
+            return MainsCanceller(self.channels, fs, float(self.notch_freq_input.text()))
+        if name == "notch":
+            return filter_design.design("notch", float(self.notch_freq_input.text()), fs,
+                                        quality=float(self.notch_qf_input.text()))
+        if name == "lpf":
+            kind, dropdown, order, cutoff = "lowpass", self.lpf_function_dropdown, self.lpf_order_input, self.lpf_freq_input
+        else:
+            kind, dropdown, order, cutoff = "highpass", self.hpf_function_dropdown, self.hpf_order_input, self.hpf_freq_input
+        family = "butter" if dropdown.currentText() == "Butterworth" else "bessel"
+        return filter_design.design(kind, float(cutoff.text()), fs, int(order.text()), family)
+
+    def toggle_filter(self, name, label, button):
+        """
+        Add a filter stage to the serial thread's filter pipeline, or remove it if it is applied.
+
+        Args:
+            name (str): "notch", "lpf" or "hpf".
+            label (str): Name of the filter in console messages.
+            button (QPushButton): Button toggling the filter, unchecked again if the filter is invalid.
+        """
+        if name not in self.serial_thread.filters:
+            try:
+                design = self.filter_design(name)
+            except ValueError as e:
+                self.console_append(f"Invalid {label} filter: {e}")
+                button.setChecked(False)
+                return
+            self.console_append(f"Applying {label} filter")
+            self.serial_thread.filters.set_stage(name, design)
+            self.serial_thread.annotate("filter", f"{name} {design!r}")
+        else:
+            self.console_append(f"{label.capitalize()} filter removed")
+            self.serial_thread.filters.remove_stage(name)
+            self.serial_thread.annotate("filter", f"{name} removed")
+
+    def retune_filter(self, name):
+        """Replace an applied filter stage after its settings are edited; the pipeline crossfades to it."""
+        if not hasattr(self, "serial_thread") or name not in self.serial_thread.filters:
+            return
+        label = {"notch": "notch", "lpf": "low-pass", "hpf": "high-pass"}[name]
+        try:
+            design = self.filter_design(name)
+        except ValueError as e:
+            self.console_append(f"Invalid {label} filter, keeping the previous settings: {e}")
+            return
+        if getattr(self.serial_thread.filters.stages[name], "key", None) == design.key:
+            return  # unchanged settings
+        self.serial_thread.filters.set_stage(name, design)
+        self.serial_thread.annotate("filter", f"{name} {design!r}")
+        self.console_append(f"Updated {label} filter")
+
+    def select_notch_type(self):
+        """Switch the notch between the fixed filter and the adaptive mains canceller, which has no Q-factor."""
+        self.notch_qf_input.setEnabled(self.notch_type_dropdown.currentText() == "Fixed")
+        self.retune_filter("notch")
+
+    def apply_notch_filter(self):
+        """Apply a notch filter to the data, or remove it."""
+        self.toggle_filter("notch", "notch", self.notch_button)
+
+    def apply_low_pass_filter(self):
+        """Apply a low-pass filter to the data, or remove it."""
+        self.toggle_filter("lpf", "low-pass", self.lpf_button)
+
+    def apply_high_pass_filter(self):
+        """Apply a high-pass filter to the data, or remove it."""
+        self.toggle_filter("hpf", "high-pass", self.hpf_button)
+
+
+class AcquisitionThread(QThread):
+    """
+    Base class for the threads notifying the GUI of new samples, without ever queueing up behind it.
+    """
+
+    data_received = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        """
+        Constructor for AcquisitionThread class.
+
+        Args:
+            parent: Parent widget.
+        """
+        super(AcquisitionThread, self).__init__(parent)
+        self.running = True
+        self.max_backlog = 2 # notifications allowed in the GUI event queue before coalescing
+        self.signals_emitted = 0
+        self.signals_handled = 0 # incremented by the GUI thread
+        self.signals_coalesced = 0
+        self.max_queue_depth = 0
+
+    def notify(self, count):
+        """Notify the GUI of new samples unless it is already behind; plots pull from the buffers on their own timer."""
+        depth = self.signals_emitted - self.signals_handled
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        if depth < self.max_backlog:
+            self.signals_emitted += 1
+            self.data_received.emit(count)
+        else:
+            self.signals_coalesced += 1
+
+    def signal_stats(self):
+        """Statistics of the notifications sent to the GUI."""
+        return {"signal_backlog": self.signals_emitted - self.signals_handled, "max_queue_depth": self.max_queue_depth,
+                "signals_coalesced": self.signals_coalesced}
+
+
+class SerialThread(AcquisitionThread):
+    """
+    Thread for reading data from the serial port.
+    """
+
+    def __init__(self, ser, buffers, filtered_buffers, channels, sampling_rate, profiler=None, counter_bytes=0,
+                 interpolate_gaps=True, infer_gaps=False, parent=None):
+        """
+        Constructor for SerialThread class.
+
+        Args:
+            ser (serial.Serial): Serial object for communication with the board, or a DeviceManager
+                serving the merged stream of several boards.
+            buffers (MultiChannelRingBuffer): Ring buffer for raw data storage.
+            filtered_buffers (MultiChannelRingBuffer): Ring buffer for filtered data storage.
+            channels (int): Number of channels.
+            sampling_rate (int): Sampling rate in Hz.
+            profiler (Profiler): Profiler timing each stage of the acquisition loop.
+            counter_bytes (int): Size of the frame counter sent by the firmware, 0 to detect gaps from arrival times.
+            interpolate_gaps (bool): Fill lost samples by linear interpolation in the live buffers, filters and
+                QRS detection. Recordings always keep the gaps.
+            infer_gaps (bool): Without a frame counter, leave the gaps found from arrival times in the sample
+                indices instead of only reporting them.
+            parent: Parent widget.
+        """
+        super(SerialThread, self).__init__(parent)
+        self.engine = AcquisitionEngine(ser, buffers, filtered_buffers, channels, sampling_rate, profiler,
+                                        counter_bytes, interpolate_gaps, infer_gaps)
+        self.filters = self.engine.filters # notch, low-pass and high-pass stages
+
+    @property
+    def visible_channels(self):
+        return self.engine.visible_channels
+
+    @visible_channels.setter
+    def visible_channels(self, channels):
+        self.engine.visible_channels = channels # channels shown by the GUI, None for all
+
+    @property
+    def filtered_channels(self):
+        return self.engine.filtered_channels
+
+    def run(self):
+        """Run method for the thread."""
+        while self.running:
+            count = self.engine.step()
+            if count is not None:
+                self.notify(count)
+                self.engine.timer.lap("emit")
+
+    def start_recording(self, path):
+        """Start recording the raw sample stream to path."""
+        self.engine.start_recording(path)
+
+    def stop_recording(self):
+        """Stop recording and return the recorder's statistics."""
+        return self.engine.stop_recording()
+
+    def annotate(self, kind, label=""):
+        """Add an event to the index of the recording in progress, see AcquisitionEngine.annotate."""
+        self.engine.annotate(kind, label)
+
+    def stats(self, report=False, wait=False):
+        """Acquisition and notification statistics, see AcquisitionEngine.stats. They are always up to date, so
+        wait is ignored."""
+        stats = self.engine.stats(report)
+        stats.update(self.signal_stats())
+        return stats
+
+    def stop(self):
+        """Stop the thread."""
+        self.running = False
+        if self.engine.devices is not None:
+            self.engine.devices.stop()
+
+
+class AcquisitionProcessThread(AcquisitionThread):
+    """
+    Thread relaying the notifications of an AcquisitionProcess to the GUI, and the GUI's
+    filter, recording and profiling changes to the process.
+    """
+
+    process_exited = pyqtSignal(str)
+
+    def __init__(self, spec, buffers, filtered_buffers, profiler, parent=None):
+        """
+        Constructor for AcquisitionProcessThread class.
+
+        Args:
+            spec (dict): Source spec of the acquisition process, see acquisition.open_source.
+            buffers (SharedRingBuffer): Ring buffer for raw data, filled by the process.
+            filtered_buffers (SharedRingBuffer): Ring buffer for filtered data, filled by the process.
+            profiler (Profiler): Profiler of the GUI, which measures sample-to-pixel latency from the
+                arrival times reported by the process.
+            parent: Parent widget.
+        """
+        super(AcquisitionProcessThread, self).__init__(parent)
+        self.profiler = profiler
+        channels = spec["channels"]
+        self.control_memory = shared_memory.SharedMemory(create=True, size=2 * channels)
+        self.control = np.ndarray((2, channels), dtype=np.int8, buffer=self.control_memory.buf)
+        self.control[:] = 1 # visible and filtered channels
+        self.commands, process_commands = multiprocessing.Pipe()
+        self.notifications, process_notifications = multiprocessing.Pipe(duplex=False)
+        self.filters = FilterStages(self.commands.send)
+        self.latest_stats = {}
+        self.process = AcquisitionProcess(spec, buffers.spec(), filtered_buffers.spec(), self.control_memory.name,
+                                          process_commands, process_notifications)
+        self.process.start()
+        # Only the process holds its pipe ends, so reads here see EOF rather than block once it has exited
+        process_commands.close()
+        process_notifications.close()
+        self.exited = False
+
+    @property
+    def visible_channels(self):
+        return np.flatnonzero(self.control[0])
+
+    @visible_channels.setter
+    def visible_channels(self, channels):
+        mask = np.ones(len(self.control[0]), dtype=np.int8)
+        if channels is not None:
+            mask[:] = 0
+            mask[channels] = 1
+        if not np.array_equal(mask, self.control[0]):
+            self.control[0] = mask
+
+    @property
+    def filtered_channels(self):
+        return self.control[1].astype(bool)
+
+    def isOpen(self):
+        return self.process.is_alive()
+
+    def flushInput(self):
+        """Discard what the board sent before monitoring started."""
+        self.commands.send(("flush",))
+
+    def start(self):
+        """Start the acquisition loop in the process and relaying its notifications."""
+        self.commands.send(("run",))
+        super(AcquisitionProcessThread, self).start()
+
+    def run(self):
+        """Run method for the thread."""
+        while self.running:
+            if not self.notifications.poll(0.1):
+                if not self.process.is_alive():
+                    self.report_exit()
+                    return
+                continue
+            try:
+                message = self.notifications.recv()
+            except EOFError:
+                self.report_exit()
+                return
+            if message[0] == "data":
+                _, count, arrival = message
+                self.profiler.block_arrived(count, arrival) # perf_counter is system-wide, so times compare across processes
+                self.notify(count)
+            else:
+                self.latest_stats = message[1]
+
+    def start_recording(self, path):
+        """Start recording the raw sample stream to path in the acquisition process."""
+        self.commands.send(("record", os.path.abspath(path)))
+
+    def stop_recording(self):
+        """Stop recording once everything queued is written, and return the recorder's statistics, or None if
+        the process has exited."""
+        return self.request("stop_recording")
+
+    def annotate(self, kind, label=""):
+        """Add an event to the index of the recording in progress in the acquisition process."""
+        self.commands.send(("annotate", kind, label))
+
+    def set_profiling(self, enabled):
+        """Enable or disable the acquisition process's profiler."""
+        self.commands.send(("profile", enabled))
+
+    def export_trace(self, path):
+        """Save the stages profiled in the acquisition process as a Chrome trace file."""
+        self.commands.send(("export_trace", os.path.abspath(path)))
+
+    def stats(self, report=False, wait=False):
+        """
+        Acquisition and notification statistics, see AcquisitionEngine.stats. By default those the process
+        last sent, which include the per-board report and stage timings, so the GUI never waits on the
+        process; empty apart from the notification statistics until it has sent any.
+
+        Args:
+            report (bool): Include the per-board report and stage timings when waiting for the statistics.
+            wait (bool): Ask the process for up-to-date statistics and wait for them, e.g. to measure
+                throughput over an exact interval.
+        """
+        if wait:
+            self.latest_stats = self.request("stats", report) or self.latest_stats # the last sent if it has exited
+        stats = dict(self.latest_stats)
+        stats.update(self.signal_stats())
+        return stats
+
+    def request(self, *command):
+        """
+        Send a command whose result the process sends back, and wait for the result.
+
+        Args:
+            *command: Command name and arguments.
+
+        Returns:
+            The result, or None if the process has exited, e.g. on a serial port error.
+        """
+        try:
+            self.commands.send(command)
+            while not self.commands.poll(0.1):
+                if not self.process.is_alive():
+                    raise EOFError
+            return self.commands.recv()
+        except (EOFError, OSError):
+            self.report_exit()
+            return None
+
+    def report_exit(self):
+        """Tell the GUI, once, that the acquisition process has exited."""
+        if not self.exited:
+            self.exited = True
+            self.process.join(1)
+            self.process_exited.emit(f"Acquisition process exited (exit code {self.process.exitcode})")
+
+    def stop(self):
+        """Stop the thread and the acquisition process."""
+        self.running = False
+        if self.process.is_alive():
+            self.commands.send(("close",))
+            self.process.join(5)
+        self.control = None
+        self.control_memory.close()
+        resource_tracker.register(self.control_memory._name, "shared_memory") # unregistered by the process, see SharedRingBuffer.close
+        self.control_memory.unlink()
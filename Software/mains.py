@@ -0,0 +1,146 @@
+"""
+Adaptive Mains Canceller
+
+Streaming line-noise canceller, an adaptive alternative to the fixed notch filter. Reference
+sinusoids at the mains frequency and its harmonics are generated from one phase accumulator
+shared by all channels, and each channel learns the amplitude and phase of the hum at every
+harmonic with block LMS: the hum estimated with the current weights is subtracted from a
+block, and the weights are then updated from the block's residual in one matrix product. The
+cost per block is O(channels x samples x harmonics), with no loop over channels or samples.
+
+The mains frequency is tracked from the rotation of the fundamental's weights between blocks,
+which turn at the difference between the reference and the actual mains frequency. Unlike a
+narrow notch, the canceller has no resonance to ring, removes the harmonics, and follows the
+mains frequency as it drifts.
+
+Classes:
+    MainsCanceller: Block LMS canceller of mains hum and its harmonics on all channels.
+"""
+import numpy as np
+
+
+class MainsCanceller:
+    """
+    Block LMS canceller of mains hum and its harmonics, with mains frequency tracking.
+    """
+
+    def __init__(self, channels, sampling_rate, frequency=50.0, harmonics=3, adaptation_time=0.5,
+                 tracking_time=0.5, max_deviation=1.0):
+        """
+        Constructor for MainsCanceller class.
+
+        Args:
+            channels (int): Number of channels.
+            sampling_rate (float): Sampling rate in Hz.
+            frequency (float): Nominal mains frequency in Hz.
+            harmonics (int): Number of harmonics cancelled, including the fundamental; harmonics at or
+                above the Nyquist frequency are left out.
+            adaptation_time (float): Time constant in seconds over which the hum amplitudes are learnt.
+            tracking_time (float): Time constant in seconds of the mains frequency tracking, 0 to disable it.
+            max_deviation (float): Largest deviation in Hz of the tracked frequency from the nominal one.
+
+        Raises:
+            ValueError: If the mains frequency is not below the Nyquist frequency.
+        """
+        if not 0 < frequency < sampling_rate / 2:
+            raise ValueError(f"mains frequency must be between 0 and the Nyquist frequency "
+                             f"{sampling_rate / 2:g} Hz, got {frequency}")
+        self.key = ("mains", float(frequency), harmonics, adaptation_time, tracking_time, max_deviation)
+        self.channels = channels
+        self.sampling_rate = sampling_rate
+        self.nominal = frequency
+        self.frequency = frequency
+        self.harmonics = np.arange(1, harmonics + 1)
+        self.harmonics = self.harmonics[self.harmonics * (frequency + max_deviation) < sampling_rate / 2]
+        self.max_deviation = max_deviation
+        self.step = 2 / (adaptation_time * sampling_rate)  # LMS step; unit sinusoids have power 1/2
+        self.tracking_gain = 0.0 if not tracking_time else 1 / (tracking_time * sampling_rate)
+        self.max_block = max(int(0.5 / self.step), 1)  # longer blocks are split to keep block LMS stable
+        self.phase = 0.0  # phase of the fundamental reference at the next sample
+        self.weights = np.zeros((2 * len(self.harmonics), channels))  # cosine then sine weight of each harmonic
+
+    def __repr__(self):
+        return f"MainsCanceller({self.nominal:g} Hz, {len(self.harmonics)} harmonics)"
+
+    def references(self, n, phase):
+        """
+        Reference sinusoids of every harmonic.
+
+        Args:
+            n (int): Number of samples.
+            phase (float): Phase of the fundamental at the first sample.
+
+        Returns:
+            np.ndarray: Cosines then sines of each harmonic, with shape (n, 2 * harmonics).
+        """
+        theta = (phase + 2 * np.pi * self.frequency / self.sampling_rate * np.arange(n))[:, None] * self.harmonics
+        return np.hstack([np.cos(theta), np.sin(theta)])
+
+    def process(self, block, channels=None):
+        """
+        Cancel the hum in a block of new samples and adapt to it.
+
+        Called once per block of the stream; the references advance by the block length even if only
+        some channels are processed.
+
+        Args:
+            block (np.ndarray): Samples with shape (n_samples, channels), or (n_samples, len(channels)).
+            channels (np.ndarray): Indices of the channels in block. Defaults to all channels.
+
+        Returns:
+            np.ndarray: Samples with the hum removed, with the shape of block.
+        """
+        out, self.phase = self._cancel(np.asarray(block, dtype=np.float64), channels, self.phase, track=True)
+        return out
+
+    def restart(self, channels, history):
+        """
+        Cancel the hum over the recent history of some channels, e.g. channels filtered again after being
+        hidden, continuing from their weights. The history must end with the last processed block.
+
+        Args:
+            channels (np.ndarray): Channel indices.
+            history (np.ndarray): Raw samples with shape (n_samples, len(channels)).
+
+        Returns:
+            np.ndarray: Samples with the hum removed, with the shape of history.
+        """
+        x = np.asarray(history, dtype=np.float64)
+        start = self.phase - 2 * np.pi * self.frequency / self.sampling_rate * len(x)
+        return self._cancel(x, channels, start, track=False)[0]
+
+    def _cancel(self, x, channels, phase, track):
+        """Cancel and adapt over x in sub-blocks of at most max_block samples, starting at phase."""
+        rows = slice(None) if channels is None else channels
+        weights = self.weights[:, rows]
+        out = np.empty_like(x)
+        for start in range(0, len(x), self.max_block):
+            chunk = x[start:start + self.max_block]
+            references = self.references(len(chunk), phase)
+            error = chunk - references @ weights
+            out[start:start + len(chunk)] = error
+            # The baseline, as a straight line through the block, is left out of the update, as it leaks
+            # into the weights over blocks that are not whole mains cycles; the output keeps it
+            ramp = np.arange(len(chunk)) - (len(chunk) - 1) / 2
+            slope = ramp @ error / max(ramp @ ramp, 1)
+            residual = error - error.mean(axis=0) - ramp[:, None] * slope
+            previous = weights[0] - 1j * weights[len(self.harmonics)]
+            weights = weights + self.step * (references.T @ residual)
+            if track and self.tracking_gain and weights.shape[1]:
+                noise = self.step * np.mean(residual ** 2, axis=0)  # scale of the LMS weight noise
+                self._track(previous, weights[0] - 1j * weights[len(self.harmonics)], noise, len(chunk))
+            phase = (phase + 2 * np.pi * self.frequency / self.sampling_rate * len(chunk)) % (2 * np.pi)
+        self.weights[:, rows] = weights
+        return out, phase
+
+    def _track(self, previous, current, noise, n):
+        """Nudge the mains frequency towards the rotation rate of the fundamental's weights over n samples."""
+        # Only channels whose hum stands out of the weight noise are followed, or the frequency would wander
+        # with the noise when there is no hum; the rotation is averaged over them weighted by their hum power
+        humming = np.abs(current) ** 2 > 16 * noise
+        if not humming.any():
+            return
+        rotation = np.angle(np.sum(current[humming] * np.conj(previous[humming])))
+        offset = rotation * self.sampling_rate / (2 * np.pi * n)
+        self.frequency += self.tracking_gain * n * offset
+        self.frequency = min(max(self.frequency, self.nominal - self.max_deviation), self.nominal + self.max_deviation)
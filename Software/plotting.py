@@ -5,16 +5,34 @@ import numpy as np
 import seaborn as sns
 from scipy import signal, stats
 import datetime
-
-def movingaverage(x, n=5):
-    x2 = np.pad(x, (int((n-1)/2), int((n-1)/2)))
-    y = []
-    for i, xi in enumerate(x):
-        yi = np.sum(x2[i:i+n])/n
-        y.append(yi)
-    y2 = np.array(y)
-    print(len(y2))
-    return y2
+from annotations import load_index
+from binary_recording import BinaryRecording
+from windows import moving_mean
+from snr import compute_snr
+from filter_design import design
+from preprocessing import to_microvolts, zero_phase
+
+def load_recording(path):
+    # Prefer the binary copy of a CSV recording, which loads without parsing text
+    binary_path = os.path.splitext(path)[0] + ".bpr"
+    if os.path.exists(binary_path):
+        return BinaryRecording(binary_path).to_dataframe()
+    # Samples are indexed by the Sample column, so the Timestamp strings are not parsed
+    return pd.read_csv(path, usecols=lambda column: column != "Timestamp")
+
+def sample_times(df, fs=250):
+    # Time of every row in seconds from the Sample column, so gaps from lost samples stay in place;
+    # older recordings without one are assumed to be gapless
+    if "Sample" in df.columns:
+        return (df["Sample"].to_numpy() - df["Sample"].iloc[0]) / fs
+    return np.arange(len(df)) / fs
+
+def channel_columns(df):
+    return [c for c in df.columns if c.startswith("Channel_")]
+
+def movingaverage(x, n=5, axis=-1):
+    # Centred, zero-padded moving average; works on (samples,) or (channels, samples) arrays
+    return moving_mean(x, n, axis=axis)
 
 
 def save_plot(y, ylims=(-1500,1500), xlims=(0)):
@@ -37,8 +55,8 @@ def save_plot(y, ylims=(-1500,1500), xlims=(0)):
 def save_subplots(y, ylims=(-1500,1500), xlims=(0)):
     x = np.arange(0, len(y)/250, 1/250)
     y = y - np.mean(y) # offset removal
-    filtered_y0 = signal.filtfilt(*signal.bessel(6, 15, btype="low", fs=250), y)
-    filtered_y = signal.filtfilt(*signal.iirnotch(45, 5, 250), filtered_y0)
+    filtered_y0 = zero_phase(y, design("lowpass", 15, 250, 6, "bessel"))
+    filtered_y = zero_phase(filtered_y0, design("notch", 45, 250, quality=5))
     rectified_y = np.absolute(filtered_y-np.mean(filtered_y))
     smoothed_y = movingaverage(rectified_y, n=100)
 
@@ -61,11 +79,10 @@ def save_subplots(y, ylims=(-1500,1500), xlims=(0)):
     # plt.savefig(path+filename+".png", bbox_inches='tight')
     plt.show()
 
-def save_subplots_spectogram(y, ylims=(-500,-250), xlims=(0)):
+def save_subplots_spectogram(y, ylims=(-500,-250), xlims=(0), title=None):
     x = np.arange(0, len(y)/250, 1/250)
-    y = y - np.mean(y) # offset removal
-    y = y/256 * 3.3 / 1100 * 1000000
-    y = signal.filtfilt(*signal.bessel(6, (0.5, 100), btype="bandpass", fs=250), y)
+    y = to_microvolts(y, remove_offset=True)
+    y = zero_phase(y, design("bandpass", (0.5, 100), 250, 6, "bessel"))
 
     f, t, Sxx = signal.spectrogram(y, fs=250, nperseg=1024, noverlap=1024/16, nfft=2048, scaling="density")
     logged_Sxx = 20*np.log10(Sxx)
@@ -80,31 +97,28 @@ def save_subplots_spectogram(y, ylims=(-500,-250), xlims=(0)):
     axs[1].set_xlabel("Time (s)")
     axs[1].set_ylabel("Frequency (Hz)")
 
-    fig.suptitle("Signal and Spectogram")
+    fig.suptitle(title or "Signal and Spectogram")
     fig.legend()
     fig.tight_layout()
 
-    filename = "signal processing " + str(datetime.datetime.now().strftime("%Y-%m-%d %H-%M-%S"))
+    filename = (title or "signal processing ") + str(datetime.datetime.now().strftime("%Y-%m-%d %H-%M-%S"))
     path = os.getcwd() + "/Software/Plots/"
     plt.savefig(path+filename+".png", bbox_inches='tight')
     # plt.show()
 
 def save_plot_channels(df, title, ylims=(-1000,1000), xlims=(0)):
-    x = np.arange(0, len(df)/250, 1/250)
-    channels = []
-    for i in range(1, len(df.columns)):
-
-        y = (df["Channel_"+str(i)] / 256) * 3.3 / 1100 * 1000000
-        y = y - np.mean(y) # offset removal
-        filtered_y0 = signal.filtfilt(*signal.bessel(6, (0.5, 40), btype="bandpass", fs=250), y)
-        channels.append(filtered_y0)
+    x = sample_times(df)
+    columns = channel_columns(df)
+    # All channels at once, as a (channels, samples) array
+    channels = zero_phase(to_microvolts(df[columns].to_numpy().T, remove_offset=True),
+                          design("bandpass", (0.5, 40), 250, 6, "bessel"))
 
     colors = ["#ff5e5e", "#ff5790", "#e964c1", "#bb7ae8", "#708fff"]
-    fig, axs = plt.subplots(len(df.columns) - 1, 1, sharex=True, sharey=True)
-    if len(df.columns) == 2:
+    fig, axs = plt.subplots(len(columns), 1, sharex=True, sharey=True)
+    if len(columns) == 1:
         axs = [axs]
     for i, y in enumerate(channels):
-        axs[i].plot(x, y , label="Channel "+str(df.columns[i][-1]), linewidth=1, color=colors[i])
+        axs[i].plot(x, y , label="Channel "+columns[i].split("_")[1], linewidth=1, color=colors[i])
         axs[i].set_xlim(xlims)
         axs[i].set_ylim(ylims)
 
@@ -121,13 +135,10 @@ def save_plot_channels(df, title, ylims=(-1000,1000), xlims=(0)):
     # plt.show()
 
 def save_plot_channels2(df, title, ylims=(-1000,1000), xlims=(0), channels=[1,2,3,4,5]):
-    x = np.arange(0, len(df)/250, 1/250)
-    channel_data = []
-    for i in channels:
-        y = (df["Channel_"+str(i)] / 256) * 3.3 / 1100 * 1000000
-        y = y - np.mean(y) # offset removal
-        filtered_y0 = signal.filtfilt(*signal.butter(6, (1.5, 40), btype="bandpass", fs=250), y)
-        channel_data.append(filtered_y0)
+    x = sample_times(df)
+    columns = ["Channel_"+str(i) for i in channels]
+    channel_data = zero_phase(to_microvolts(df[columns].to_numpy().T, remove_offset=True),
+                              design("bandpass", (1.5, 40), 250, 6, "butter"))
 
     colors = ["#ff5e5e", "#ff5790", "#e964c1", "#bb7ae8", "#708fff"]
     fig, axs = plt.subplots(len(channels), 1, sharex=True, sharey=True)
@@ -169,104 +180,54 @@ def gaussian_fit(xdata,ydata):
     sigma = np.sqrt(np.abs(np.sum((xdata-mu)**2*ydata)/np.sum(ydata)))
     return mu, sigma
 
-def SNR(data, analysis_interval, threshold=250):
-    data = data / 256 * 3.3 / 1100 * 1000000
-    # data = data - np.mean(data)
-    filtered_data = signal.filtfilt(*signal.butter(6, (0.5, 40), btype="bandpass", fs=250), data)
-
-    t = np.arange(0, len(data)/250, 1/250)
-    indices = np.where((t >= analysis_interval[0]) & (t <= analysis_interval[1]))
-    y = filtered_data[indices]
-
-    fig, axs = plt.subplots(2, 1)
-
-    peaks = signal.find_peaks(y, height=threshold)[0]
-    noise = y.copy()
-    for peak in peaks:
-        noise[peak - 12 : peak + 12] = 0
-    noise = signal.filtfilt(*signal.butter(6, (10, 100), btype="bandpass", fs=250), noise)
-
-    y = y - noise
-    signal_power = np.mean(y**2)
-    noise_power = np.mean(noise**2)
-
-    
-
-    axs[0].plot(t[indices], y, label="Signal", linewidth=1, color="#708fff")
-    axs[0].plot(t[indices], noise, label="Noise", linewidth=1, color="#ff5e5e")
-    axs[0].scatter(t[indices][peaks], y[peaks], color="red", label="R-peaks", s=10)
-    axs[0].set_ylabel("Amplitude (uV)")
-    axs[0].set_title("Signal and R-peaks")
-    axs[0].legend()
-    axs[1].hist(noise, bins=80, density=True, color="blue", alpha=0.5)
-    axs[1].set_xlabel("Amplitude (uV)")
-    axs[1].set_ylabel("Frequency Density")
-    axs[1].set_title("Noise Distribution")
-    
-    xmin, xmax = axs[1].get_xlim()
-    x = np.linspace(xmin, xmax, 100)
-    noise = noise.clip(min=-50, max=50)
-    mean, std = stats.norm.fit(noise, method="MM")
-    p = stats.norm.pdf(x, mean, std)
-    axs[1].plot(x, p, 'k', linewidth=2, label='Fitted Gaussian')
-    axs[1].set_xlim(-300, 300)
-    axs[0].set_xlim(analysis_interval)
-    fig.tight_layout()
-    filename = "SNR" + str(datetime.datetime.now().strftime("%Y-%m-%d %H-%M-%S"))
-    path = os.getcwd() + "/Software/Plots/"
-    plt.savefig(path+filename+".png", bbox_inches='tight')
-
-    SNR = 10*np.log10(signal_power/noise_power)
-    return SNR
-
-
-def SNR_emg(data, analysis_interval):
-    data = data / 256 * 3.3 / 1100 * 1000000
-    # data = data - np.mean(data)
-    filtered_data = signal.filtfilt(*signal.butter(6, (0.5, 40), btype="bandpass", fs=250), data)
-
-    t = np.arange(0, len(data)/250, 1/250)
-    indices = np.where((t >= analysis_interval[0]) & (t <= analysis_interval[1]))
-    y = filtered_data[indices]
+def plot_snr(result, analysis_interval, bins=80, hist_xlim=(-300, 300), fs=250):
+    # Render the signal, noise and noise histogram of the first channel and window of a compute_snr result
+    if result["indices"][0] is None:
+        # compute_snr keeps no traces for an interval too short to filter or past the end of the recording
+        print(f"No SNR traces to plot for the interval {analysis_interval}")
+        return
+    t = result["indices"][0] / fs
+    y = result["signal"][0][0]
+    noise = result["noise"][0][0]
+    peaks = result["peaks"][0][0]
 
     fig, axs = plt.subplots(2, 1)
-
-    # peaks = signal.find_peaks(y, height=threshold)[0]
-    noise = y.copy()
-    # for peak in peaks:
-    #     noise[peak - 12 : peak + 12] = 0
-    noise = signal.filtfilt(*signal.butter(6, (10, 100), btype="bandpass", fs=250), noise)
-    y = y - noise
-    signal_power = np.mean(y**2)
-    noise_power = np.mean(noise**2)
-
-    axs[0].plot(t[indices], y, label="Signal", linewidth=1, color="#708fff")
-    axs[0].plot(t[indices], noise, label="Noise", linewidth=1, color="#ff5e5e")
-    # axs[0].scatter(t[indices][peaks], y[peaks], color="red", label="R-peaks", s=10)
+    axs[0].plot(t, y, label="Signal", linewidth=1, color="#708fff")
+    axs[0].plot(t, noise, label="Noise", linewidth=1, color="#ff5e5e")
+    if len(peaks):
+        axs[0].scatter(t[peaks], y[peaks], color="red", label="R-peaks", s=10)
     axs[0].set_ylabel("Amplitude (uV)")
     axs[0].set_title("Signal and R-peaks")
     axs[0].legend()
-    axs[1].hist(noise, bins=50, density=True, color="blue", alpha=0.5)
+    axs[1].hist(noise, bins=bins, density=True, color="blue", alpha=0.5)
     axs[1].set_xlabel("Amplitude (uV)")
     axs[1].set_ylabel("Frequency Density")
     axs[1].set_title("Noise Distribution")
 
-    mean, std = stats.norm.fit(noise)
     xmin, xmax = axs[1].get_xlim()
-    axs[1].set_xlim(-500, 500)
     x = np.linspace(xmin, xmax, 100)
-    p = stats.norm.pdf(x, mean, std)
+    p = stats.norm.pdf(x, result["noise_mean"][0, 0], result["noise_std"][0, 0])
     axs[1].plot(x, p, 'k', linewidth=2, label='Fitted Gaussian')
-
+    axs[1].set_xlim(hist_xlim)
     axs[0].set_xlim(analysis_interval)
     fig.tight_layout()
     filename = "SNR" + str(datetime.datetime.now().strftime("%Y-%m-%d %H-%M-%S"))
     path = os.getcwd() + "/Software/Plots/"
     plt.savefig(path+filename+".png", bbox_inches='tight')
 
-    SNR = 10*np.log10(signal_power/noise_power)
-    return SNR
+def SNR(data, analysis_interval, threshold=250, plot=True):
+    result = compute_snr(data, [analysis_interval], threshold=threshold, traces=plot)
+    if plot:
+        plot_snr(result, analysis_interval)
+    return result["snr"][0, 0]
+
 
+def SNR_emg(data, analysis_interval, plot=True):
+    # No R peaks to blank in EMG, and the noise statistics are fitted without clipping
+    result = compute_snr(data, [analysis_interval], mask_peaks=False, noise_clip=None, traces=plot)
+    if plot:
+        plot_snr(result, analysis_interval, bins=50, hist_xlim=(-500, 500))
+    return result["snr"][0, 0]
 
 if __name__ == "__main__":
     sns.set_theme()
@@ -280,12 +241,16 @@ if __name__ == "__main__":
     files = os.listdir(path)
 
     filename = "ecg precordial 2.csv"
-    df = pd.read_csv(path+filename)
+    df = load_recording(path+filename)
     # save_plot_channels2(df, title="Two-Channel EMG (Wrist Flexion) - Eutectogel", xlims=(15, 20), ylims=(-1000, 1000), channels=[2,4])
     # save_plot_channels2(df, title="Ag-AgCl Benchmark", xlims=(0, 5), ylims=(-250, 500), channels=[1])
     # save_subplots_spectogram(df["Channel_1"], xlims=(2, 60), ylims=(-250, 500))
 
-    snr = SNR(df["Channel_4"], (0, 10), threshold=400)
+    # First 10 s of channel 4 without gaps, saturation or artefacts, from the recording's index,
+    # or the first 10 s if there are none
+    clean = load_index(path+filename).clean_segments(10, channels=[3])
+    interval = tuple(clean[0]) if len(clean) else (0, 10)
+    snr = SNR(df["Channel_4"], interval, threshold=400)
     # snr = SNR_emg(df["Channel_4"], (0, 10))
     # snr = SNR_emg(df["Channel_2"], (15, 20))
 
@@ -0,0 +1,185 @@
+"""
+Analysis Preprocessing
+
+Conversion of recordings to microvolts and zero-phase filtering of all channels at once, for
+the offline analysis scripts. Filters are applied with sosfiltfilt along the sample axis of a
+(channels, samples) array, so every channel is filtered in one call with numerically stable
+second-order sections.
+
+Recordings too long to hold in memory are filtered in chunks. Each chunk is filtered together
+with a margin of samples either side, long enough for the filter's response to the chunk edges
+to decay, and only the middle is kept. The result matches filtering the whole recording in one
+go, to within the settling tolerance, with memory bounded by the chunk size.
+
+Functions:
+    to_microvolts: Scale ADC counts to microvolts, optionally removing each channel's offset.
+    zero_phase: Zero-phase filter all channels in one call.
+    settling_samples: Samples until a filter's impulse response has decayed.
+    filter_chunks: Zero-phase filter a long recording chunk by chunk.
+    filter_recording: Zero-phase filter a long recording into an output array.
+
+Usage:
+    python Software/preprocessing.py "Data/recording.bpr" --band 0.5 40 --output "Data/recording filtered.npy"
+"""
+import argparse
+from functools import lru_cache
+import numpy as np
+from binary_recording import BinaryRecording, UV_PER_COUNT
+from filter_design import design
+
+
+def to_microvolts(counts, remove_offset=False, axis=-1):
+    """
+    Scale ADC counts to microvolts.
+
+    Args:
+        counts (array-like): ADC counts, e.g. with shape (channels, samples).
+        remove_offset (bool): Subtract the mean of each channel.
+        axis (int): Sample axis, used for the offset.
+
+    Returns:
+        np.ndarray: Samples in microvolts as float64.
+    """
+    uv = np.asarray(counts, dtype=np.float64) * UV_PER_COUNT
+    if remove_offset:
+        uv -= uv.mean(axis=axis, keepdims=True)
+    return uv
+
+
+def zero_phase(data, sos, axis=-1):
+    """
+    Filter forwards and backwards, without phase delay, along the sample axis of every channel at once.
+
+    Args:
+        data (array-like): Samples, e.g. with shape (channels, samples).
+        sos (np.ndarray or FilterDesign): Second-order sections, or a design from filter_design.design.
+        axis (int): Sample axis.
+
+    Returns:
+        np.ndarray: Filtered samples with the shape of data.
+    """
+    import scipy.signal as signal
+    return signal.sosfiltfilt(getattr(sos, "sos", sos), data, axis=axis)
+
+
+def settling_samples(sos, tolerance=1e-9):
+    """
+    Number of samples after which the impulse response of a filter stays below a tolerance.
+
+    Args:
+        sos (np.ndarray or FilterDesign): Second-order sections, or a design from filter_design.design.
+        tolerance (float): Tolerance relative to the peak of the impulse response.
+
+    Returns:
+        int: Settling time in samples.
+    """
+    sos = np.asarray(getattr(sos, "sos", sos), dtype=np.float64)
+    return _settling_samples(sos.tobytes(), len(sos), tolerance)
+
+
+@lru_cache(maxsize=64)
+def _settling_samples(coefficients, sections, tolerance):
+    """Settling time of the sections packed in coefficients; cached by settling_samples."""
+    import scipy.signal as signal
+    sos = np.frombuffer(coefficients).reshape(sections, 6).copy()
+    length = 1024
+    while True:
+        impulse = np.zeros(length)
+        impulse[0] = 1
+        response = np.abs(signal.sosfilt(sos, impulse))
+        above = np.flatnonzero(response > tolerance * response.max())
+        settled = int(above[-1]) + 1 if len(above) else 1
+        if settled < length // 2 or length >= 1 << 24:
+            return settled
+        length *= 2
+
+
+def filter_chunks(source, sos, chunk_samples=250 * 600, margin=None, microvolts=True):
+    """
+    Zero-phase filter a long recording chunk by chunk.
+
+    Each chunk is read with `margin` extra samples either side, filtered, and trimmed back, so
+    the chunks join up as if the recording had been filtered in one go. Only one chunk and its
+    margins are in memory at a time.
+
+    Args:
+        source (array-like or BinaryRecording): Samples with shape (samples, channels), e.g. an np.memmap,
+            or a binary recording, read by sample index so samples lost in transmission are skipped.
+        sos (np.ndarray or FilterDesign): Second-order sections, or a design from filter_design.design.
+        chunk_samples (int): Samples per chunk.
+        margin (int): Samples read either side of each chunk. Defaults to the settling time of the filter.
+        microvolts (bool): Scale ADC counts to microvolts before filtering.
+
+    Yields:
+        np.ndarray: Filtered samples with shape (n_samples, channels), in order.
+    """
+    import scipy.signal as signal
+    sos = getattr(sos, "sos", sos)
+    margin = settling_samples(sos) if margin is None else margin
+    # sosfiltfilt's default padding, shortened for windows shorter than it
+    padlen = 3 * (2 * len(sos) + 1 - min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum()))
+    if isinstance(source, BinaryRecording):
+        end = int((source.block_index + source.block_counts).max(initial=0))
+        start = int(source.block_index.min(initial=0))
+    else:
+        start, end = 0, len(source)
+
+    for first in range(start, end, chunk_samples):
+        last = min(first + chunk_samples, end)
+        lower, upper = max(first - margin, start), min(last + margin, end)
+        if isinstance(source, BinaryRecording):
+            window = source.read(lower, upper, microvolts=microvolts)
+            indices = source.indices(lower, upper)
+            keep = (indices >= first) & (indices < last)
+        else:
+            window = np.asarray(source[lower:upper], dtype=np.float64)
+            window = window * UV_PER_COUNT if microvolts else window
+            keep = slice(first - lower, last - lower)
+        if len(window) == 0:
+            continue
+        yield signal.sosfiltfilt(sos, window, axis=0, padlen=min(padlen, len(window) - 1))[keep]
+
+
+def filter_recording(source, sos, out=None, chunk_samples=250 * 600, microvolts=True):
+    """
+    Zero-phase filter a long recording into an output array, chunk by chunk.
+
+    Args:
+        source (array-like or BinaryRecording): Samples with shape (samples, channels), see filter_chunks.
+        sos (np.ndarray or FilterDesign): Second-order sections, or a design from filter_design.design.
+        out (np.ndarray): Output with shape (samples, channels), e.g. an np.memmap to keep the result on disk.
+            Allocated in memory if not given.
+        chunk_samples (int): Samples per chunk.
+        microvolts (bool): Scale ADC counts to microvolts before filtering.
+
+    Returns:
+        np.ndarray: The filtered samples.
+    """
+    if out is None:
+        n_samples = source.n_samples if isinstance(source, BinaryRecording) else len(source)
+        channels = source.channels if isinstance(source, BinaryRecording) else np.shape(source)[1]
+        out = np.empty((n_samples, channels))
+    position = 0
+    for chunk in filter_chunks(source, sos, chunk_samples, microvolts=microvolts):
+        out[position:position + len(chunk)] = chunk
+        position += len(chunk)
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Zero-phase band-pass filter a binary recording to a .npy file.")
+    parser.add_argument("recording", help=".bpr recording")
+    parser.add_argument("--band", nargs=2, type=float, default=(0.5, 40.0), help="pass band in Hz")
+    parser.add_argument("--order", type=int, default=6)
+    parser.add_argument("--family", default="bessel", choices=("bessel", "butter"))
+    parser.add_argument("--chunk", type=float, default=600.0, help="chunk length in seconds")
+    parser.add_argument("--output", required=True, help=".npy file for the filtered microvolts")
+    args = parser.parse_args()
+
+    recording = BinaryRecording(args.recording)
+    sos = design("bandpass", tuple(args.band), recording.sampling_rate, args.order, args.family)
+    out = np.lib.format.open_memmap(args.output, mode="w+", dtype=np.float32,
+                                    shape=(recording.n_samples, recording.channels))
+    filter_recording(recording, sos, out, int(args.chunk * recording.sampling_rate))
+    out.flush()
+    print(f"Filtered {recording.n_samples} samples of {recording.channels} channels to {args.output}")
@@ -0,0 +1,175 @@
+"""
+Live Profiling
+
+Instrumentation for the acquisition and rendering paths. Stage durations are accumulated in
+log-spaced histograms, block arrival times are matched to rendered sample counts to measure
+sample-to-pixel latency, and every timed stage can be kept as a trace event for export to the
+Chrome trace format (chrome://tracing, Perfetto). When disabled, each instrumentation point
+costs one attribute check.
+
+Classes:
+    Profiler: Stage histograms, latency and trace events shared by the serial and GUI threads.
+    StageHistogram: Log-binned histogram of durations with count, mean and percentiles.
+    StageTimer: Per-thread lap timer recording consecutive stages into a Profiler.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+
+# Bin edges from 1 us to 10 s, ten per decade
+EDGES = np.logspace(-6, 1, 71).tolist()
+
+
+class StageHistogram:
+    """
+    Log-binned histogram of durations in seconds.
+    """
+
+    def __init__(self):
+        """Constructor for StageHistogram class."""
+        self.counts = [0] * (len(EDGES) + 1)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration):
+        """Add one duration in seconds."""
+        self.counts[bisect.bisect(EDGES, duration)] += 1
+        self.n += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    def mean(self):
+        return self.total / self.n if self.n else 0.0
+
+    def percentile(self, q):
+        """Upper edge of the bin containing the q-th percentile (0-100)."""
+        if not self.n:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self.counts), q / 100 * self.n))
+        return min(EDGES[min(index, len(EDGES) - 1)], self.max)
+
+
+class Profiler:
+    """
+    Stage timing histograms, sample-to-pixel latency and trace events.
+    """
+
+    def __init__(self, enabled=False, trace_capacity=200000):
+        """
+        Constructor for Profiler class.
+
+        Args:
+            enabled (bool): Start recording immediately.
+            trace_capacity (int): Maximum number of trace events kept; older events are discarded.
+        """
+        self.enabled = enabled
+        self.stages = {}
+        self.trace = deque(maxlen=trace_capacity)
+        self.arrivals = deque(maxlen=4096)  # (sample count after the block, arrival time) from the serial thread
+        self.latency = StageHistogram()
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+
+    def reset(self):
+        """Clear all histograms and trace events."""
+        with self.lock:
+            self.stages = {}
+            self.trace.clear()
+            self.arrivals.clear()
+            self.latency = StageHistogram()
+            self.origin = time.perf_counter()
+
+    def timer(self):
+        """Create a lap timer for one thread."""
+        return StageTimer(self)
+
+    def record(self, stage, start, end):
+        """Record a stage that ran from start to end (time.perf_counter() seconds)."""
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = StageHistogram()
+            histogram.add(end - start)
+        self.trace.append((stage, start, end, threading.get_ident()))
+
+    def block_arrived(self, count, arrival):
+        """Note the arrival time of a block that brought the sample count to count."""
+        if self.enabled:
+            self.arrivals.append((count, arrival))
+
+    def rendered(self, count):
+        """Record the latency from arrival to display of the newest sample in a frame showing count samples."""
+        if not self.enabled:
+            return
+        arrival = None
+        while self.arrivals and self.arrivals[0][0] <= count:
+            arrival = self.arrivals.popleft()[1]
+        if arrival is not None:
+            now = time.perf_counter()
+            with self.lock:
+                self.latency.add(now - arrival)
+            self.trace.append(("latency", arrival, now, threading.get_ident()))
+
+    def summary(self):
+        """
+        Summarise the histograms as text for the profiling panel.
+
+        Returns:
+            str: One line per stage with count, mean, median, 95th percentile and maximum in ms.
+        """
+        with self.lock:
+            rows = list(self.stages.items()) + [("latency", self.latency)]
+        lines = [f"{'stage':<9}{'n':>7}{'mean':>7}{'p50':>7}{'p95':>7}{'max':>7}"]
+        for name, h in rows:
+            lines.append(f"{name:<9}{h.n:>7}{1e3 * h.mean():>7.2f}{1e3 * h.percentile(50):>7.2f}"
+                         f"{1e3 * h.percentile(95):>7.2f}{1e3 * h.max:>7.2f}")
+        return "\n".join(lines)
+
+    def export_trace(self, path):
+        """
+        Write the recorded stages as a Chrome trace event file.
+
+        Args:
+            path (str): Output JSON path.
+        """
+        events = [{"name": stage, "ph": "X", "pid": os.getpid(), "tid": tid,
+                   "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6}
+                  for stage, start, end, tid in list(self.trace)]
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+class StageTimer:
+    """
+    Lap timer attributing the time since the previous lap to a named stage.
+    """
+
+    def __init__(self, profiler):
+        """
+        Constructor for StageTimer class.
+
+        Args:
+            profiler (Profiler): Profiler receiving the stage durations.
+        """
+        self.profiler = profiler
+        self.last = 0.0
+
+    def start(self):
+        """Start timing the first stage."""
+        self.last = time.perf_counter() if self.profiler.enabled else 0.0
+
+    def lap(self, stage):
+        """End the current stage, attributing its duration to stage, and start the next one."""
+        if not self.profiler.enabled:
+            self.last = 0.0  # so that re-enabling does not attribute the disabled period to a stage
+            return
+        now = time.perf_counter()
+        if self.last:
+            self.profiler.record(stage, self.last, now)
+        self.last = now
@@ -0,0 +1,188 @@
+"""
+Streaming QRS Detection
+
+Incremental Pan-Tompkins QRS detector. Sample blocks from the serial thread are band-pass
+filtered, differentiated, squared and integrated over a 150 ms window, with the state of each
+stage carried between blocks so the per-block cost is proportional to the block size. Peaks
+of the integrated signal, taken as the largest value within half an integration window either
+side so the ripples on one hump are not classified separately, are classified with the adaptive
+signal/noise thresholds, 200 ms refractory period, T-wave discrimination and RR-interval
+search-back of the original algorithm. Each QRS is placed at the largest band-passed sample in
+its integration window, corrected for the band-pass group delay, and the maximum band-passed
+slope there is what the T-wave check compares.
+
+Classes:
+    StreamingQRSDetector: Pan-Tompkins detector running on all channels block by block.
+"""
+from collections import deque
+import numpy as np
+from filters import FilterPipeline
+from filter_design import design
+
+
+class StreamingQRSDetector:
+    """
+    Block-wise Pan-Tompkins QRS detector with per-channel adaptive thresholds.
+    """
+
+    def __init__(self, channels, sampling_rate=250, learning_time=2.0):
+        """
+        Constructor for StreamingQRSDetector class.
+
+        Args:
+            channels (int): Number of channels.
+            sampling_rate (int): Sampling rate in Hz.
+            learning_time (float): Initial period in seconds used to initialise the thresholds.
+        """
+        import scipy.signal as signal
+
+        self.channels = channels
+        self.sampling_rate = sampling_rate
+        self.window = int(0.150 * sampling_rate)  # moving window integration length
+        self.half_window = self.window // 2  # peaks must be the maximum this far either side
+        self.qrs_half_width = int(0.040 * sampling_rate)  # samples either side of the R wave searched for its slope
+        self.refractory = int(0.200 * sampling_rate)
+        self.t_wave_window = int(0.360 * sampling_rate)
+        self.learning = int(learning_time * sampling_rate)
+        self.stale_intervals = 3  # RR intervals without a QRS after which the heart rate is unknown
+
+        # Per-stage state carried between blocks
+        bandpass = design("bandpass", (5, 15), sampling_rate, 2)
+        self.bandpass = FilterPipeline(channels)
+        self.bandpass.set_stage("bandpass", bandpass)
+        _, delay = signal.group_delay(signal.sos2tf(bandpass.sos), [np.sqrt(5 * 15)], fs=sampling_rate)
+        self.delay = int(round(delay[0]))  # lag of the band-passed R wave behind the raw one
+        self.history = np.zeros((4, channels))  # last band-passed samples for the derivative
+        self.squared_history = np.zeros((self.window - 1, channels))  # last squared samples for the integrator
+        self.filtered = np.zeros((2 * self.window, channels))  # last band-passed samples for locating the R wave
+        self.mwi_tail = np.zeros((2 * self.half_window, channels))  # last integrated samples for peak detection
+        self.count = 0  # samples processed
+
+        # Adaptive thresholds
+        self.learning_max = np.zeros(channels)
+        self.learning_sum = np.zeros(channels)
+        self.spki = np.zeros(channels)
+        self.npki = np.zeros(channels)
+        self.threshold = np.zeros(channels)
+        self.last_qrs = np.full(channels, -self.sampling_rate * 10)
+        self.last_slope = np.zeros(channels)  # maximum slope of the last QRS, for T-wave discrimination
+        self.recent_rr = [deque(maxlen=8) for _ in range(channels)]
+        self.noise_peaks = [[] for _ in range(channels)]  # noise peaks since the last QRS, for search-back
+
+        # Outputs
+        self.heart_rate = np.full(channels, np.nan)  # from the last RR interval in bpm, NaN while unknown
+        self.r_peaks = [[] for _ in range(channels)]  # R-peak sample indices found in the last block
+
+    def process(self, block):
+        """
+        Run the detector on a block of new samples.
+
+        Args:
+            block (np.ndarray): Samples with shape (n_samples, channels).
+
+        Returns:
+            list: For each channel, the sample indices of R peaks detected in this block.
+        """
+        self.r_peaks = [[] for _ in range(self.channels)]
+        n = len(block)
+        if n == 0:
+            return self.r_peaks
+
+        # Band-pass, five-point derivative, squaring and moving window integration
+        x = np.vstack([self.history, self.bandpass.process(block)])
+        derivative = (2 * x[4:] + x[3:-1] - x[1:-3] - 2 * x[:-4]) * self.sampling_rate / 8
+        squared = np.vstack([self.squared_history, derivative**2])
+        cumsum = np.vstack([np.zeros((1, self.channels)), np.cumsum(squared, axis=0)])
+        mwi = (cumsum[self.window:] - cumsum[:-self.window]) / self.window
+        filtered = np.vstack([self.filtered, x[4:]])
+        self.history = x[-4:]
+        self.squared_history = squared[-(self.window - 1):]
+        self.filtered = filtered[-2 * self.window:]
+
+        # Maxima of the integrated signal over half a window either side, including those straddling
+        # the previous block; a peak is only classified once the half window after it has arrived
+        h = self.half_window
+        extended = np.vstack([self.mwi_tail, mwi])
+        centre = extended[h:-h]
+        around = np.lib.stride_tricks.sliding_window_view(extended, 2 * h + 1, axis=0).max(axis=-1)
+        is_peak = (centre >= around) & (centre > extended[h - 1:-h - 1])
+        start = self.count - h  # sample index of extended[h]
+        self.mwi_tail = extended[-2 * h:]
+
+        # Initialise the thresholds from the learning period
+        if self.count < self.learning:
+            learning = mwi[:self.learning - self.count]
+            self.learning_max = np.maximum(self.learning_max, learning.max(axis=0))
+            self.learning_sum += learning.sum(axis=0)
+            if self.count + n >= self.learning:
+                self.spki = self.learning_max / 3
+                self.npki = self.learning_sum / self.learning / 2
+                self.threshold = self.npki + 0.25 * (self.spki - self.npki)
+        self.count += n
+
+        for i, ch in zip(*np.nonzero(is_peak)):
+            index = start + i
+            if index < self.learning:
+                continue
+
+            # The R wave is the largest band-passed sample in the integration window of the peak
+            row = len(filtered) - self.count + index  # row of sample index in filtered
+            r_row = row - self.window + 1 + int(np.argmax(np.abs(filtered[row - self.window + 1:row + 1, ch])))
+            around_r = filtered[r_row - self.qrs_half_width:r_row + self.qrs_half_width + 1, ch]
+            slope = np.abs(np.diff(around_r)).max() * self.sampling_rate
+            r_index = index - (row - r_row) - self.delay
+            self.classify_peak(ch, index, r_index, extended[i + h, ch], slope)
+        self.expire_heart_rate()
+        return self.r_peaks
+
+    def expire_heart_rate(self):
+        """Forget the heart rate of channels without a QRS for stale_intervals RR intervals, e.g. after a lead
+        came off or the signal went flat. Only the rate is forgotten, so detections do not depend on when
+        this runs."""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stale = self.count - self.last_qrs > self.stale_intervals * 60 * self.sampling_rate / self.heart_rate
+        self.heart_rate[stale] = np.nan
+
+    def classify_peak(self, ch, index, r_index, peak, slope):
+        """
+        Classify a peak of the integrated signal as QRS or noise and update the thresholds.
+
+        Args:
+            ch (int): Channel of the peak.
+            index (int): Sample index of the peak of the integrated signal.
+            r_index (int): Sample index of the R wave it belongs to.
+            peak (float): Height of the peak.
+            slope (float): Maximum absolute band-passed slope around the R wave.
+        """
+        since_qrs = index - self.last_qrs[ch]
+        if since_qrs < self.refractory:
+            return
+        is_t_wave = since_qrs < self.t_wave_window and slope < 0.5 * self.last_slope[ch]
+        if peak > self.threshold[ch] and not is_t_wave:
+            self.spki[ch] = 0.125 * peak + 0.875 * self.spki[ch]
+            self.detect(ch, index, r_index, slope)
+        else:
+            self.npki[ch] = 0.125 * peak + 0.875 * self.npki[ch]
+            self.noise_peaks[ch].append((index, r_index, peak, slope))
+
+            # Search back for a missed beat when no QRS has been found for 1.66 RR intervals
+            rr = self.recent_rr[ch]
+            if rr and index - self.last_qrs[ch] > 1.66 * np.mean(rr):
+                missed_index, missed_r_index, missed_peak, missed_slope = max(self.noise_peaks[ch], key=lambda p: p[2])
+                if missed_peak > 0.5 * self.threshold[ch]:
+                    self.spki[ch] = 0.25 * missed_peak + 0.75 * self.spki[ch]
+                    self.detect(ch, missed_index, missed_r_index, missed_slope)
+        self.threshold[ch] = self.npki[ch] + 0.25 * (self.spki[ch] - self.npki[ch])
+
+    def detect(self, ch, index, r_index, slope):
+        """Record a QRS complex and update the RR interval and heart rate."""
+        if self.last_qrs[ch] >= 0:
+            rr = index - self.last_qrs[ch]
+            # The interval across a stretch without beats, after which the rate expired, is not a heart rate
+            if not self.recent_rr[ch] or rr <= self.stale_intervals * self.recent_rr[ch][-1]:
+                self.heart_rate[ch] = 60 * self.sampling_rate / rr
+            self.recent_rr[ch].append(rr)
+        self.last_qrs[ch] = index
+        self.last_slope[ch] = slope
+        self.noise_peaks[ch] = []
+        self.r_peaks[ch].append(r_index)
@@ -0,0 +1,219 @@
+"""
+Incremental Recorder
+
+Writes sample blocks to disk from a dedicated writer thread while monitoring. Blocks are
+handed over from the serial thread through a bounded queue and appended to the file in
+chunks, so memory use stays flat and at most `flush_interval` seconds of data are lost if
+the application crashes. Blocks carry the sample index of every sample, so samples lost before
+they reached the recorder leave gaps in the recording rather than shifting everything after
+them, and every sample is stamped with its own time to the microsecond.
+
+The writer thread also builds the recording's annotation index (see annotations.py) as the
+samples are written, along with any events such as filter changes, markers or the R peaks found by
+the live QRS detector, and saves it next to the recording at regular intervals and when recording
+stops.
+
+Classes:
+    Recorder: Writer thread appending sample blocks to a CSV or binary (.bpr) recording.
+    CsvWriter: Appends sample blocks to a CSV file.
+"""
+import csv
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from annotations import IndexBuilder, index_path
+from binary_recording import BinaryRecordingWriter
+
+
+class CsvWriter:
+    """
+    Writer for CSV recordings with Timestamp and Sample columns followed by one column per channel.
+    """
+
+    def __init__(self, path, channels, sampling_rate=250):
+        """
+        Constructor for CsvWriter class.
+
+        Args:
+            path (str): Output file path.
+            channels (int): Number of channels.
+            sampling_rate (float): Sampling rate in Hz, used to time-stamp the samples of each block.
+        """
+        self.sampling_rate = sampling_rate
+        self.next_index = 0
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(["Timestamp", "Sample"] + [f"Channel_{i+1}" for i in range(channels)])
+
+    def write(self, block, timestamp, start_index=None):
+        """
+        Write a block of samples as rows stamped with their sample index and time.
+
+        Args:
+            block (np.ndarray): Samples with shape (n_samples, channels).
+            timestamp (datetime): Time of the first sample; later samples follow at the sampling interval.
+            start_index (int): Sample index of the first sample. Defaults to following on from the previous block.
+        """
+        start_index = self.next_index if start_index is None else start_index
+        offsets = np.round(np.arange(len(block)) * 1e6 / self.sampling_rate).astype("timedelta64[us]")
+        times = np.datetime_as_string(np.datetime64(timestamp, "us") + offsets, unit="us")
+        times = [t.replace("T", " ") for t in times.tolist()]
+        self.writer.writerows([t, start_index + i] + row for i, (t, row) in enumerate(zip(times, block.tolist())))
+        self.next_index = start_index + len(block)
+
+    def flush(self):
+        """Flush written rows to disk."""
+        self.file.flush()
+
+    def close(self):
+        """Close the file."""
+        self.file.close()
+
+
+class Recorder(threading.Thread):
+    """
+    Writer thread that appends queued sample blocks to a recording.
+    """
+
+    def __init__(self, path, channels, sampling_rate=250, max_blocks=1024, chunk_samples=2500, flush_interval=1.0,
+                 profiler=None, index=True, index_interval=60.0, detect_beats=False):
+        """
+        Constructor for Recorder class.
+
+        Args:
+            path (str): Output file path. A .bpr extension selects the binary format, otherwise CSV.
+            channels (int): Number of channels.
+            sampling_rate (int): Sampling rate in Hz, stored in binary recordings.
+            max_blocks (int): Maximum number of blocks waiting in the queue.
+            chunk_samples (int): Number of samples gathered before each write.
+            flush_interval (float): Maximum time in seconds between flushes to disk.
+            profiler (Profiler): Optional profiler timing each write to disk as the "write" stage.
+            index (bool): Build the recording's annotation index while writing it.
+            index_interval (float): Time in seconds between saves of the index.
+            detect_beats (bool): Detect R peaks for the index on the writer thread. Off by default, as it
+                imports scipy.signal and the acquisition engine adds the beats its own detector finds.
+        """
+        super(Recorder, self).__init__(daemon=True)
+        self.path = path
+        self.channels = channels
+        self.sampling_rate = sampling_rate
+        self.chunk_samples = chunk_samples
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_blocks)
+        self.samples_written = 0
+        self.dropped_blocks = 0
+        self.first_index = None  # stream sample index of the first recorded sample, which is sample 0 in the file
+        self.index = index
+        self.index_interval = index_interval
+        self.detect_beats = detect_beats
+        self.annotations = queue.SimpleQueue()  # (stream sample index, kind, label, channel) of events
+        self.pushed_index = None  # stream sample index after the last queued block
+        self._stop_event = threading.Event()
+        self.timer = profiler.timer() if profiler is not None else None
+
+    def push(self, block, indices=None, timestamp=None):
+        """
+        Queue a block for writing without blocking the caller.
+
+        Args:
+            block (np.ndarray): Samples with shape (n_samples, channels).
+            indices (np.ndarray): Stream sample index of every sample. Defaults to following on from the previous block.
+            timestamp (float): POSIX time of the first sample. Defaults to now.
+        """
+        if self.first_index is None and indices is not None:
+            self.first_index = int(indices[0])
+        try:
+            self.queue.put_nowait((time.time() if timestamp is None else timestamp, block, indices))
+        except queue.Full:
+            self.dropped_blocks += 1
+        self.pushed_index = int(indices[-1]) + 1 if indices is not None else (self.pushed_index or 0) + len(block)
+
+    def annotate(self, kind, label="", channel=-1, sample=None):
+        """
+        Add an event to the recording's index.
+
+        Args:
+            kind (str): Event kind, e.g. "filter", "annotation" or "beat".
+            label (str): Description of the event.
+            channel (int): Channel index, or -1 for all channels.
+            sample (int): Stream sample index of the event. Defaults to the sample after the last queued block.
+        """
+        self.annotations.put((self.pushed_index if sample is None else sample, kind, label, channel))
+
+    def stop(self):
+        """Write all queued blocks, close the file and wait for the thread to finish."""
+        self._stop_event.set()
+        self.join()
+
+    def run(self):
+        """Run method for the thread."""
+        pending = []
+        pending_samples = 0
+        last_flush = last_index_save = time.monotonic()
+        writer = self.open_writer()
+        builder = IndexBuilder(self.channels, self.sampling_rate, detect_beats=self.detect_beats) if self.index else None
+        while not (self._stop_event.is_set() and self.queue.empty()):
+            try:
+                item = self.queue.get(timeout=0.1)
+                pending.append(item)
+                pending_samples += len(item[1])
+            except queue.Empty:
+                pass
+            if pending_samples >= self.chunk_samples or time.monotonic() - last_flush >= self.flush_interval:
+                if self.timer is not None:
+                    self.timer.start()
+                self.write_blocks(writer, pending, builder)
+                writer.flush()
+                if builder is not None and time.monotonic() - last_index_save >= self.index_interval:
+                    builder.save(index_path(self.path), os.path.getsize(self.path))
+                    last_index_save = time.monotonic()
+                if self.timer is not None:
+                    self.timer.lap("write")
+                pending = []
+                pending_samples = 0
+                last_flush = time.monotonic()
+        self.write_blocks(writer, pending, builder)
+        writer.close()
+        if builder is not None:
+            builder.finish()
+            builder.save(index_path(self.path), os.path.getsize(self.path))
+
+    def open_writer(self):
+        """Open the output file in the format given by its extension."""
+        if os.path.splitext(self.path)[1] == ".bpr":
+            return BinaryRecordingWriter(self.path, self.channels, self.sampling_rate)
+        return CsvWriter(self.path, self.channels, self.sampling_rate)
+
+    def write_blocks(self, writer, items, builder=None):
+        """Write queued (timestamp, block, indices) items, starting a new run of samples at every gap, and
+        add them and the queued events to the index builder if there is one."""
+        runs = []  # (sample index in the file, samples) of every run written
+        for timestamp, block, indices in items:
+            if indices is None:
+                runs.append((writer.next_index, block))
+                writer.write(block, datetime.fromtimestamp(timestamp))
+            else:
+                bounds = [0, *(np.flatnonzero(np.diff(indices) != 1) + 1), len(block)]
+                for start, stop in zip(bounds[:-1], bounds[1:]):
+                    run_time = timestamp + (indices[start] - indices[0]) / self.sampling_rate
+                    runs.append((int(indices[start]) - self.first_index, block[start:stop]))
+                    writer.write(block[start:stop], datetime.fromtimestamp(run_time), runs[-1][0])
+            self.samples_written += len(block)
+        if builder is None:
+            return
+
+        # Consecutive runs are indexed together, as the index's per-call cost is much larger than per sample
+        first = 0
+        while first < len(runs):
+            last = first + 1
+            while last < len(runs) and runs[last][0] == runs[last - 1][0] + len(runs[last - 1][1]):
+                last += 1
+            builder.add(np.concatenate([samples for _, samples in runs[first:last]]), runs[first][0])
+            first = last
+        while not self.annotations.empty():
+            sample, kind, label, channel = self.annotations.get()
+            sample = max((sample or 0) - (self.first_index or 0), 0)
+            builder.add_event(kind, sample, channel=channel, label=label)
@@ -0,0 +1,114 @@
+"""
+Streaming Spectral Analysis
+
+Short-time Fourier transform computed incrementally as samples arrive, for the live
+spectrogram and PSD panel. Samples left over from the previous block are kept as an overlap
+buffer, so each update only transforms the frames completed by the new samples, for all
+channels in one batched rfft. The power spectra of the latest frames are kept in a mirrored
+ring buffer, which gives each channel's spectrogram, and the Welch PSD is the mean of the
+most recent frames.
+
+Classes:
+    StreamingSTFT: Incremental STFT of all channels with a spectrogram history.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from buffers import MultiChannelRingBuffer
+
+
+class StreamingSTFT:
+    """
+    Incremental short-time Fourier transform of all channels, keeping the power spectra of the latest frames.
+    """
+
+    def __init__(self, channels, sampling_rate, nperseg=None, hop=None, history=30.0):
+        """
+        Constructor for StreamingSTFT class.
+
+        Args:
+            channels (int): Number of channels.
+            sampling_rate (float): Sampling rate in Hz.
+            nperseg (int): Samples per frame. Defaults to the power of two covering one second.
+            hop (int): Samples between the starts of consecutive frames. Defaults to nperseg // 8.
+            history (float): Seconds of spectrogram kept.
+        """
+        self.channels = channels
+        self.sampling_rate = sampling_rate
+        self.nperseg = nperseg or 2 ** int(np.ceil(np.log2(sampling_rate)))
+        self.hop = hop or max(self.nperseg // 8, 1)
+        self.window = np.hanning(self.nperseg + 1)[:-1]  # periodic Hann window, as scipy.signal.welch's default
+        self.frequencies = np.fft.rfftfreq(self.nperseg, 1 / sampling_rate)
+
+        # Power spectral density scaling of a one-sided spectrum, as in scipy.signal.spectrogram
+        self.scale = np.full(len(self.frequencies), 2 / (sampling_rate * (self.window ** 2).sum()))
+        self.scale[0] /= 2
+        if self.nperseg % 2 == 0:
+            self.scale[-1] /= 2
+
+        # Spectra of the latest frames, one row per channel and frequency
+        columns = max(int(round(history * sampling_rate / self.hop)), 1)
+        self.spectra = MultiChannelRingBuffer(channels * len(self.frequencies), columns, np.float32)
+        self.pending = np.zeros((0, channels))  # samples not yet in a complete frame, and the overlap
+
+    @property
+    def frame_interval(self):
+        """Seconds between consecutive frames."""
+        return self.hop / self.sampling_rate
+
+    def reset(self):
+        """Forget all samples and spectra, e.g. after a gap in the stream."""
+        self.spectra.count = 0
+        self.pending = np.zeros((0, self.channels))
+
+    def update(self, block):
+        """
+        Transform the frames completed by a block of new samples.
+
+        Args:
+            block (np.ndarray): New samples with shape (n_samples, channels).
+
+        Returns:
+            int: Number of new frames.
+        """
+        x = np.concatenate([self.pending, np.asarray(block, dtype=np.float64)])
+        frames = (len(x) - self.nperseg) // self.hop + 1 if len(x) >= self.nperseg else 0
+        if frames:
+            segments = sliding_window_view(x, self.nperseg, axis=0)[::self.hop][:frames]  # (frames, channels, nperseg)
+            segments = segments - segments.mean(axis=-1, keepdims=True)  # constant detrend, removes the ADC offset
+            spectrum = np.fft.rfft(segments * self.window, axis=-1)
+            power = (spectrum.real ** 2 + spectrum.imag ** 2) * self.scale
+            self.spectra.write(power.reshape(frames, -1))
+        self.pending = x[frames * self.hop:]
+        return frames
+
+    def spectrogram(self, channel, frames=None):
+        """
+        Power spectra of one channel over time.
+
+        Args:
+            channel (int): Channel index.
+            frames (int): Number of most recent frames. Defaults to all frames kept.
+
+        Returns:
+            np.ndarray: Read-only view with shape (frequencies, frames), oldest frame first, in units^2/Hz.
+        """
+        n = len(self.frequencies)
+        return self.spectra.view(frames)[channel * n:(channel + 1) * n]
+
+    def psd(self, frames=None, channels=None):
+        """
+        Welch power spectral density, the mean of the most recent frame spectra.
+
+        Args:
+            frames (int): Number of most recent frames averaged. Defaults to all frames kept.
+            channels (np.ndarray): Channel indices. Defaults to all channels.
+
+        Returns:
+            np.ndarray: PSD with shape (channels, frequencies) in units^2/Hz, zeros before the first frame.
+        """
+        spectra = self.spectra.view(frames).reshape(self.channels, len(self.frequencies), -1)
+        if channels is not None:
+            spectra = spectra[channels]
+        if spectra.shape[-1] == 0:
+            return np.zeros(spectra.shape[:2])
+        return spectra.mean(axis=-1)
@@ -0,0 +1,94 @@
+"""
+Spectrum Panel
+
+Live spectral view of one channel: a scrolling spectrogram above its Welch power spectral
+density, both drawn from a StreamingSTFT. The spectrogram is an ImageItem redrawn from the
+STFT's ring buffer of frame spectra, so a redraw costs one image upload however long the
+acquisition has been running.
+
+Classes:
+    SpectrumPanel: Widget drawing the spectrogram and PSD of the selected channel.
+"""
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtGui import QFont
+
+
+class SpectrumPanel(pg.GraphicsLayoutWidget):
+    """
+    Scrolling spectrogram and Welch PSD of one channel.
+    """
+
+    def __init__(self, stft, welch_time=4.0, dynamic_range=60.0, parent=None):
+        """
+        Constructor for SpectrumPanel class.
+
+        Args:
+            stft (StreamingSTFT): Source of the frame spectra.
+            welch_time (float): Seconds of frames averaged into the PSD.
+            dynamic_range (float): dB below the loudest bin shown in the spectrogram colour scale.
+            parent: Parent widget.
+        """
+        super(SpectrumPanel, self).__init__(parent)
+        self.stft = stft
+        self.channel = 0
+        self.welch_frames = max(int(round(welch_time / stft.frame_interval)), 1)
+        self.dynamic_range = dynamic_range
+        self.drawn_frames = -1  # frame count at the last redraw
+        nyquist = stft.sampling_rate / 2
+
+        font = QFont()
+        font.setPixelSize(10)
+
+        # Spectrogram, time along x and frequency along y
+        self.spectrogram_plot = self.addPlot(row=0, col=0)
+        self.spectrogram_plot.setLabel("left", "Frequency (Hz)")
+        self.spectrogram_plot.setLabel("bottom", "Time (s)")
+        self.spectrogram_plot.setMouseEnabled(x=False, y=False)
+        self.spectrogram_plot.setMenuEnabled(False)
+        self.spectrogram_plot.hideButtons()
+        self.image = pg.ImageItem(axisOrder="row-major")
+        self.image.setColorMap(pg.colormap.get("viridis"))
+        self.spectrogram_plot.addItem(self.image)
+        history = self.stft.spectra.capacity * stft.frame_interval
+        self.spectrogram_plot.setXRange(-history, 0, padding=0)
+        self.spectrogram_plot.setYRange(0, nyquist, padding=0)
+
+        # Welch PSD in dB
+        self.psd_plot = self.addPlot(row=1, col=0)
+        self.psd_plot.setLabel("left", "PSD (dB uV²/Hz)")
+        self.psd_plot.setLabel("bottom", "Frequency (Hz)")
+        self.psd_plot.setMenuEnabled(False)
+        self.psd_plot.setXRange(0, nyquist, padding=0)
+        self.psd_plot.showGrid(x=True, y=True, alpha=0.3)
+        self.psd_curve = self.psd_plot.plot(pen=pg.mkColor("#729ece"))
+
+        for plot in (self.spectrogram_plot, self.psd_plot):
+            plot.getAxis("bottom").setStyle(tickFont=font)
+            plot.getAxis("left").setStyle(tickFont=font)
+
+    def set_channel(self, channel):
+        """Show the spectra of another channel (zero-based)."""
+        self.channel = channel
+        self.drawn_frames = -1
+
+    def refresh(self):
+        """Redraw from the latest frames, if there are new ones since the last redraw."""
+        frames = self.stft.spectra.count
+        if frames == self.drawn_frames:
+            return
+        self.drawn_frames = frames
+        spectrogram = self.stft.spectrogram(self.channel)
+        if spectrogram.shape[1] == 0:
+            self.image.clear()
+            self.psd_curve.setData([], [])
+            return
+
+        db = 10 * np.log10(spectrogram + 1e-12)
+        top = float(db.max())
+        self.image.setImage(db, levels=(top - self.dynamic_range, top), autoLevels=False)
+        duration = spectrogram.shape[1] * self.stft.frame_interval
+        self.image.setRect(-duration, 0, duration, self.stft.sampling_rate / 2)
+
+        psd = self.stft.psd(self.welch_frames, [self.channel])[0]
+        self.psd_curve.setData(self.stft.frequencies, 10 * np.log10(psd + 1e-12))
@@ -0,0 +1,91 @@
+"""
+Stacked Trace Plot
+
+High-density rendering of many channels in a single plot. Channels are drawn as vertically
+offset traces, concatenated into a few curve items with `connect` arrays that break the line
+between channels, and each trace is min/max decimated to the plot width in pixels. Drawing
+cost therefore depends on the plot width rather than the channel count or window length.
+
+Classes:
+    StackedTracePlot: Plot widget drawing all channels as offset traces.
+"""
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtGui import QFont
+from windows import minmax_decimate
+
+
+class StackedTracePlot(pg.PlotWidget):
+    """
+    Plot widget drawing all channels as vertically offset traces in one PlotItem.
+    """
+
+    def __init__(self, channels, x_range, spacing=256, color_groups=8, use_opengl=False, parent=None):
+        """
+        Constructor for StackedTracePlot class.
+
+        Args:
+            channels (int): Number of channels.
+            x_range (tuple): Visible time range in seconds.
+            spacing (float): Vertical offset between neighbouring channels.
+            color_groups (int): Number of curve items, each drawing a contiguous group of channels in one colour.
+            use_opengl (bool): Draw through pyqtgraph's OpenGL viewport.
+            parent: Parent widget.
+        """
+        super(StackedTracePlot, self).__init__(parent)
+        self.channels = channels
+        self.spacing = spacing
+        self.offsets = (channels - 1 - np.arange(channels))[:, None] * spacing  # channel 1 at the top
+        if use_opengl:
+            self.useOpenGL(True)
+
+        # Style the plot
+        font = QFont()
+        font.setPixelSize(10)
+        self.getAxis("bottom").setStyle(tickFont=font)
+        self.getAxis("left").setStyle(tickFont=font)
+        self.setMouseEnabled(x=False, y=False)
+        self.setMenuEnabled(False)
+        self.hideButtons()
+        self.setXRange(*x_range, padding=0)
+        self.setYRange(0, channels * spacing, padding=0)
+
+        # Label every channel, or every few channels when they are too dense to read
+        step = max(1, channels // 16)
+        ticks = [(self.offsets[i, 0] + spacing / 2, f"Ch {i+1}") for i in range(channels)]
+        self.getAxis("left").setTicks([ticks[::step], ticks])
+
+        # One curve item per group of channels, coloured along the same gradient as the per-channel plots
+        cmap = pg.ColorMap([0, 1], [pg.mkColor('#729ece'), pg.mkColor('#ff9e4a')])
+        bounds = np.linspace(0, channels, min(color_groups, channels) + 1).astype(int)
+        self.groups = []
+        for k, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:])):
+            curve = pg.PlotCurveItem(pen=cmap.map(k / max(1, len(bounds) - 2)), skipFiniteCheck=True)
+            self.addItem(curve)
+            self.groups.append((curve, slice(start, stop)))
+        self.connect_arrays = {}  # connect array per (group size, trace length)
+
+    def set_data(self, t, data):
+        """
+        Redraw all traces.
+
+        Args:
+            t (np.ndarray): Time of each sample in seconds.
+            data (np.ndarray): Samples with shape (channels, n_samples).
+        """
+        width = max(int(self.getViewBox().width()), 100)
+        indices, decimated = minmax_decimate(data, width, axis=-1)
+        x = t[indices]
+        y = decimated + self.offsets
+        for curve, channels in self.groups:
+            n = channels.stop - channels.start
+            curve.setData(np.tile(x, n), y[channels].ravel(), connect=self.connect_array(n, len(x)))
+
+    def connect_array(self, traces, length):
+        """Connect array joining consecutive samples within each trace but not across traces."""
+        key = (traces, length)
+        if key not in self.connect_arrays:
+            connect = np.ones(traces * length, dtype=bool)
+            connect[length - 1::length] = False
+            self.connect_arrays[key] = connect
+        return self.connect_arrays[key]
@@ -0,0 +1,119 @@
+"""
+Sliding-Window Primitives
+
+Vectorised moving mean, RMS, maximum and minimum over 1-D signals or 2-D channel arrays.
+All functions return the same length as the input and use the same centred, zero-padded
+window as the original plotting.movingaverage.
+
+Functions:
+    moving_mean: Moving average summed over strided window views.
+    moving_rms: Moving root-mean-square summed over strided window views.
+    moving_max: Moving maximum over strided window views.
+    moving_min: Moving minimum over strided window views.
+    minmax_decimate: Peak-preserving decimation to a fixed number of min/max bins.
+"""
+import numpy as np
+
+
+def _pad(x, n, axis):
+    """Zero-pad along axis so that window i covers samples i - (n-1)//2 to i + n//2."""
+    left = (n - 1) // 2
+    widths = [(0, 0)] * x.ndim
+    widths[axis] = (left, n - 1 - left)
+    return np.pad(x, widths)
+
+
+def moving_mean(x, n=5, axis=-1):
+    """
+    Centred moving average of n samples.
+
+    Each window is summed on its own rather than from a running cumulative sum, so a NaN only
+    affects the windows that contain it and rounding errors do not build up along long signals.
+
+    Args:
+        x (np.ndarray): Signal, e.g. (samples,) or (channels, samples).
+        n (int): Window length in samples.
+        axis (int): Time axis.
+
+    Returns:
+        np.ndarray: Moving average with the same shape as x.
+    """
+    windows = np.lib.stride_tricks.sliding_window_view(_pad(np.asarray(x, dtype=np.float64), n, axis), n, axis=axis)
+    return windows.sum(axis=-1) / n
+
+
+def moving_rms(x, n=5, axis=-1):
+    """
+    Centred moving root-mean-square of n samples.
+
+    Args:
+        x (np.ndarray): Signal, e.g. (samples,) or (channels, samples).
+        n (int): Window length in samples.
+        axis (int): Time axis.
+
+    Returns:
+        np.ndarray: Moving RMS with the same shape as x.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    return np.sqrt(moving_mean(x**2, n, axis))
+
+
+def moving_max(x, n=5, axis=-1):
+    """
+    Centred moving maximum of n samples.
+
+    Args:
+        x (np.ndarray): Signal, e.g. (samples,) or (channels, samples).
+        n (int): Window length in samples.
+        axis (int): Time axis.
+
+    Returns:
+        np.ndarray: Moving maximum with the same shape as x.
+    """
+    windows = np.lib.stride_tricks.sliding_window_view(_pad(np.asarray(x), n, axis), n, axis=axis)
+    return windows.max(axis=-1)
+
+
+def moving_min(x, n=5, axis=-1):
+    """
+    Centred moving minimum of n samples.
+
+    Args:
+        x (np.ndarray): Signal, e.g. (samples,) or (channels, samples).
+        n (int): Window length in samples.
+        axis (int): Time axis.
+
+    Returns:
+        np.ndarray: Moving minimum with the same shape as x.
+    """
+    windows = np.lib.stride_tricks.sliding_window_view(_pad(np.asarray(x), n, axis), n, axis=axis)
+    return windows.min(axis=-1)
+
+
+def minmax_decimate(x, bins, axis=-1):
+    """
+    Peak-preserving decimation keeping the minimum and maximum of each bin.
+
+    Bin k covers samples k*n//bins to (k+1)*n//bins, so bins differ in length by at most one
+    sample. Signals that already fit in 2*bins samples are returned unchanged.
+
+    Args:
+        x (np.ndarray): Signal, e.g. (samples,) or (channels, samples).
+        bins (int): Number of bins, typically the plot width in pixels.
+        axis (int): Time axis.
+
+    Returns:
+        tuple: Sample index of each output point and the decimated signal, with 2*bins points
+            along axis ordered (min, max) per bin.
+    """
+    x = np.asarray(x)
+    n = x.shape[axis]
+    if n <= 2 * bins:
+        return np.arange(n), x
+    starts = np.arange(bins) * n // bins
+    lower = np.minimum.reduceat(x, starts, axis=axis)
+    upper = np.maximum.reduceat(x, starts, axis=axis)
+    decimated = np.stack([lower, upper], axis=axis % x.ndim + 1)
+    shape = list(x.shape)
+    shape[axis] = 2 * bins
+    return np.repeat(starts, 2), decimated.reshape(shape)
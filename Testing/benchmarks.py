@@ -0,0 +1,389 @@
+"""
+Throughput benchmarks for the acquisition, filtering and analysis hot paths.
+
+Replays the bundled recordings through each stage without a board attached and reports the
+samples per second it sustains and its peak memory. With --history, each run is appended to a
+JSON Lines file kept outside the repository, and results more than --tolerance slower than the
+median of the recent history of the same benchmark are flagged as regressions. --filter selects
+a group by the start of its name, optionally followed by part of a benchmark name, and only the
+selected groups have their cases built.
+
+Usage:
+    python Testing/benchmarks.py
+    python Testing/benchmarks.py --filter filtering --repeats 5
+    python Testing/benchmarks.py --filter analysis/qrs
+    python Testing/benchmarks.py --history ~/.cache/biosignal/benchmark_history.jsonl
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Software"))
+
+import matplotlib
+matplotlib.use("Agg")
+import plotting
+from acquisition import AcquisitionEngine
+from annotations import IndexBuilder, RecordingIndex
+from binary_recording import BinaryRecordingWriter
+from buffers import MultiChannelRingBuffer
+from emulator import LoopbackSerial
+from filter_design import design
+from framing import FrameParser
+from mains import MainsCanceller
+from preprocessing import filter_recording, to_microvolts, zero_phase
+from qrs import StreamingQRSDetector
+from recorder import CsvWriter
+from spectral import StreamingSTFT
+
+
+def load_stream(filename="ecg unfiltered.csv", repeats=20):
+    """Encode a recording as the "\\r\\n" + one byte per channel stream sent by the client board."""
+    data = np.loadtxt(os.path.join(ROOT, "Data", filename), delimiter=",", skiprows=1,
+                      usecols=range(1, 6)).astype(np.uint8)
+    data = np.tile(data, (repeats, 1))
+    frames = np.empty((len(data), 2 + data.shape[1]), dtype=np.uint8)
+    frames[:, 0] = ord("\r")
+    frames[:, 1] = ord("\n")
+    frames[:, 2:] = data
+    return frames.tobytes(), data
+
+
+def load_recordings():
+    """Channel arrays with shape (channels, samples) of every recording in Data/."""
+    recordings = {}
+    for path in sorted(glob.glob(os.path.join(ROOT, "Data", "*.csv"))):
+        df = plotting.load_recording(path)
+        recordings[os.path.basename(path)] = df[[c for c in df.columns if c.startswith("Channel_")]].to_numpy().T
+    return recordings
+
+
+def timed(func, *args):
+    """Run func once and return its result and elapsed time in seconds."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def parse_readline(stream):
+    """Legacy per-sample readline() parsing used by the serial thread before bulk framing."""
+    source = io.BytesIO(stream)
+    samples = []
+    line = source.readline()
+    while line:
+        samples.append(np.frombuffer(line.strip(), dtype=np.uint8))
+        line = source.readline()
+    return samples
+
+
+def parse_bulk(stream, chunk_size=4096, channels=5):
+    """Bulk parsing of chunks as returned by serial.read(in_waiting)."""
+    parser = FrameParser(channels)
+    blocks = [parser.feed(stream[i:i + chunk_size]) for i in range(0, len(stream), chunk_size)]
+    return np.concatenate(blocks)
+
+
+def blocks_of(data, size):
+    """Split (n_samples, channels) data into blocks as delivered by the serial thread."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+# ------------------------------------------------------------------------------------------
+#                                        Benchmarks
+# ------------------------------------------------------------------------------------------
+# Each returns a list of (name, samples, function) cases; samples is the number of samples
+# (multi-channel frames) processed by one call of the function.
+
+def bench_parsing():
+    stream, data = load_stream()
+
+    def receive_data():
+        port = LoopbackSerial(max_buffer=len(stream))
+        engine = AcquisitionEngine(port, None, None, 5, 250)
+        for i in range(0, len(stream), 4096):
+            port.write(stream[i:i + 4096])
+            engine.receive_data()
+
+    return [("parse/readline", len(data), lambda: parse_readline(stream)),
+            ("parse/bulk", len(data), lambda: parse_bulk(stream)),
+            ("parse/receive_data", len(data), receive_data)]
+
+
+def bench_ring_buffer():
+    cases = []
+    for channels in (5, 64, 256):
+        data = np.tile(load_stream(repeats=4)[1], (1, -(-channels // 5)))[:, :channels]
+        blocks = blocks_of(data, 10)
+
+        def push_read(blocks=blocks, channels=channels):
+            buffer = MultiChannelRingBuffer(channels, 1500)
+            for block in blocks:
+                buffer.write(block)
+                buffer.view()
+
+        cases.append((f"ring_buffer/{channels}ch", len(data), push_read))
+    return cases
+
+
+def bench_filtering():
+    fs = 250.0
+    stages = {
+        "notch": design("notch", 50.0, fs, quality=10.0),
+        "lpf": design("lowpass", 40.0, fs, 2, "bessel"),
+        "hpf": design("highpass", 0.05, fs, 2, "bessel"),
+    }
+    combinations = {"none": [], "notch": ["notch"], "notch+lpf+hpf": ["notch", "lpf", "hpf"]}
+    cases = []
+    for channels in (5, 64, 256):
+        data = np.tile(load_stream(repeats=4)[1], (1, -(-channels // 5)))[:, :channels]
+        blocks = blocks_of(data, 10)
+        for combination, names in combinations.items():
+
+            def digital_filtering(blocks=blocks, channels=channels, names=names):
+                engine = AcquisitionEngine(LoopbackSerial(), MultiChannelRingBuffer(channels, 1500),
+                                           MultiChannelRingBuffer(channels, 1500, np.float32), channels, 250)
+                for name in names:
+                    engine.filters.set_stage(name, stages[name])
+                for block in blocks:
+                    engine.buffers.write(block)
+                    engine.digital_filtering(block)
+
+            cases.append((f"filtering/{channels}ch/{combination}", len(data), digital_filtering))
+
+        def retuning(blocks=blocks, channels=channels):
+            # Low-pass cutoff changed every second while streaming, crossfading between the banks
+            engine = AcquisitionEngine(LoopbackSerial(), MultiChannelRingBuffer(channels, 1500),
+                                       MultiChannelRingBuffer(channels, 1500, np.float32), channels, 250)
+            engine.filters.set_stage("notch", stages["notch"])
+            for i, block in enumerate(blocks):
+                if i % 25 == 0:
+                    engine.filters.set_stage("lpf", design("lowpass", 35.0 + 5 * (i // 25 % 2), fs, 2, "bessel"))
+                engine.buffers.write(block)
+                engine.digital_filtering(block)
+
+        cases.append((f"filtering/{channels}ch/retune", len(data), retuning))
+
+        def mains_cancelling(blocks=blocks, channels=channels):
+            engine = AcquisitionEngine(LoopbackSerial(), MultiChannelRingBuffer(channels, 1500),
+                                       MultiChannelRingBuffer(channels, 1500, np.float32), channels, 250)
+            engine.filters.set_stage("notch", MainsCanceller(channels, 250, 50.0))
+            for block in blocks:
+                engine.buffers.write(block)
+                engine.digital_filtering(block)
+
+        cases.append((f"filtering/{channels}ch/mains", len(data), mains_cancelling))
+    return cases
+
+
+def bench_spectral():
+    cases = []
+    for channels in (5, 64, 256):
+        data = np.tile(load_stream(repeats=4)[1], (1, -(-channels // 5)))[:, :channels]
+        blocks = blocks_of(data, 10)
+
+        def streaming_stft(blocks=blocks, channels=channels):
+            stft = StreamingSTFT(channels, 250)
+            for block in blocks:
+                stft.update(block)
+            stft.psd(31)
+
+        cases.append((f"spectral/{channels}ch", len(data), streaming_stft))
+    return cases
+
+
+def bench_recording():
+    data = load_stream(repeats=4)[1]
+    blocks = blocks_of(data, 10)
+    directory = tempfile.mkdtemp()
+
+    def record(writer_class, extension):
+        def run():
+            path = os.path.join(directory, "recording" + extension)
+            if writer_class is CsvWriter:
+                writer = CsvWriter(path, data.shape[1])
+            else:
+                writer = BinaryRecordingWriter(path, data.shape[1], 250)
+            now = datetime.now()
+            for block in blocks:
+                writer.write(block, now)
+            writer.close()
+        return run
+
+    return [("recording/csv", len(data), record(CsvWriter, ".csv")),
+            ("recording/bpr", len(data), record(BinaryRecordingWriter, ".bpr"))]
+
+
+def bench_analysis():
+    recordings = load_recordings()
+    total = sum(data.shape[1] for data in recordings.values())
+
+    def movingaverage():
+        for data in recordings.values():
+            plotting.movingaverage(data, n=37)
+
+    def pan_tompkins():
+        for data in recordings.values():
+            for channel in data:
+                plotting.pan_tompkins(channel, 250)
+
+    def snr():
+        for data in recordings.values():
+            for channel in data:
+                plotting.SNR(channel, (0, channel.shape[0] / 250), plot=False)
+
+    def bandpass():
+        for data in recordings.values():
+            zero_phase(to_microvolts(data), design("bandpass", (0.5, 40), 250, 6, "bessel"))
+
+    def bandpass_chunked():
+        # One-minute chunks, so memory is bounded by the chunk rather than the recording
+        for data in recordings.values():
+            filter_recording(data.T, design("bandpass", (0.5, 40), 250, 6, "bessel"), chunk_samples=250 * 60)
+
+    def streaming_qrs():
+        for data in recordings.values():
+            detector = StreamingQRSDetector(data.shape[0])
+            for block in blocks_of(data.T, 25):
+                detector.process(block)
+
+    return [("analysis/movingaverage", total, movingaverage),
+            ("analysis/pan_tompkins", total, pan_tompkins),
+            ("analysis/snr", total, snr),
+            ("analysis/bandpass", total, bandpass),
+            ("analysis/bandpass_chunked", total, bandpass_chunked),
+            ("analysis/streaming_qrs", total, streaming_qrs)]
+
+
+def bench_index():
+    recordings = load_recordings()
+    total = sum(data.shape[1] for data in recordings.values())
+    directory = tempfile.mkdtemp()
+
+    def build():
+        # With beat detection, as build_index does, in the recorder's 2500-sample chunks
+        for i, data in enumerate(recordings.values()):
+            builder = IndexBuilder(data.shape[0], 250, detect_beats=True)
+            for block in blocks_of(data.T, 2500):
+                builder.add(block)
+            builder.finish()
+            builder.save(os.path.join(directory, f"{i}.idx.npz"))
+
+    build()
+    indexes = [RecordingIndex(os.path.join(directory, f"{i}.idx.npz")) for i in range(len(recordings))]
+
+    def query():
+        # Beats, clean windows and an overview of every recording
+        for index in indexes:
+            for channel in range(index.channels):
+                index.beats(channel, 0, 10)
+                index.clean_segments(10, channels=[channel])
+            index.summary(bins=500)
+
+    return [("index/build", total, build),
+            ("index/query", total, query)]
+
+
+BENCHMARKS = {"parse": bench_parsing, "ring_buffer": bench_ring_buffer, "filtering": bench_filtering,
+              "spectral": bench_spectral, "recording": bench_recording, "analysis": bench_analysis,
+              "index": bench_index}
+
+
+# ------------------------------------------------------------------------------------------
+#                                     Running and history
+# ------------------------------------------------------------------------------------------
+
+def measure(func, repeats):
+    """Best-of-repeats time in seconds, and peak traced memory in MiB from a separate run."""
+    best = min(timed(func)[1] for _ in range(repeats))
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak / 2**20
+
+
+def load_history(path):
+    """Previous runs from the history file, oldest first."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def baseline(history, name, window=5):
+    """Median throughput of a benchmark over its most recent runs, or None if it has not run before."""
+    values = [run["results"][name]["samples_per_s"] for run in history if name in run["results"]][-window:]
+    return float(np.median(values)) if values else None
+
+
+def commit_hash():
+    """Short hash of the checked-out commit, if the repository is available."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the acquisition, filtering and analysis hot paths.")
+    parser.add_argument("--filter", default="",
+                        help="only run the groups starting with this text, or group/text for the benchmarks of a group "
+                             "whose name contains the text")
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per benchmark; the best is kept")
+    parser.add_argument("--history", help="JSON Lines file of previous results to compare against and record this "
+                                          "run in; keep it outside the repository")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="flag results this fraction slower than the recent median as regressions")
+    args = parser.parse_args(argv)
+
+    group_filter, _, name_filter = args.filter.partition("/")
+    groups = [group for group in BENCHMARKS if group.startswith(group_filter)]
+    if not groups:
+        parser.error(f"no benchmark group matches {group_filter!r}; groups: {', '.join(BENCHMARKS)}")
+
+    history = load_history(args.history) if args.history else []
+    results = {}
+    regressions = []
+    print(f"{'benchmark':34} {'samples/s':>14} {'peak MiB':>9}  vs history")
+    for group in groups:
+        # Cases are only built for the selected groups, as building them loads and encodes recordings
+        for name, samples, func in BENCHMARKS[group]():
+            if name_filter not in name.partition("/")[2]:
+                continue
+            best, peak = measure(func, args.repeats)
+            rate = samples / best
+            results[name] = {"samples_per_s": rate, "peak_mib": peak}
+            previous = baseline(history, name)
+            change = ""
+            if previous:
+                change = f"{rate / previous - 1:+.0%}"
+                if rate < (1 - args.tolerance) * previous:
+                    change += " REGRESSION"
+                    regressions.append(name)
+            print(f"{name:34} {rate:14,.0f} {peak:9.1f}  {change}")
+
+    if args.history and results:
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+        run = {"time": datetime.now().isoformat(timespec="seconds"), "commit": commit_hash(),
+               "python": platform.python_version(), "numpy": np.__version__, "results": results}
+        with open(args.history, "a") as file:
+            file.write(json.dumps(run) + "\n")
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""
+Shared pytest setup: the tests import the monitor modules from Software/ by plain name, like
+the scripts in Testing/ do, and read the bundled recordings from Data/.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Software"))
+DATA = os.path.join(ROOT, "Data")
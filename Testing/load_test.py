@@ -0,0 +1,102 @@
+"""
+Headless load test of the full monitoring path.
+
+Runs the monitor offscreen in demo mode, where an emulated board streams through the real
+acquisition thread or process, filters, plots and recorder, at a multiple of real time. Reports whether every
+sample the board sent was parsed, buffered and recorded, whether every sample lost to
+emulated packet loss was detected, and whether rendering kept up.
+
+Usage:
+    python Testing/load_test.py --speed 10 --channels 5 --duration 20
+    python Testing/load_test.py --source "Data/ecg unfiltered.csv" --loss 0.01
+    python Testing/load_test.py --loss 0.01 --counter-bytes 1
+    python Testing/load_test.py --loss 0.01 --infer-gaps
+    python Testing/load_test.py --channels 64 --boards 4
+    python Testing/load_test.py --channels 256 --backend process
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Software"))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+from gui import App
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the monitor against an emulated board.")
+    parser.add_argument("--source", default="ecg", help="ecg, emg, eeg or a recording to replay")
+    parser.add_argument("--channels", type=int, default=5)
+    parser.add_argument("--rate", type=int, default=250, help="sampling rate in Hz")
+    parser.add_argument("--speed", type=float, default=10.0, help="multiple of real time")
+    parser.add_argument("--loss", type=float, default=0.0, help="packet loss probability")
+    parser.add_argument("--duration", type=float, default=20.0, help="test length in seconds")
+    parser.add_argument("--format", default="bpr", choices=("csv", "bpr"), help="recording format")
+    parser.add_argument("--boards", type=int, default=1, help="number of emulated boards sharing the channels")
+    parser.add_argument("--counter-bytes", type=int, default=0, help="frame counter size, 0 to detect loss by timing")
+    parser.add_argument("--infer-gaps", action="store_true",
+                        help="without a frame counter, leave the gaps found from arrival times in the sample indices")
+    parser.add_argument("--backend", default="thread", choices=("thread", "process"),
+                        help="acquire on a thread of the GUI process or in a separate process")
+    args = parser.parse_args(argv)
+
+    app = QApplication(sys.argv)
+    workdir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(workdir, "Data"))
+    os.chdir(workdir)  # recordings are written to Data/ relative to the working directory
+
+    window = App(channels=args.channels, demo_mode=True, sampling_rate=args.rate, record_format=args.format,
+                 demo_source=args.source, demo_speed=args.speed, counter_bytes=args.counter_bytes,
+                 boards=args.boards, backend=args.backend, demo_loss=args.loss, infer_gaps=args.infer_gaps)
+    started = {}
+
+    def totals(stats, key):
+        return sum(emulator[key] for emulator in stats["emulators"])
+
+    def start():
+        window.toggle_update()  # flushes what the boards sent before monitoring started
+        stats = window.serial_thread.stats(report=True, wait=True)
+        started["time"] = time.perf_counter()
+        started["sent"] = totals(stats, "samples_sent")
+        started["dropped"] = totals(stats, "packets_dropped")
+        started["frames"] = stats["frames"]
+        window.toggle_record()
+        QTimer.singleShot(int(1000 * args.duration), finish)
+
+    def finish():
+        elapsed = time.perf_counter() - started["time"]
+        window.toggle_record()  # waits for the recorder to write everything queued
+        recording = window.recording_stats
+        stats = window.serial_thread.stats(report=True, wait=True)
+        window.close()  # stops the acquisition thread or process and the boards
+        sent = totals(stats, "samples_sent") - started["sent"]
+        print(f"Streamed {args.channels} channels at {args.speed:g}x for {elapsed:.1f} s on the {args.backend} backend "
+              f"({sent / args.boards / elapsed:.0f} samples/s per board, target {args.rate * args.speed:.0f})")
+        print(f"Boards: {sent} samples sent, {totals(stats, 'packets_dropped')} packets dropped, "
+              f"{totals(stats, 'overflow_bytes')} bytes overflowed, {totals(stats, 'in_waiting')} bytes unread")
+        print(f"Parser: {stats['frames'] - started['frames']} frames, {stats['malformed_frames']} malformed, "
+              f"{stats['dropped_bytes']} bytes dropped")
+        dropped = (totals(stats, "packets_dropped") - started["dropped"]) * stats["emulators"][0]["packet_frames"]
+        print(f"Clock: {stats['samples_lost']} samples lost in {stats['gaps']} gaps detected, "
+              f"{stats['suspected_lost']} suspected lost, {stats['late_blocks']} late blocks "
+              f"(boards dropped {dropped}), measured rate {stats['rate']:.1f} Hz")
+        for row in stats.get("devices", []):
+            print(f"  {row['name']}: {row['lost']} lost, {row['relative_ppm']:+.0f} ppm from the reference, "
+                  f"lag {row['lag']}, {row['late']} late, {row['slips']} slips")
+        print(f"Recorder: {recording['samples_written']} samples written, {recording['dropped_blocks']} blocks dropped")
+        print(f"GUI: {window.fps:.0f} FPS (target {window.target_fps}), {window.dropped_frames} dropped frames, "
+              f"{stats['signals_coalesced']} notifications coalesced")
+        app.quit()
+
+    window.source_ready.connect(start)
+    app.exec_()
+
+
+if __name__ == "__main__":
+    main()
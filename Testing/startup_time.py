@@ -0,0 +1,116 @@
+"""
+Cold start time of the monitor, from launching the process to the first samples.
+
+Starts the monitor in demo mode in a fresh interpreter for each run, in every mode, and times
+how long it takes until the monitor reports its first samples. The GUI runs offscreen.
+
+With --baseline, the monitor of an earlier revision is timed as well, for comparison: its
+Software/ directory is exported from git and its window started in demo mode, monitoring from
+the start. This expects the single-file monitor from before the command-line entry point, with
+an App(channels, demo_mode=...) whose serial_thread emits data_received.
+
+Usage:
+    python Testing/startup_time.py
+    python Testing/startup_time.py --runs 10 --channels 64
+    python Testing/startup_time.py --baseline <revision before the entry point>
+"""
+import argparse
+import io
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MONITOR = os.path.join(ROOT, "Software", "Biopotential Monitor.py")
+
+MODES = {
+    "headless": ["--headless"],
+    "gui/thread": ["--start"],
+    "gui/process": ["--start", "--backend", "process"],
+}
+
+# Starts the window of an earlier monitor and prints a line when the first samples arrive
+BASELINE = r"""
+import importlib.util, os, sys
+sys.path.insert(0, {software!r})
+spec = importlib.util.spec_from_file_location("monitor", os.path.join({software!r}, "Biopotential Monitor.py"))
+monitor = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(monitor)
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+import qdarkstyle
+app = QApplication(sys.argv)
+app.setStyleSheet(qdarkstyle.load_stylesheet_pyqt5())
+window = monitor.App(channels={channels}, demo_mode=True)
+def first_samples(count):
+    print("First samples", flush=True)
+    app.quit()
+window.serial_thread.data_received.connect(first_samples)
+QTimer.singleShot(0, window.toggle_update)
+app.exec_()
+os._exit(0)
+"""
+
+
+def export_software(revision):
+    """Export the Software/ directory of a revision of the repository to a temporary directory and return its path."""
+    directory = tempfile.mkdtemp()
+    archive = subprocess.run(["git", "-C", ROOT, "archive", revision, "Software"], check=True,
+                             capture_output=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+    return os.path.join(directory, "Software")
+
+
+def time_to_first_samples(command, workdir, timeout=60.0):
+    """Launch a command and return the seconds until it prints the first samples line, or None on failure."""
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               text=True)
+    elapsed = None
+    try:
+        for line in process.stdout:
+            if line.startswith("First samples"):
+                elapsed = time.perf_counter() - start
+                break
+    finally:
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the time from launch to the first samples.")
+    parser.add_argument("--runs", type=int, default=5, help="launches per mode")
+    parser.add_argument("--channels", type=int, default=5)
+    parser.add_argument("--filter", default="", help="only time modes whose name contains this text")
+    parser.add_argument("--baseline", default=None, help="git revision of an earlier monitor to time as well")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp()
+    commands = {name: [sys.executable, MONITOR, "--demo", "--duration", "2", "--channels", str(args.channels),
+                       "--output", workdir] + arguments for name, arguments in MODES.items()}
+    if args.baseline is not None:
+        code = BASELINE.format(software=export_software(args.baseline), channels=args.channels)
+        commands[f"baseline {args.baseline}"[:14]] = [sys.executable, "-c", code]
+    print(f"{'mode':14} {'median s':>9} {'min s':>7} {'max s':>7}")
+    for name, command in commands.items():
+        if args.filter not in name:
+            continue
+        times = [time_to_first_samples(command, workdir) for _ in range(args.runs)]
+        times = [t for t in times if t is not None]
+        if not times:
+            print(f"{name:14} no samples received")
+            continue
+        print(f"{name:14} {np.median(times):9.2f} {min(times):7.2f} {max(times):7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Tests for building a recording's annotation index and querying its events, clean segments and summaries.
+"""
+import numpy as np
+import pytest
+from annotations import IndexBuilder, RecordingIndex, index_path
+
+FS = 250
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Index of 20 s on two channels with a gap from 10 s to 12 s and channel 1 saturated from 4 s to 5 s."""
+    rng = np.random.default_rng(0)
+    x = np.clip(np.round(128 + rng.normal(0, 5, (20 * FS, 2))), 1, 254).astype(np.uint8)
+    x[4 * FS:5 * FS, 1] = 255
+    builder = IndexBuilder(2, FS, detect_beats=False)
+    for start in range(0, 10 * FS, 100):
+        builder.add(x[start:min(start + 100, 10 * FS)], start)
+    builder.add(x[12 * FS:], 12 * FS)  # samples 10 s to 12 s were lost
+    builder.add_event("annotation", 15 * FS, label="marker")
+    builder.finish()
+    path = index_path(str(tmp_path / "recording.bpr"))
+    builder.save(path)
+    return RecordingIndex(path)
+
+
+def test_events_by_kind_time_and_channel(index):
+    gaps = index.events("gap")
+    assert len(gaps) == 1 and (gaps["sample"][0], gaps["end"][0], gaps["channel"][0]) == (10 * FS, 12 * FS, -1)
+    saturation = index.events("saturation")
+    assert len(saturation) == 1
+    assert (saturation["sample"][0], saturation["end"][0], saturation["channel"][0]) == (4 * FS, 5 * FS, 1)
+    assert len(index.events("saturation", channel=0)) == 0
+    # Segments overlapping the range are found even when they start before it
+    assert len(index.events("saturation", start=4.5, stop=6)) == 1
+    assert len(index.events("saturation", start=5, stop=6)) == 0
+    marker = index.events("annotation", start=14, stop=16)
+    assert list(marker["label"]) == ["marker"]
+
+
+def test_clean_segments_avoid_gaps_and_saturation(index):
+    np.testing.assert_allclose(index.clean_segments(4, channels=[0]), [[0, 4], [4, 8], [12, 16], [16, 20]])
+    for start, end in index.clean_segments(2, channels=[1]):
+        assert end <= 4 or start >= 5
+        assert end <= 10 or start >= 12
+    assert len(index.clean_segments(30)) == 0
+
+
+def test_summary_merges_blocks_into_bins(index):
+    summary = index.summary(bins=4)
+    assert len(summary["time"]) == 4
+    assert summary["time"][0] == 0
+    assert summary["minimum"].shape == summary["rms"].shape == (4, 2)
+    # Saturated samples are 255 counts in the bin that holds them
+    assert summary["maximum"][:, 1].max() == pytest.approx(255 * 3.3 / 256 / 1100 * 1e6, rel=1e-5)
+    assert np.all(summary["maximum"] >= summary["minimum"])
+    zoomed = index.summary(start=12, stop=14, bins=1000, channels=[0])
+    np.testing.assert_allclose(zoomed["time"], [12, 13])
+    assert zoomed["mean"].shape == (2, 1)
@@ -0,0 +1,42 @@
+"""
+Tests for writing and reading .bpr recordings with gaps of lost samples.
+"""
+import numpy as np
+import pandas as pd
+from binary_recording import BinaryRecording, BinaryRecordingWriter, convert_csv
+
+
+def write(path, blocks, block_samples=4):
+    """Write (start_index, samples) blocks to a recording."""
+    writer = BinaryRecordingWriter(path, 2, 250, block_samples=block_samples)
+    for start_index, block in blocks:
+        writer.write(block, start_index=start_index)
+    writer.close()
+    return BinaryRecording(path)
+
+
+def test_round_trip_keeps_gaps(tmp_path):
+    rng = np.random.default_rng(0)
+    starts, lengths = [0, 6, 20, 21, 40], [6, 9, 1, 10, 3]  # gaps before 20 and 40
+    blocks = [(s, rng.integers(0, 256, (n, 2), dtype=np.uint8)) for s, n in zip(starts, lengths)]
+    recording = write(str(tmp_path / "gaps.bpr"), blocks)
+
+    indices = np.concatenate([s + np.arange(n) for s, n in zip(starts, lengths)])
+    samples = np.vstack([block for _, block in blocks])
+    assert recording.n_samples == len(indices)
+    np.testing.assert_array_equal(recording.indices(), indices)
+    np.testing.assert_array_equal(recording.read(), samples)
+    # A range across a gap returns only the samples that were received
+    within = (indices >= 10) & (indices < 25)
+    np.testing.assert_array_equal(recording.indices(10, 25), indices[within])
+    np.testing.assert_array_equal(recording.read(10, 25), samples[within])
+    np.testing.assert_allclose(recording.read(10, 25, microvolts=True), samples[within] * recording.uv_per_count)
+    np.testing.assert_array_equal(recording.to_dataframe()["Sample"], indices)
+
+
+def test_csv_conversion_keeps_sample_indices(tmp_path):
+    df = pd.DataFrame({"Sample": [0, 1, 2, 5, 6], "Timestamp": ["2024-01-01T00:00:00"] * 5,
+                       "Channel_1": [1, 2, 3, 4, 5], "Channel_2": [6, 7, 8, 9, 10]})
+    df.to_csv(tmp_path / "gaps.csv", index=False)
+    recording = BinaryRecording(convert_csv(str(tmp_path / "gaps.csv")))
+    pd.testing.assert_frame_equal(recording.to_dataframe(), df.drop(columns="Timestamp"), check_dtype=False)
@@ -0,0 +1,38 @@
+"""
+Tests for wraparound and incremental reads of MultiChannelRingBuffer.
+"""
+import numpy as np
+from buffers import MultiChannelRingBuffer
+
+
+def test_view_and_since_across_wraparound():
+    buffer = MultiChannelRingBuffer(3, 10, dtype=np.int64)
+    written = np.empty((0, 3), dtype=np.int64)
+    count = 0
+    # Blocks that end on, cross and exceed the capacity
+    for n in [3, 7, 4, 9, 1, 25, 10, 6]:
+        block = np.arange(len(written), len(written) + n)[:, None] * 10 + np.arange(3)
+        buffer.write(block)
+        written = np.vstack([written, block])
+        assert len(buffer) == min(len(written), 10)
+        np.testing.assert_array_equal(buffer.view(), written[-10:].T)
+        np.testing.assert_array_equal(buffer.view(4), written[-4:].T)
+        # Samples overwritten since the previous read are skipped
+        np.testing.assert_array_equal(buffer.since(count), written[count:][-10:].T)
+        count = buffer.count
+
+
+def test_since_until_reads_up_to_a_count():
+    buffer = MultiChannelRingBuffer(2, 8, dtype=np.int64)
+    written = np.arange(24).reshape(12, 2)
+    buffer.write(written)
+    np.testing.assert_array_equal(buffer.since(6, until=10), written[6:10].T)
+    np.testing.assert_array_equal(buffer.since(0, until=12), written[4:12].T)
+
+
+def test_partial_channel_writes_advance_all_channels():
+    buffer = MultiChannelRingBuffer(3, 5, dtype=np.int64)
+    buffer.write(np.ones((4, 3), dtype=np.int64))
+    buffer.write(np.full((3, 1), 7), channels=[2])
+    assert buffer.count == 7
+    np.testing.assert_array_equal(buffer.view(3)[2], [7, 7, 7])
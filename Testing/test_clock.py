@@ -0,0 +1,83 @@
+"""
+Tests for sample index assignment and gap detection in SampleClock.
+"""
+import numpy as np
+import pytest
+from clock import SampleClock, fill_gaps
+
+FS = 250
+PACKET = 48  # samples per BLE packet with 5 channels
+
+
+def stream(clock, packets=150, delayed=(), lost=(), delay=0.12, jitter=0.005, seed=0):
+    """Feed a clock one packet per block, with some packets delayed or never delivered, and return the indices."""
+    rng = np.random.default_rng(seed)
+    indices = []
+    for k in range(packets):
+        if k in lost:
+            continue
+        arrival = 1.0 + (k + 1) * PACKET / FS + 0.02 + abs(rng.normal(0, jitter))
+        if k in delayed:
+            arrival += delay
+        indices.append(clock.update(PACKET, arrival))
+    return np.concatenate(indices)
+
+
+@pytest.mark.parametrize("infer_gaps", [False, True])
+def test_delayed_packet_does_not_cascade(infer_gaps):
+    clock = SampleClock(FS, packet_samples=PACKET, infer_gaps=infer_gaps)
+    indices = stream(clock, delayed=[40])
+    # Guessing a gap before the late packet is unavoidable when inferring, but it must stay a single guess
+    assert clock.samples_lost == (PACKET if infer_gaps else 0)
+    assert clock.suspected_lost == 0
+    assert clock.late_blocks == 1
+    assert clock.rate == pytest.approx(FS, rel=1e-3)
+    assert indices[-1] == 150 * PACKET - 1 + clock.samples_lost
+
+
+def test_lost_packet_is_reported_without_counters():
+    clock = SampleClock(FS, packet_samples=PACKET)
+    indices = stream(clock, lost=[40])
+    assert clock.samples_lost == 0 and clock.gaps == 0
+    assert clock.suspected_lost == PACKET
+    assert clock.late_blocks == 0
+    np.testing.assert_array_equal(indices, np.arange(149 * PACKET))
+
+
+def test_lost_packet_leaves_a_gap_when_inferring():
+    clock = SampleClock(FS, packet_samples=PACKET, infer_gaps=True)
+    indices = stream(clock, lost=[40, 90, 91])
+    assert clock.samples_lost == 3 * PACKET and clock.gaps == 2
+    assert clock.rate == pytest.approx(FS, rel=1e-3)
+    expected = np.delete(np.arange(150 * PACKET).reshape(150, PACKET), [40, 90, 91], axis=0).ravel()
+    np.testing.assert_array_equal(indices, expected)
+
+
+def test_sequence_counters_give_exact_gaps_across_wraparound():
+    clock = SampleClock(FS, sequence_modulus=256)
+    first = clock.update(4, 0.0, np.array([250, 251, 252, 253]))
+    second = clock.update(3, 0.1, np.array([255, 2, 3]))  # 254, 0 and 1 lost
+    np.testing.assert_array_equal(first, [0, 1, 2, 3])
+    np.testing.assert_array_equal(second, [5, 8, 9])
+    assert clock.samples_lost == 3 and clock.gaps == 2
+
+
+def test_fill_gaps_interpolates_missing_samples():
+    block = np.array([[10, 20], [16, 26]], dtype=np.uint8)
+    filled = fill_gaps(block, np.array([3, 6]), np.array([4, 14]), 1)
+    np.testing.assert_array_equal(filled, [[7, 17], [10, 20], [12, 22], [14, 24], [16, 26]])
+
+
+def test_missed_losses_do_not_make_the_rate_run_away():
+    # At 1 kHz a packet lasts about the gap tolerance, so losses while the rate settles are missed at first
+    rng = np.random.default_rng(3)
+    clock = SampleClock(1000, packet_samples=PACKET)
+    arrival, sent, lost = 0.0, 0, 0
+    for k in range(400):
+        sent += PACKET
+        if rng.random() < 0.05:
+            lost += PACKET
+            continue
+        clock.update(PACKET, sent / 1000 + 0.02 + abs(rng.normal(0, 0.002)) + (0.15 if k == 0 else 0))
+    assert clock.rate == pytest.approx(1000, rel=0.01)
+    assert clock.suspected_lost <= lost
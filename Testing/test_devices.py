@@ -0,0 +1,78 @@
+"""
+Tests for merging the streams of several boards in DeviceManager.
+"""
+import numpy as np
+import pytest
+from devices import DeviceManager
+
+
+def manager(interpolate_gaps):
+    """Manager of two 2-channel boards whose clocks agree, fed by push rather than reader threads."""
+    devices = DeviceManager([("board 1", None), ("board 2", None)], [2, 2], 250, interpolate_gaps=interpolate_gaps)
+    for device in devices.devices:
+        device.clock.offset = 0.0
+    return devices
+
+
+@pytest.mark.parametrize("interpolate_gaps", [False, True])
+def test_lost_samples_are_flagged_and_filled(interpolate_gaps):
+    devices = manager(interpolate_gaps)
+    reference, other = devices.devices
+    ramp = np.repeat(np.arange(100, dtype=np.uint8)[:, None], 2, axis=1)
+    devices.push(reference, np.arange(100), ramp)
+    indices = np.r_[0:50, 60:100]  # board 2 lost samples 50 to 59
+    devices.push(other, indices, ramp[indices])
+
+    block, merged, received = devices.read(timeout=0)
+    np.testing.assert_array_equal(merged, np.arange(100))
+    assert received[:, 0].all()
+    np.testing.assert_array_equal(np.flatnonzero(~received[:, 1]), np.arange(50, 60))
+    np.testing.assert_array_equal(block[:, :2], ramp)
+    np.testing.assert_array_equal(block[indices, 2:], ramp[indices])
+    # The gap is filled for the live display only
+    expected = ramp[50:60] if interpolate_gaps else np.full((10, 2), 49)
+    np.testing.assert_array_equal(block[50:60, 2:], expected)
+
+
+def test_lagging_board_is_held_and_flagged():
+    devices = manager(True)
+    reference, other = devices.devices
+    devices.push(reference, np.arange(10), np.ones((10, 2), dtype=np.uint8))
+    devices.push(other, np.arange(10), np.ones((10, 2), dtype=np.uint8))
+    devices.push(reference, np.arange(10, 300), np.ones((290, 2), dtype=np.uint8))
+    block, merged, received = devices.read(timeout=0)
+    # Board 2 stopped after sample 9 and is held once it is more than max_lag behind
+    assert merged[-1] == 299 - devices.max_lag
+    assert received[:10].all() and not received[10:, 1].any()
+    np.testing.assert_array_equal(block[:, 2:], 1)
+
+
+def test_boards_on_one_clock_agree_despite_timing_inferred_losses():
+    # Emulated boards at 10x real time, as in load_test.py, without frame counters and losing 2% of their packets
+    speed, packet = 10, 120
+    devices = DeviceManager([("board 1", None), ("board 2", None)], [2, 2], 250, infer_gaps=True, speed=speed)
+    rng = np.random.default_rng(0)
+    blocks, dropped = [], [0, 0]
+    for i, ppm in enumerate([0, 40]):
+        rate = 250 * speed * (1 + 1e-6 * ppm)
+        for k in range(int(30 * rate / packet)):
+            if rng.random() < 0.02:
+                dropped[i] += packet
+                continue
+            # Sent late by up to the emulator's 5 ms sleep, and now and then read late as well
+            arrival = 1.0 + (k + 1) * packet / rate + rng.uniform(0, 0.005) + (0.01 if rng.random() < 0.05 else 0)
+            blocks.append((arrival, i))
+    settled = None
+    for arrival, i in sorted(blocks):
+        if settled is None and arrival > 10.0:
+            settled = devices.slips[1]  # placements are corrected while the rates settle
+        device = devices.devices[i]
+        indices = device.clock.update(packet, arrival)
+        devices.push(device, indices, np.ones((packet, 2), dtype=np.uint8))
+        devices.read(timeout=0)
+    assert [device.clock.samples_lost for device in devices.devices] == dropped
+    report = devices.report()
+    assert report[1]["relative_ppm"] == pytest.approx(40, abs=20)
+    assert abs(report[0]["drift_ppm"]) < 20
+    # Board 2 drifts ahead by 0.1 sample a second, so it may slip once more after settling
+    assert report[1]["slips"] - settled <= 1
@@ -0,0 +1,42 @@
+"""
+Tests for streaming FilterPipeline stages and their crossfade when retuned.
+"""
+import numpy as np
+from filter_design import design
+from filters import FilterPipeline
+
+FS = 250
+
+
+def samples(n=1000, channels=3):
+    rng = np.random.default_rng(0)
+    return 128 + 20 * np.sin(2 * np.pi * 10 * np.arange(n) / FS)[:, None] + rng.normal(0, 5, (n, channels))
+
+
+def test_blocks_match_filtering_in_one_go():
+    x = samples()
+    whole, blocks = FilterPipeline(3), FilterPipeline(3)
+    for pipeline in (whole, blocks):
+        pipeline.set_stage("lpf", design("lowpass", 40, FS, 4))
+        pipeline.set_stage("hpf", design("highpass", 0.5, FS, 2))
+    expected = whole.process(x)
+    filtered = np.vstack([blocks.process(x[start:start + 37]) for start in range(0, len(x), 37)])
+    np.testing.assert_allclose(filtered, expected, atol=1e-9)
+
+
+def test_fade_ends_for_channels_that_are_not_filtered():
+    x = samples()
+    pipeline = FilterPipeline(3, fade=25)
+    pipeline.set_stage("lpf", design("lowpass", 40, FS, 4))
+    pipeline.process(x[:50])
+    pipeline.set_stage("lpf", design("lowpass", 20, FS, 4))
+    # Channel 2 is hidden while the other two fade over to the new stage
+    for start in range(50, 100, 10):
+        pipeline.process(x[start:start + 10], [0, 1])
+    assert pipeline.previous is None
+    assert not pipeline.remaining.any()
+    # Once shown again it is filtered from its history by the new stage only
+    restarted = pipeline.restart([2], x[:100, [2]])
+    fresh = FilterPipeline(1)
+    fresh.set_stage("lpf", design("lowpass", 20, FS, 4))
+    np.testing.assert_allclose(restarted, fresh.process(x[:100, [2]]), atol=1e-9)
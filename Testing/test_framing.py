@@ -0,0 +1,46 @@
+"""
+Tests for locking onto and resynchronising FrameParser with framed serial streams.
+"""
+import numpy as np
+import pytest
+from framing import FrameParser
+
+CHANNELS = 5
+
+
+def frames(samples, counters=None):
+    """Sync-word frames of samples with shape (n_samples, channels), optionally numbered by one-byte counters."""
+    rows = [b"\r\n" + (b"" if counters is None else bytes([c])) + bytes(row) for row, c in
+            zip(samples, counters if counters is not None else [None] * len(samples))]
+    return b"".join(rows)
+
+
+def feed(parser, data, chunks):
+    """Feed a parser the stream split at random points and return all samples it extracts."""
+    cuts = np.sort(np.random.default_rng(0).integers(0, len(data), chunks))
+    pieces = [data[a:b] for a, b in zip(np.r_[0, cuts], np.r_[cuts, len(data)])]
+    return np.concatenate([parser.feed(piece) for piece in pieces])
+
+
+@pytest.mark.parametrize("chunks", [0, 50, 500])
+def test_resyncs_after_garbage(chunks):
+    rng = np.random.default_rng(1)
+    # Payload bytes include the sync bytes, which must not be mistaken for frame starts once locked
+    first, second = (rng.choice([10, 13, 0, 128, 255], (40, CHANNELS)).astype(np.uint8) for _ in range(2))
+    garbage = bytes(rng.integers(32, 127, 7, dtype=np.uint8))
+    stream = garbage + frames(first) + garbage + frames(second)[:5] + frames(second)
+
+    parser = FrameParser(CHANNELS)
+    samples = feed(parser, stream, chunks)
+    np.testing.assert_array_equal(samples, np.vstack([first, second]))
+    assert parser.malformed_frames == 1
+    assert parser.dropped_bytes == 2 * len(garbage) + 5
+    assert parser.frames == 80
+
+
+def test_frame_counters_are_read():
+    samples = np.arange(20 * CHANNELS, dtype=np.uint8).reshape(20, CHANNELS)
+    counters = (250 + np.arange(20)) % 256
+    parser = FrameParser(CHANNELS, counter_bytes=1)
+    np.testing.assert_array_equal(parser.feed(frames(samples, counters)), samples)
+    np.testing.assert_array_equal(parser.sequence, counters)
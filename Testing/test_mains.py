@@ -0,0 +1,40 @@
+"""
+Tests for cancelling mains hum and tracking the mains frequency with MainsCanceller.
+"""
+import numpy as np
+import pytest
+from mains import MainsCanceller
+
+FS = 250
+
+
+def humming(seconds=30, frequency=50.4, seed=0):
+    """Noise on three channels and hum at the frequency and its second harmonic, with a different
+    amplitude and phase on every channel."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * FS)) / FS
+    clean = rng.normal(0, 5, (len(t), 3))
+    hum = np.column_stack([a * np.sin(2 * np.pi * frequency * t + p) + b * np.sin(4 * np.pi * frequency * t + q)
+                           for a, p, b, q in [(100, 0, 30, 1), (60, 2, 20, 0.5), (150, 4, 10, 3)]])
+    return clean, hum
+
+
+def test_off_nominal_hum_is_cancelled_and_its_frequency_tracked():
+    clean, hum = humming()
+    canceller = MainsCanceller(3, FS)
+    out = np.vstack([canceller.process(block) for block in np.array_split(clean + hum, len(clean) // 10)])
+    assert canceller.frequency == pytest.approx(50.4, abs=0.01)
+    # Over the last 5 s, what is left of the hum is over 30 dB below it
+    residual = out[-5 * FS:] - clean[-5 * FS:]
+    attenuation = 10 * np.log10(np.mean(residual ** 2, axis=0) / np.mean(hum[-5 * FS:] ** 2, axis=0))
+    assert (attenuation < -30).all()
+
+
+def test_long_blocks_are_split_like_short_ones():
+    clean, hum = humming(seconds=10)
+    whole, blocks = MainsCanceller(3, FS), MainsCanceller(3, FS)
+    n = blocks.max_block
+    assert len(clean) > 10 * n
+    out = np.vstack([blocks.process((clean + hum)[start:start + n]) for start in range(0, len(clean), n)])
+    np.testing.assert_allclose(whole.process(clean + hum), out)
+    assert whole.frequency == blocks.frequency
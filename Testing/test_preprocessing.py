@@ -0,0 +1,38 @@
+"""
+Tests for chunked zero-phase filtering of long recordings.
+"""
+import numpy as np
+import pytest
+from binary_recording import BinaryRecording, BinaryRecordingWriter
+from filter_design import design
+from preprocessing import filter_chunks, filter_recording, to_microvolts, zero_phase
+
+FS = 250
+
+
+@pytest.fixture
+def counts():
+    """A minute of 8-bit samples on three channels with drift, a 10 Hz component and noise."""
+    rng = np.random.default_rng(0)
+    t = np.arange(60 * FS)[:, None] / FS
+    x = 128 + 30 * np.sin(2 * np.pi * 0.05 * t) + 20 * np.sin(2 * np.pi * 10 * t + np.arange(3)) + rng.normal(0, 5, (len(t), 3))
+    return np.clip(np.round(x), 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize("chunk_samples", [2000, 4321, 60 * FS])
+def test_chunks_match_filtering_in_one_go(counts, chunk_samples):
+    sos = design("bandpass", (0.5, 40), FS, 4)
+    expected = zero_phase(to_microvolts(counts), sos, axis=0)
+    filtered = filter_recording(counts, sos, chunk_samples=chunk_samples)
+    np.testing.assert_allclose(filtered, expected, atol=1e-6 * np.abs(expected).max())
+
+
+def test_binary_recording_is_filtered_per_sample_index(counts, tmp_path):
+    writer = BinaryRecordingWriter(str(tmp_path / "filter.bpr"), 3, FS)
+    writer.write(counts)
+    writer.close()
+    recording = BinaryRecording(str(tmp_path / "filter.bpr"))
+    sos = design("highpass", 0.5, FS, 2)
+    filtered = np.vstack(list(filter_chunks(recording, sos, chunk_samples=3000)))
+    expected = zero_phase(counts * recording.uv_per_count, sos, axis=0)
+    np.testing.assert_allclose(filtered, expected, atol=1e-6 * np.abs(expected).max())
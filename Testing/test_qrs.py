@@ -0,0 +1,59 @@
+"""
+Tests for the streaming QRS detector on the bundled ECG recordings.
+"""
+import glob
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import DATA
+from qrs import StreamingQRSDetector
+
+RECORDINGS = sorted(glob.glob(os.path.join(DATA, "ecg*.csv")))
+
+
+def load(path):
+    """Samples with shape (n_samples, channels) of a recording."""
+    df = pd.read_csv(path)
+    return df[[c for c in df.columns if c.startswith("Channel_")]].to_numpy()
+
+
+def detect(data, block_size=25):
+    """R-peak indices of every channel, feeding the detector blocks as the serial thread does."""
+    detector = StreamingQRSDetector(data.shape[1])
+    peaks = [[] for _ in range(data.shape[1])]
+    for start in range(0, len(data), block_size):
+        for ch, found in enumerate(detector.process(data[start:start + block_size])):
+            peaks[ch].extend(found)
+    return [np.array(p) for p in peaks]
+
+
+def test_short_rr_intervals_are_rare():
+    # An RR interval under 300 ms is over 200 bpm; nearly all of them are T waves or noise peaks
+    rr = np.concatenate([np.diff(p) for path in RECORDINGS for p in detect(load(path))]) / 250
+    assert len(rr) > 500
+    assert np.mean(rr < 0.3) < 0.1
+
+
+@pytest.mark.parametrize("path", RECORDINGS[:2], ids=os.path.basename)
+def test_detections_do_not_depend_on_block_size(path):
+    data = load(path)
+    for single, blocks in zip(detect(data, 1), detect(data, 1000)):
+        np.testing.assert_array_equal(single, blocks)
+
+
+def test_heart_rate_is_forgotten_when_the_beats_stop():
+    data = load(RECORDINGS[0])[:20 * 250]
+    detector = StreamingQRSDetector(data.shape[1])
+    detector.process(data[:10 * 250])
+    assert np.isfinite(detector.heart_rate).all()
+    # A lead comes off: the signal goes flat, and the rate lasts no longer than three RR intervals
+    rr = 60 / detector.heart_rate
+    flat = np.repeat(data[10 * 250 - 1:10 * 250], 250 * 10, axis=0)
+    for second in range(10):
+        detector.process(flat[second * 250:(second + 1) * 250])
+        assert np.isnan(detector.heart_rate[second + 1 > 3 * rr + 1]).all()
+    assert np.isnan(detector.heart_rate).all()
+    # and comes back once the beats resume, not from the interval across the flat stretch
+    detector.process(data[10 * 250:])
+    assert (detector.heart_rate > 40).all()
@@ -0,0 +1,61 @@
+"""
+Tests for recording from the acquisition engine: headless recording without scipy and the beats the
+live QRS detector adds to the recording's index.
+"""
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from conftest import ROOT
+from acquisition import AcquisitionEngine, open_source
+from annotations import RecordingIndex, build_index, index_path
+from buffers import MultiChannelRingBuffer
+
+FS = 250
+
+
+def test_headless_recording_does_not_import_scipy_or_qt(tmp_path):
+    # In a fresh interpreter, as any earlier test may have imported them
+    code = (
+        "import runpy, sys\n"
+        f"sys.argv = ['Biopotential Monitor.py', '--headless', '--demo', '--demo-speed', '10', '--duration', '2',"
+        f" '--format', 'bpr', '--output', {str(tmp_path)!r}]\n"
+        "try:\n"
+        f"    runpy.run_path({os.path.join(ROOT, 'Software', 'Biopotential Monitor.py')!r}, run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print(sorted({name.split('.')[0] for name in sys.modules} & {'scipy', 'PyQt5', 'pyqtgraph'}))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=os.path.join(ROOT, "Software"), capture_output=True,
+                            text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[-1] == "[]"
+    recordings = [name for name in os.listdir(tmp_path) if name.endswith(".bpr")]
+    assert len(recordings) == 1 and ":" not in recordings[0]  # not allowed in Windows file names
+    index = RecordingIndex(index_path(str(tmp_path / recordings[0])))
+    assert index.n_samples > 0 and len(index.events("beat")) == 0
+
+
+def test_live_beats_match_the_detector_run_over_the_recording(tmp_path):
+    spec = {"channels": 5, "sampling_rate": FS, "demo_source": "ecg", "demo_speed": 20}
+    ser, emulators = open_source(spec)
+    engine = AcquisitionEngine(ser, MultiChannelRingBuffer(5, 2 * FS), MultiChannelRingBuffer(5, 2 * FS, np.float64),
+                               5, FS)
+    engine.emulators = emulators
+    engine.load_qrs_detector()  # rather than waiting for the background thread
+    path = str(tmp_path / "live.bpr")
+    engine.start_recording(path)
+    start = time.perf_counter()
+    while time.perf_counter() - start < 1.5:
+        engine.step()
+    engine.close()
+
+    live = RecordingIndex(index_path(path))
+    offline = build_index(path)
+    assert live.n_samples > 20 * FS
+    for channel in range(5):
+        beats = live.beats(channel)
+        assert len(beats) > 15
+        # The offline detector starts with the recording rather than before it, so skip its learning period
+        np.testing.assert_array_equal(beats[beats > 4 * FS], offline.beats(channel)[offline.beats(channel) > 4 * FS])
@@ -0,0 +1,67 @@
+"""
+Tests for the headless SNR engine against the SNR computation the plotting functions used to do.
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.signal as signal
+from conftest import DATA
+from snr import compute_snr, peak_mask
+
+INTERVALS = [(5, 15), (15, 25)]
+
+
+def load(filename):
+    """Samples with shape (channels, n_samples) of a recording."""
+    df = pd.read_csv(os.path.join(DATA, filename))
+    return df[[c for c in df.columns if c.startswith("Channel_")]].to_numpy().T
+
+
+def reference_snr(data, interval, threshold=250, mask_peaks=True):
+    """SNR of one channel as the old plotting.SNR and SNR_emg computed it, without the plots. Peaks within 12
+    samples of the start are blanked from the start, where the old slice wrapped around and blanked nothing."""
+    data = data / 256 * 3.3 / 1100 * 1000000
+    filtered_data = signal.filtfilt(*signal.butter(6, (0.5, 40), btype="bandpass", fs=250), data)
+    t = np.arange(0, len(data) / 250, 1 / 250)
+    y = filtered_data[np.where((t >= interval[0]) & (t <= interval[1]))]
+    noise = y.copy()
+    if mask_peaks:
+        for peak in signal.find_peaks(y, height=threshold)[0]:
+            noise[max(peak - 12, 0):peak + 12] = 0
+    noise = signal.filtfilt(*signal.butter(6, (10, 100), btype="bandpass", fs=250), noise)
+    y = y - noise
+    return 10 * np.log10(np.mean(y**2) / np.mean(noise**2))
+
+
+@pytest.mark.parametrize("filename, mask_peaks", [("ecg 1.csv", True), ("emg 1.csv", False)])
+def test_matches_the_old_plotting_computation(filename, mask_peaks):
+    data = load(filename)
+    snr = compute_snr(data, INTERVALS, mask_peaks=mask_peaks)["snr"]
+    expected = [[reference_snr(row, interval, mask_peaks=mask_peaks) for interval in INTERVALS] for row in data]
+    # Second-order sections instead of transfer functions account for the last few thousandths of a dB
+    np.testing.assert_allclose(snr, expected, atol=0.01)
+
+
+def test_intervals_too_short_to_filter_are_nan():
+    result = compute_snr(load("ecg 1.csv")[:2], [(5, 15), (100, 110)], traces=True)
+    assert np.isfinite(result["snr"][:, 0]).all() and np.isnan(result["snr"][:, 1]).all()
+    assert result["signal"][1] is None
+
+
+def test_peak_mask_clips_at_the_edges():
+    mask = peak_mask([[1, 6], [9]], 10, 2)
+    expected = np.zeros((2, 10), dtype=bool)
+    expected[0, 0:3] = expected[0, 4:8] = True  # [peak - 2, peak + 2) for peaks at 1 and 6
+    expected[1, 7:10] = True
+    np.testing.assert_array_equal(mask, expected)
+
+
+def test_peak_mask_merges_overlapping_windows():
+    np.testing.assert_array_equal(peak_mask([[3, 5]], 10, 2)[0], np.isin(np.arange(10), range(1, 7)))
+
+
+def test_peak_mask_without_peaks():
+    assert not peak_mask([[], []], 5, 2).any()
+    assert peak_mask([[], [2]], 5, 1).tolist() == [[False] * 5, [False, True, True, False, False]]
+    assert peak_mask([], 5, 2).shape == (0, 5)
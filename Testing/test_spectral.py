@@ -0,0 +1,45 @@
+"""
+Tests for the incremental STFT against scipy.signal's spectrogram and Welch PSD of the whole signal.
+"""
+import numpy as np
+import pytest
+import scipy.signal as signal
+from spectral import StreamingSTFT
+
+FS = 250
+
+
+@pytest.fixture
+def samples():
+    """20 s of noise with a 10 Hz sinusoid and a DC offset on two channels."""
+    rng = np.random.default_rng(0)
+    t = np.arange(20 * FS) / FS
+    return 128 + rng.normal(0, 3, (len(t), 2)) + np.column_stack([20 * np.sin(2 * np.pi * 10 * t), np.zeros(len(t))])
+
+
+def stream(samples, block_samples=17):
+    """StreamingSTFT fed the samples in blocks that do not line up with its frames."""
+    stft = StreamingSTFT(2, FS, nperseg=256, hop=32)
+    for start in range(0, len(samples), block_samples):
+        stft.update(samples[start:start + block_samples])
+    return stft
+
+
+def test_spectrogram_matches_scipy(samples):
+    stft = stream(samples)
+    frequencies, _, expected = signal.spectrogram(samples, FS, "hann", nperseg=256, noverlap=224,
+                                                 scaling="density", axis=0)
+    np.testing.assert_allclose(stft.frequencies, frequencies)
+    for channel in range(2):
+        np.testing.assert_allclose(stft.spectrogram(channel), expected[:, channel], rtol=1e-5,
+                                   atol=1e-6 * expected[:, channel].max())
+
+
+def test_psd_matches_welch(samples):
+    stft = stream(samples)
+    _, expected = signal.welch(samples, FS, nperseg=256, noverlap=224, axis=0)
+    np.testing.assert_allclose(stft.psd(), expected.T, rtol=1e-5, atol=1e-6 * expected.max())
+    # The latest frames only
+    last = (len(samples) - 256) // 32 * 32 + 256  # end of the last complete frame
+    _, recent = signal.welch(samples[last - 256 - 9 * 32:last], FS, nperseg=256, noverlap=224, axis=0)
+    np.testing.assert_allclose(stft.psd(frames=10), recent.T, rtol=1e-5, atol=1e-6 * recent.max())
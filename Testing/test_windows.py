@@ -0,0 +1,72 @@
+"""
+Tests for the sliding-window primitives against the loops they replaced.
+"""
+import numpy as np
+import pytest
+from windows import minmax_decimate, moving_max, moving_mean, moving_min, moving_rms
+
+
+def movingaverage(x, n=5):
+    """The old plotting.movingaverage, without its print."""
+    x2 = np.pad(x, (int((n-1)/2), int((n-1)/2)))
+    y = []
+    for i, xi in enumerate(x):
+        yi = np.sum(x2[i:i+n])/n
+        y.append(yi)
+    return np.array(y)
+
+
+@pytest.fixture
+def x():
+    return np.random.default_rng(0).normal(0, 100, 1000)
+
+
+@pytest.mark.parametrize("n", [5, 37, 100])
+def test_moving_mean_matches_movingaverage(x, n):
+    np.testing.assert_array_equal(moving_mean(x, n), movingaverage(x, n))
+    np.testing.assert_array_equal(moving_mean(np.round(x).astype(int), n), movingaverage(np.round(x).astype(int), n))
+
+
+def test_windows_are_centred_and_zero_padded():
+    x = np.arange(1, 7, dtype=float)
+    np.testing.assert_array_equal(moving_max(-x, 4), [0, -1, -2, -3, 0, 0])  # 1 before, 2 after, zeros beyond
+    np.testing.assert_array_equal(moving_min(x, 3), [0, 1, 2, 3, 4, 0])
+    np.testing.assert_allclose(moving_rms(x, 3) ** 2, moving_mean(x ** 2, 3))
+    np.testing.assert_array_equal(moving_mean(x, 2), [1.5, 2.5, 3.5, 4.5, 5.5, 3])  # even windows reach one further right
+
+
+def test_channels_along_either_axis(x):
+    channels = np.stack([x, -x, 2 * x])
+    expected = np.stack([movingaverage(row, 37) for row in channels])
+    np.testing.assert_array_equal(moving_mean(channels, 37), expected)
+    np.testing.assert_array_equal(moving_mean(channels.T, 37, axis=0), expected.T)
+
+
+def test_nan_only_spoils_its_own_windows(x):
+    x = x.copy()
+    x[500] = np.nan
+    mean = moving_mean(x, 5)
+    assert np.isnan(mean[498:503]).all()
+    np.testing.assert_array_equal(mean[np.r_[:498, 503:1000]], movingaverage(x, 5)[np.r_[:498, 503:1000]])
+
+
+@pytest.mark.parametrize("n, bins", [(1000, 100), (1003, 64)])
+def test_minmax_decimate_keeps_the_extremes_of_every_bin(n, bins):
+    x = np.random.default_rng(1).normal(0, 1, (3, n))
+    indices, decimated = minmax_decimate(x, bins)
+    assert decimated.shape == (3, 2 * bins) and indices.shape == (2 * bins,)
+    bounds = np.arange(bins + 1) * n // bins
+    for k in range(bins):
+        part = x[:, bounds[k]:bounds[k + 1]]
+        np.testing.assert_array_equal(decimated[:, 2 * k], part.min(axis=1))
+        np.testing.assert_array_equal(decimated[:, 2 * k + 1], part.max(axis=1))
+        assert indices[2 * k] == indices[2 * k + 1] == bounds[k]
+    # Along the first axis too
+    np.testing.assert_array_equal(minmax_decimate(x.T, bins, axis=0)[1], decimated.T)
+
+
+def test_minmax_decimate_leaves_short_signals_unchanged():
+    x = np.arange(200.0)
+    indices, decimated = minmax_decimate(x, 100)
+    np.testing.assert_array_equal(indices, np.arange(200))
+    assert decimated is x